@@ -1,246 +1,552 @@
-import pandas as pd
-import numpy as np
-import random
-from datetime import datetime, timedelta
-
-# ==========================================
-# CONFIGURACIÓN
-# ==========================================
-NUM_ROWS = 1000000  # Número de registros a generar
-FILENAME = "logs_servidorRAN1.csv"
-
-# ==========================================
-# DEFINICIÓN DE DATOS (CONSTANTES)
-# ==========================================
-
-# 1. MÉTODOS HTTP
-methods = [
-    'GET', 'POST', 'PUT', 'DELETE', 'PATCH', 
-    'HEAD', 'OPTIONS', 'CONNECT', 'TRACE'
-]
-
-# 2. URLs Y ENDPOINTS
-urls = [
-    # Páginas principales y públicas
-    '/login', '/logout', '/home', '/index', '/dashboard', '/profile', '/settings', 
-    '/about', '/contact', '/register', '/signup', '/signin', '/reset-password', 
-    '/forgot-password', '/verify-email', '/terms', '/privacy', '/faq', '/help',
-    '/support', '/documentation', '/pricing', '/features', '/demo', '/trial',
-    '/download', '/upload', '/search', '/browse', '/explore', '/discover',
-    
-    # APIs versión 1
-    '/api/v1/users', '/api/v1/users/list', '/api/v1/users/{id}', '/api/v1/users/search',
-    '/api/v1/users/create', '/api/v1/users/update', '/api/v1/users/delete',
-    '/api/v1/auth', '/api/v1/auth/login', '/api/v1/auth/logout', '/api/v1/auth/refresh',
-    '/api/v1/token', '/api/v1/token/verify', '/api/v1/token/revoke',
-    '/api/v1/products', '/api/v1/products/{id}', '/api/v1/products/categories',
-    '/api/v1/products/featured', '/api/v1/products/popular', '/api/v1/products/new',
-    '/api/v1/orders', '/api/v1/orders/{id}', '/api/v1/orders/history', '/api/v1/orders/pending',
-    '/api/v1/payments', '/api/v1/payments/process', '/api/v1/payments/history',
-    '/api/v1/search', '/api/v1/search/advanced', '/api/v1/notifications',
-    '/api/v1/messages', '/api/v1/messages/inbox', '/api/v1/messages/sent',
-    '/api/v1/comments', '/api/v1/comments/{id}', '/api/v1/likes', '/api/v1/shares',
-    '/api/v1/reports', '/api/v1/analytics', '/api/v1/statistics', '/api/v1/metrics',
-    '/api/v1/settings', '/api/v1/preferences', '/api/v1/profile', '/api/v1/avatar',
-    '/api/v1/upload', '/api/v1/download', '/api/v1/export', '/api/v1/import',
-    
-    # APIs versión 2
-    '/api/v2/users', '/api/v2/users/batch', '/api/v2/users/roles', '/api/v2/users/permissions',
-    '/api/v2/analytics', '/api/v2/analytics/dashboard', '/api/v2/analytics/reports',
-    '/api/v2/metrics', '/api/v2/metrics/realtime', '/api/v2/metrics/historical',
-    '/api/v2/logs', '/api/v2/logs/search', '/api/v2/logs/export',
-    '/api/v2/health', '/api/v2/health/check', '/api/v2/status', '/api/v2/version',
-    '/api/v2/config', '/api/v2/config/update', '/api/v2/upload', '/api/v2/download',
-    '/api/v2/files', '/api/v2/files/{id}', '/api/v2/files/metadata',
-    '/api/v2/webhooks', '/api/v2/webhooks/register', '/api/v2/webhooks/test',
-    '/api/v2/integrations', '/api/v2/integrations/oauth', '/api/v2/integrations/callback',
-    
-    # APIs versión 3
-    '/api/v3/graphql', '/api/v3/rest', '/api/v3/streaming', '/api/v3/realtime',
-    '/api/v3/batch', '/api/v3/queue', '/api/v3/jobs', '/api/v3/tasks',
-    
-    # Archivos estáticos
-    '/static/css/style.css', '/static/css/main.css', '/static/css/bootstrap.min.css',
-    '/static/js/app.js', '/static/js/main.js', '/static/js/jquery.min.js',
-    '/static/images/logo.png', '/static/images/hero.png', '/static/images/icon.ico',
-    
-    # Panel de administración
-    '/admin', '/admin/login', '/admin/dashboard', '/admin/users',
-    '/admin/logs', '/admin/settings', '/admin/reports', '/admin/analytics',
-    
-    # Webhooks y callbacks
-    '/webhook/payment', '/webhook/notification', '/callback/oauth',
-    
-    # Rutas sospechosas y de ataques
-    '/admin.php', '/administrator.php', '/wp-admin', '/wp-login.php',
-    '/phpmyadmin', '/.env', '/.git/config', '/shell.php', '/config.php',
-    '/etc/passwd', '/server-status', '/test.php'
-]
-
-# 3. VERSIONES HTTP
-http_versions = [
-    'HTTP/0.9', 'HTTP/1.0', 'HTTP/1.1', 'HTTP/2.0', 'HTTP/3.0', 'SPDY/3.1'
-]
-
-# 4. CÓDIGOS DE ESTADO
-status_codes = [
-    100, 101, 102, 
-    200, 201, 202, 204, 206, 
-    300, 301, 302, 304, 307, 308, 
-    400, 401, 403, 404, 405, 408, 409, 410, 418, 429, 
-    500, 501, 502, 503, 504
-]
-
-# 5. USER AGENTS
-user_agents = [
-    # Chrome
-    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
-    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
-    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
-    
-    # Firefox
-    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:122.0) Gecko/20100101 Firefox/122.0',
-    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:122.0) Gecko/20100101 Firefox/122.0',
-    
-    # Safari
-    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15',
-    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Mobile/15E148 Safari/604.1',
-    
-    # Edge
-    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36 Edg/121.0.0.0',
-    
-    # Android
-    'Mozilla/5.0 (Linux; Android 14; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Mobile Safari/537.36',
-    
-    # Bots - Google
-    'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
-    'Googlebot/2.1 (+http://www.google.com/bot.html)',
-    'Googlebot-Image/1.0',
-    'Googlebot-News',
-    'Googlebot-Video/1.0',
-
-    # Bots - Bing & Yahoo
-    'Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)',
-    'Mozilla/5.0 (compatible; Yahoo! Slurp; http://help.yahoo.com/help/us/ysearch/slurp)',
-
-    # Herramientas de desarrollo
-    'curl/8.5.0',
-    'PostmanRuntime/7.36.0',
-    'python-requests/2.31.0',
-    'Apache-HttpClient/4.5.14 (Java/11.0.20)'
-]
-
-# 6. VERSIONES TLS
-tls_versions = [
-    'SSLv2', 'SSLv3', 'TLSv1.0', 'TLSv1.1', 'TLSv1.2', 'TLSv1.3', 'DTLS 1.2', '-'
-]
-
-# 7. CIPHER SUITES
-cipher_suites = [
-    'TLS_AES_128_GCM_SHA256',
-    'TLS_AES_256_GCM_SHA384',
-    'TLS_CHACHA20_POLY1305_SHA256',
-    'ECDHE-RSA-AES128-GCM-SHA256',
-    'ECDHE-RSA-AES256-GCM-SHA384',
-    'ECDHE-ECDSA-AES128-GCM-SHA256',
-    'DHE-RSA-AES256-GCM-SHA384',
-    'AES128-GCM-SHA256',
-    'ECDHE-RSA-RC4-SHA', # Legacy
-    'NULL-SHA256',       # Inseguro
-    '-'
-]
-
-# 8. DIRECCIONES IP (GENERACIÓN)
-private_ips_class_a = [f'10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}' for _ in range(100)]
-private_ips_class_b = [f'172.{random.randint(16, 31)}.{random.randint(0, 255)}.{random.randint(1, 254)}' for _ in range(80)]
-private_ips_class_c = [f'192.168.{random.randint(0, 255)}.{random.randint(1, 254)}' for _ in range(120)]
-special_ips = ['127.0.0.1', '0.0.0.0', '169.254.1.1']
-public_ips_na = [f'{random.randint(1, 126)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}' for _ in range(80)]
-public_ips_eu = [f'{random.randint(128, 191)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}' for _ in range(60)]
-public_ips_asia = [f'{random.randint(192, 223)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}' for _ in range(60)]
-known_service_ips = ['8.8.8.8', '1.1.1.1', '208.67.222.222', '104.16.0.0']
-
-# Combinar todas las IPs
-ips = (private_ips_class_a + private_ips_class_b + private_ips_class_c +
-       special_ips + public_ips_na + public_ips_eu + public_ips_asia +
-       known_service_ips)
-
-# 9. REFERRERS
-referers = [
-    'https://www.google.com/', 'https://www.bing.com/', 'https://duckduckgo.com/',
-    'https://www.facebook.com/', 'https://twitter.com/', 'https://www.linkedin.com/',
-    'https://www.instagram.com/', 'https://www.reddit.com/', 'https://www.youtube.com/',
-    'https://stackoverflow.com/', 'https://github.com/', 'https://news.ycombinator.com/',
-    'https://medium.com/', 'direct', '-', 'internal'
-]
-
-# 10. FUENTES DE LOG
-log_sources = [
-    'nginx_access_log', 'nginx_error_log', 'apache_access_log', 'iis_access_log',
-    'haproxy_log', 'aws_alb_log', 'cloudfront_log', 'cloudflare_log',
-    'firewall_log', 'waf_log', 'fail2ban_log',
-    'application_log', 'django_log', 'nodejs_log', 'auth_log', 'syslog',
-    'mysql_slow_query_log', 'postgres_log', 'docker_log', 'kubernetes_log'
-]
-
-# ==========================================
-# GENERAR DATOS
-# ==========================================
-data = []
-base_time = datetime.now()
-
-print(f"[+] Generando {NUM_ROWS} registros de logs simulados...")
-print(f"[+] Datos expandidos con categorías masivas:")
-print(f"    - Métodos HTTP: {len(methods)}")
-print(f"    - URLs: {len(urls)}")
-print(f"    - User Agents: {len(user_agents)}")
-print(f"    - Versiones HTTP: {len(http_versions)}")
-print(f"    - Códigos de estado: {len(status_codes)}")
-print(f"    - Versiones TLS: {len(tls_versions)}")
-print(f"    - Cipher Suites: {len(cipher_suites)}")
-print(f"    - IPs disponibles: {len(ips)}")
-print(f"    - Referers: {len(referers)}")
-print(f"    - Fuentes de log: {len(log_sources)}")
-print()
-
-for i in range(NUM_ROWS):
-    row = {
-        'ip': random.choice(ips),
-        'method': random.choice(methods),
-        'url': random.choice(urls),
-        'http_version': random.choice(http_versions),
-        'status_code': random.choice(status_codes),
-        'response_size': np.random.randint(100, 5000),  # Bytes
-        'referer': random.choice(referers),
-        'user_agent': random.choice(user_agents),
-        'tls_version': random.choice(tls_versions),
-        'cipher_suite': random.choice(cipher_suites),
-        'log_source': random.choice(log_sources),
-        'timestamp': base_time + timedelta(seconds=i*2)  # Incremento de 2 segundos
-    }
-    data.append(row)
-
-    # Mostrar progreso cada 1000 registros
-    if (i + 1) % 1000 == 0:
-        print(f"[*] Progreso: {i + 1}/{NUM_ROWS} registros generados...")
-
-# ==========================================
-# CREAR DATAFRAME Y GUARDAR
-# ==========================================
-df = pd.DataFrame(data)
-df.to_csv(FILENAME, index=False)
-
-print()
-print(f"[✓] Archivo '{FILENAME}' generado exitosamente.")
-print(f"[✓] Total de registros: {len(df)}")
-# Cálculo seguro del tamaño en memoria
-mem_usage = df.memory_usage(deep=True).sum() / (1024 * 1024)
-print(f"[✓] Tamaño del archivo en memoria: {mem_usage:.2f} MB")
-print()
-print("[-] Resumen estadístico:")
-print(f"    - IPs únicas: {df['ip'].nunique()}")
-print(f"    - URLs únicas: {df['url'].nunique()}")
-print(f"    - User Agents únicos: {df['user_agent'].nunique()}")
-print(f"    - Métodos HTTP únicos: {sorted(df['method'].unique())}")
-print(f"    - Rango de códigos de estado: {df['status_code'].min()} - {df['status_code'].max()}")
-print(f"    - Fuentes de log únicas: {df['log_source'].nunique()}")
+import os
+import math
+import time
+import argparse
+import pandas as pd
+import numpy as np
+from datetime import datetime, timezone
+
+# ==========================================
+# CONFIGURACIÓN
+# ==========================================
+NUM_ROWS = 1000000  # Número de registros a generar
+FILENAME = "logs_servidorRAN1.csv"
+TAMANO_TROZO = 100000  # Filas generadas y escritas de una vez
+FORMATOS_SALIDA = ('csv', 'apache')  # CSV de entrenamiento o access.log en Combined
+
+# ==========================================
+# DEFINICIÓN DE DATOS (CONSTANTES)
+# ==========================================
+
+# 1. MÉTODOS HTTP
+methods = [
+    'GET', 'POST', 'PUT', 'DELETE', 'PATCH', 
+    'HEAD', 'OPTIONS', 'CONNECT', 'TRACE'
+]
+
+# 2. URLs Y ENDPOINTS
+urls = [
+    # Páginas principales y públicas
+    '/login', '/logout', '/home', '/index', '/dashboard', '/profile', '/settings', 
+    '/about', '/contact', '/register', '/signup', '/signin', '/reset-password', 
+    '/forgot-password', '/verify-email', '/terms', '/privacy', '/faq', '/help',
+    '/support', '/documentation', '/pricing', '/features', '/demo', '/trial',
+    '/download', '/upload', '/search', '/browse', '/explore', '/discover',
+    
+    # APIs versión 1
+    '/api/v1/users', '/api/v1/users/list', '/api/v1/users/{id}', '/api/v1/users/search',
+    '/api/v1/users/create', '/api/v1/users/update', '/api/v1/users/delete',
+    '/api/v1/auth', '/api/v1/auth/login', '/api/v1/auth/logout', '/api/v1/auth/refresh',
+    '/api/v1/token', '/api/v1/token/verify', '/api/v1/token/revoke',
+    '/api/v1/products', '/api/v1/products/{id}', '/api/v1/products/categories',
+    '/api/v1/products/featured', '/api/v1/products/popular', '/api/v1/products/new',
+    '/api/v1/orders', '/api/v1/orders/{id}', '/api/v1/orders/history', '/api/v1/orders/pending',
+    '/api/v1/payments', '/api/v1/payments/process', '/api/v1/payments/history',
+    '/api/v1/search', '/api/v1/search/advanced', '/api/v1/notifications',
+    '/api/v1/messages', '/api/v1/messages/inbox', '/api/v1/messages/sent',
+    '/api/v1/comments', '/api/v1/comments/{id}', '/api/v1/likes', '/api/v1/shares',
+    '/api/v1/reports', '/api/v1/analytics', '/api/v1/statistics', '/api/v1/metrics',
+    '/api/v1/settings', '/api/v1/preferences', '/api/v1/profile', '/api/v1/avatar',
+    '/api/v1/upload', '/api/v1/download', '/api/v1/export', '/api/v1/import',
+    
+    # APIs versión 2
+    '/api/v2/users', '/api/v2/users/batch', '/api/v2/users/roles', '/api/v2/users/permissions',
+    '/api/v2/analytics', '/api/v2/analytics/dashboard', '/api/v2/analytics/reports',
+    '/api/v2/metrics', '/api/v2/metrics/realtime', '/api/v2/metrics/historical',
+    '/api/v2/logs', '/api/v2/logs/search', '/api/v2/logs/export',
+    '/api/v2/health', '/api/v2/health/check', '/api/v2/status', '/api/v2/version',
+    '/api/v2/config', '/api/v2/config/update', '/api/v2/upload', '/api/v2/download',
+    '/api/v2/files', '/api/v2/files/{id}', '/api/v2/files/metadata',
+    '/api/v2/webhooks', '/api/v2/webhooks/register', '/api/v2/webhooks/test',
+    '/api/v2/integrations', '/api/v2/integrations/oauth', '/api/v2/integrations/callback',
+    
+    # APIs versión 3
+    '/api/v3/graphql', '/api/v3/rest', '/api/v3/streaming', '/api/v3/realtime',
+    '/api/v3/batch', '/api/v3/queue', '/api/v3/jobs', '/api/v3/tasks',
+    
+    # Archivos estáticos
+    '/static/css/style.css', '/static/css/main.css', '/static/css/bootstrap.min.css',
+    '/static/js/app.js', '/static/js/main.js', '/static/js/jquery.min.js',
+    '/static/images/logo.png', '/static/images/hero.png', '/static/images/icon.ico',
+    
+    # Panel de administración
+    '/admin', '/admin/login', '/admin/dashboard', '/admin/users',
+    '/admin/logs', '/admin/settings', '/admin/reports', '/admin/analytics',
+    
+    # Webhooks y callbacks
+    '/webhook/payment', '/webhook/notification', '/callback/oauth',
+    
+    # Rutas sospechosas y de ataques
+    '/admin.php', '/administrator.php', '/wp-admin', '/wp-login.php',
+    '/phpmyadmin', '/.env', '/.git/config', '/shell.php', '/config.php',
+    '/etc/passwd', '/server-status', '/test.php'
+]
+
+# 3. VERSIONES HTTP
+http_versions = [
+    'HTTP/0.9', 'HTTP/1.0', 'HTTP/1.1', 'HTTP/2.0', 'HTTP/3.0', 'SPDY/3.1'
+]
+
+# 4. CÓDIGOS DE ESTADO
+status_codes = [
+    100, 101, 102, 
+    200, 201, 202, 204, 206, 
+    300, 301, 302, 304, 307, 308, 
+    400, 401, 403, 404, 405, 408, 409, 410, 418, 429, 
+    500, 501, 502, 503, 504
+]
+
+# 5. USER AGENTS
+user_agents = [
+    # Chrome
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
+    
+    # Firefox
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:122.0) Gecko/20100101 Firefox/122.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:122.0) Gecko/20100101 Firefox/122.0',
+    
+    # Safari
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Mobile/15E148 Safari/604.1',
+    
+    # Edge
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36 Edg/121.0.0.0',
+    
+    # Android
+    'Mozilla/5.0 (Linux; Android 14; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Mobile Safari/537.36',
+    
+    # Bots - Google
+    'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+    'Googlebot/2.1 (+http://www.google.com/bot.html)',
+    'Googlebot-Image/1.0',
+    'Googlebot-News',
+    'Googlebot-Video/1.0',
+
+    # Bots - Bing & Yahoo
+    'Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)',
+    'Mozilla/5.0 (compatible; Yahoo! Slurp; http://help.yahoo.com/help/us/ysearch/slurp)',
+
+    # Herramientas de desarrollo
+    'curl/8.5.0',
+    'PostmanRuntime/7.36.0',
+    'python-requests/2.31.0',
+    'Apache-HttpClient/4.5.14 (Java/11.0.20)'
+]
+
+# 6. VERSIONES TLS
+tls_versions = [
+    'SSLv2', 'SSLv3', 'TLSv1.0', 'TLSv1.1', 'TLSv1.2', 'TLSv1.3', 'DTLS 1.2', '-'
+]
+
+# 7. CIPHER SUITES
+cipher_suites = [
+    'TLS_AES_128_GCM_SHA256',
+    'TLS_AES_256_GCM_SHA384',
+    'TLS_CHACHA20_POLY1305_SHA256',
+    'ECDHE-RSA-AES128-GCM-SHA256',
+    'ECDHE-RSA-AES256-GCM-SHA384',
+    'ECDHE-ECDSA-AES128-GCM-SHA256',
+    'DHE-RSA-AES256-GCM-SHA384',
+    'AES128-GCM-SHA256',
+    'ECDHE-RSA-RC4-SHA', # Legacy
+    'NULL-SHA256',       # Inseguro
+    '-'
+]
+
+# 8. DIRECCIONES IP (GENERACIÓN)
+# (nombre, nº de IPs, rango de cada octeto); los octetos fijos se dan como (v, v)
+RANGOS_IPS = [
+    ('private_class_a', 100, [(10, 10), (0, 255), (0, 255), (1, 254)]),
+    ('private_class_b', 80, [(172, 172), (16, 31), (0, 255), (1, 254)]),
+    ('private_class_c', 120, [(192, 192), (168, 168), (0, 255), (1, 254)]),
+    ('public_na', 80, [(1, 126), (0, 255), (0, 255), (1, 254)]),
+    ('public_eu', 60, [(128, 191), (0, 255), (0, 255), (1, 254)]),
+    ('public_asia', 60, [(192, 223), (0, 255), (0, 255), (1, 254)]),
+]
+special_ips = ['127.0.0.1', '0.0.0.0', '169.254.1.1']
+known_service_ips = ['8.8.8.8', '1.1.1.1', '208.67.222.222', '104.16.0.0']
+
+
+def generar_ips(rng):
+    """Pool de IPs: privadas, especiales, públicas por región y de servicios conocidos"""
+    grupos = {}
+    for nombre, cantidad, octetos in RANGOS_IPS:
+        columnas = [rng.integers(bajo, alto + 1, cantidad) for bajo, alto in octetos]
+        grupos[nombre] = [f'{a}.{b}.{c}.{d}' for a, b, c, d in zip(*columnas)]
+    return (grupos['private_class_a'] + grupos['private_class_b'] + grupos['private_class_c'] +
+            special_ips + grupos['public_na'] + grupos['public_eu'] + grupos['public_asia'] +
+            known_service_ips)
+
+# 9. REFERRERS
+referers = [
+    'https://www.google.com/', 'https://www.bing.com/', 'https://duckduckgo.com/',
+    'https://www.facebook.com/', 'https://twitter.com/', 'https://www.linkedin.com/',
+    'https://www.instagram.com/', 'https://www.reddit.com/', 'https://www.youtube.com/',
+    'https://stackoverflow.com/', 'https://github.com/', 'https://news.ycombinator.com/',
+    'https://medium.com/', 'direct', '-', 'internal'
+]
+
+# 10. FUENTES DE LOG
+log_sources = [
+    'nginx_access_log', 'nginx_error_log', 'apache_access_log', 'iis_access_log',
+    'haproxy_log', 'aws_alb_log', 'cloudfront_log', 'cloudflare_log',
+    'firewall_log', 'waf_log', 'fail2ban_log',
+    'application_log', 'django_log', 'nodejs_log', 'auth_log', 'syslog',
+    'mysql_slow_query_log', 'postgres_log', 'docker_log', 'kubernetes_log'
+]
+
+# 11. TRÁFICO DE ATAQUE (inyección opcional, para conjuntos de evaluación etiquetados)
+suspicious_urls = [
+    '/admin.php', '/administrator.php', '/wp-admin', '/wp-login.php',
+    '/phpmyadmin', '/.env', '/.git/config', '/shell.php', '/config.php',
+    '/etc/passwd', '/server-status', '/test.php',
+    "/search?q=%27%20OR%20%271%27=%271", '/index.php?page=../../../../etc/passwd',
+    '/api/v1/users?id=1%20UNION%20SELECT%20password%20FROM%20users',
+    '/?q=%3Cscript%3Ealert(1)%3C/script%3E', '/cgi-bin/.%2e/.%2e/.%2e/bin/sh'
+]
+scanner_agents = [
+    'sqlmap/1.7.2#stable (https://sqlmap.org)',
+    'Mozilla/5.00 (Nikto/2.5.0) (Evasions:None) (Test:000001)',
+    'Mozilla/5.0 (compatible; Nmap Scripting Engine; https://nmap.org/book/nse.html)',
+    'masscan/1.3 (https://github.com/robertdavidgraham/masscan)',
+    'gobuster/3.6',
+    'WPScan v3.8.25 (https://wpscan.com/wordpress-security-scanner)'
+]
+client_error_codes = [400, 401, 403, 404, 405, 429]
+
+TIPOS_ATAQUE = ('rutas_sospechosas', 'escaner', 'tormenta_4xx')
+
+PERFILES_RITMO = ('constante', 'rafagas', 'sinusoidal')
+
+COLUMNAS = ['ip', 'method', 'url', 'http_version', 'status_code', 'response_size', 'referer',
+            'user_agent', 'tls_version', 'cipher_suite', 'log_source', 'timestamp']
+
+# ==========================================
+# GENERAR DATOS
+# ==========================================
+def _elegir(rng, valores, n):
+    """Muestreo uniforme con reemplazo (equivalente vectorizado de random.choice)"""
+    valores = np.asarray(valores, dtype=object if isinstance(valores[0], str) else None)
+    return valores[rng.integers(0, len(valores), n)]
+
+
+def generar_columnas(rng, inicio, n, base_time, ips):
+    """Columnas de las filas [inicio, inicio + n) como arrays; una fila cada 2 segundos"""
+    return {
+        'ip': _elegir(rng, ips, n),
+        'method': _elegir(rng, methods, n),
+        'url': _elegir(rng, urls, n),
+        'http_version': _elegir(rng, http_versions, n),
+        'status_code': _elegir(rng, status_codes, n),
+        'response_size': rng.integers(100, 5000, n),  # Bytes
+        'referer': _elegir(rng, referers, n),
+        'user_agent': _elegir(rng, user_agents, n),
+        'tls_version': _elegir(rng, tls_versions, n),
+        'cipher_suite': _elegir(rng, cipher_suites, n),
+        'log_source': _elegir(rng, log_sources, n),
+        'timestamp': base_time + pd.to_timedelta(np.arange(inicio, inicio + n) * 2, unit='s'),
+    }
+
+
+def inyectar_ataques(rng, columnas, fraccion, tipos=TIPOS_ATAQUE, rafaga=(20, 200)):
+    """Sustituye ~`fraccion` de las filas por ráfagas de ataque y añade `label`/`attack_type`.
+
+    Cada ráfaga son filas consecutivas de una IP atacante nueva:
+    'rutas_sospechosas' (rutas sensibles y payloads), 'escaner' (User-Agent de
+    herramienta, mayoría de 404) o 'tormenta_4xx' (solo errores de cliente).
+    """
+    n = len(columnas['ip'])
+    etiquetas = np.zeros(n, dtype=np.int8)
+    tipo_ataque = np.full(n, 'normal', dtype=object)
+    objetivo = int(round(n * fraccion))
+    asignadas = 0
+    while asignadas < objetivo:
+        largo = int(min(rng.integers(rafaga[0], rafaga[1] + 1), objetivo - asignadas, n))
+        desde = int(rng.integers(0, n - largo + 1))
+        filas = slice(desde, desde + largo)
+        tipo = tipos[rng.integers(0, len(tipos))]
+
+        columnas['ip'][filas] = '.'.join(str(o) for o in (rng.integers(1, 224), *rng.integers(0, 256, 2), rng.integers(1, 255)))
+        columnas['referer'][filas] = '-'
+        if tipo == 'rutas_sospechosas':
+            columnas['url'][filas] = _elegir(rng, suspicious_urls, largo)
+            columnas['method'][filas] = _elegir(rng, ['GET', 'POST'], largo)
+            columnas['status_code'][filas] = _elegir(rng, [200, 403, 404, 500], largo)
+        elif tipo == 'escaner':
+            columnas['user_agent'][filas] = scanner_agents[rng.integers(0, len(scanner_agents))]
+            columnas['url'][filas] = _elegir(rng, urls + suspicious_urls, largo)
+            columnas['status_code'][filas] = _elegir(rng, [404, 404, 404, 403, 301, 200], largo)
+        elif tipo == 'tormenta_4xx':
+            columnas['status_code'][filas] = _elegir(rng, client_error_codes, largo)
+            columnas['response_size'][filas] = rng.integers(0, 600, largo)
+        else:
+            raise ValueError(f"Tipo de ataque desconocido: '{tipo}'. Opciones: {TIPOS_ATAQUE}")
+
+        etiquetas[filas] = 1
+        tipo_ataque[filas] = tipo
+        asignadas += largo
+
+    columnas['label'] = etiquetas
+    columnas['attack_type'] = tipo_ataque
+    return columnas
+
+
+# Meses en inglés fijos: %b depende del locale y Apache siempre escribe Jan, Feb...
+_MESES = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def fecha_apache(momento):
+    """Fecha en el formato de %t de Apache (sin corchetes), p. ej. 10/Oct/2024:13:55:36 +0000"""
+    return f"{momento.day:02d}/{_MESES[momento.month - 1]}/{momento:%Y:%H:%M:%S} +0000"
+
+
+def partes_combined(columnas, con_tls=False):
+    """Cada línea Combined partida en (antes, después) de la fecha, para poder fecharla al escribirla"""
+    antes = [f'{ip} - - [' for ip in columnas['ip']]
+    despues = [
+        f'] "{m} {u} {v}" {s} {b} "{r}" "{a}"'
+        for m, u, v, s, b, r, a in zip(columnas['method'], columnas['url'], columnas['http_version'],
+                                       columnas['status_code'], columnas['response_size'],
+                                       columnas['referer'], columnas['user_agent'])
+    ]
+    if con_tls:
+        # %{SSL_PROTOCOL}x %{SSL_CIPHER}x al final (FORMATO_COMBINED_SSL); sin espacios, como en
+        # Apache, o el parser los partiría ('DTLS 1.2' -> 'DTLS1.2')
+        despues = [f"{d} {t.replace(' ', '')} {c}"
+                   for d, t, c in zip(despues, columnas['tls_version'], columnas['cipher_suite'])]
+    return antes, despues
+
+
+def lineas_combined(columnas, con_tls=False):
+    """Líneas de access.log en Combined con la fecha de la columna timestamp"""
+    antes, despues = partes_combined(columnas, con_tls)
+    # Timestamps equiespaciados: basta formatear cada segundo distinto una vez
+    fechas = {}
+    lineas = []
+    for a, d, t in zip(antes, despues, columnas['timestamp']):
+        fecha = fechas.get(t)
+        if fecha is None:
+            fecha = fechas[t] = fecha_apache(t)
+        lineas.append(a + fecha + d)
+    return lineas
+
+
+def generar_logs(filas, salida, semilla=None, tamano_trozo=TAMANO_TROZO, fraccion_ataques=0.0,
+                 tipos_ataque=TIPOS_ATAQUE, rafaga=(20, 200), base_time=None, formato='csv', con_tls=False):
+    """Genera `filas` registros por trozos y los va añadiendo a `salida`.
+
+    `formato='csv'` escribe el CSV de entrenamiento; `'apache'`, un access.log en
+    Combined (las etiquetas de ataque van aparte, a `<salida>.etiquetas.csv`).
+    Con la misma semilla y el mismo tamaño de trozo el fichero es idéntico.
+    Devuelve un resumen con los valores únicos vistos.
+    """
+    if formato not in FORMATOS_SALIDA:
+        raise ValueError(f"Formato de salida desconocido: '{formato}'. Opciones: {FORMATOS_SALIDA}")
+    rng = np.random.default_rng(semilla)
+    ips = generar_ips(rng)
+    base_time = pd.Timestamp(base_time) if base_time is not None else pd.Timestamp(datetime.now())
+
+    resumen = {'ip': set(), 'url': set(), 'user_agent': set(), 'method': set(), 'log_source': set(),
+               'status_min': None, 'status_max': None, 'ataques': 0, 'filas': 0}
+    for inicio in range(0, filas, tamano_trozo):
+        n = min(tamano_trozo, filas - inicio)
+        columnas = generar_columnas(rng, inicio, n, base_time, ips)
+        if fraccion_ataques > 0:
+            inyectar_ataques(rng, columnas, fraccion_ataques, tipos_ataque, rafaga)
+            resumen['ataques'] += int(columnas['label'].sum())
+
+        modo = 'w' if inicio == 0 else 'a'
+        if formato == 'csv':
+            pd.DataFrame(columnas).to_csv(salida, mode=modo, header=inicio == 0, index=False)
+        else:
+            with open(salida, modo, encoding='utf-8') as f:
+                f.write('\n'.join(lineas_combined(columnas, con_tls)))
+                f.write('\n')
+            if fraccion_ataques > 0:
+                etiquetas = pd.DataFrame({'label': columnas['label'], 'attack_type': columnas['attack_type']})
+                etiquetas.to_csv(f'{salida}.etiquetas.csv', mode=modo, header=inicio == 0, index=False)
+
+        for col in ('ip', 'url', 'user_agent', 'method', 'log_source'):
+            resumen[col].update(columnas[col])
+        minimo, maximo = int(columnas['status_code'].min()), int(columnas['status_code'].max())
+        resumen['status_min'] = minimo if resumen['status_min'] is None else min(resumen['status_min'], minimo)
+        resumen['status_max'] = maximo if resumen['status_max'] is None else max(resumen['status_max'], maximo)
+        resumen['filas'] += n
+        print(f"[*] Progreso: {inicio + n}/{filas} registros generados...")
+    return resumen
+
+
+def ritmo_perfil(perfil, ritmo, t, periodo=60.0, factor=5.0, duracion_rafaga=5.0):
+    """Líneas/s objetivo en el segundo `t`: base `ritmo` y picos de `ritmo * factor`.
+
+    'rafagas' sube al pico durante `duracion_rafaga` s al inicio de cada
+    `periodo`; 'sinusoidal' oscila suavemente entre base y pico con ese periodo.
+    """
+    if perfil == 'constante':
+        return ritmo
+    if perfil == 'rafagas':
+        return ritmo * factor if t % periodo < duracion_rafaga else ritmo
+    if perfil == 'sinusoidal':
+        return ritmo * (1 + (factor - 1) * (1 - math.cos(2 * math.pi * t / periodo)) / 2)
+    raise ValueError(f"Perfil de ritmo desconocido: '{perfil}'. Opciones: {PERFILES_RITMO}")
+
+
+class FuenteLineas:
+    """Líneas Combined sin fin, generadas por trozos y fechadas en el momento de escribirlas"""
+
+    def __init__(self, semilla=None, tamano_trozo=10000, con_tls=False, fraccion_ataques=0.0,
+                 tipos_ataque=TIPOS_ATAQUE, rafaga=(20, 200)):
+        self.rng = np.random.default_rng(semilla)
+        self.ips = generar_ips(self.rng)
+        self.tamano_trozo = tamano_trozo
+        self.con_tls = con_tls
+        self.fraccion_ataques = fraccion_ataques
+        self.tipos_ataque = tipos_ataque
+        self.rafaga = rafaga
+        self.generadas = 0
+        self._antes = self._despues = ()
+        self._pos = 0
+
+    def _nuevo_trozo(self):
+        columnas = generar_columnas(self.rng, self.generadas, self.tamano_trozo, pd.Timestamp(0), self.ips)
+        if self.fraccion_ataques > 0:
+            inyectar_ataques(self.rng, columnas, self.fraccion_ataques, self.tipos_ataque, self.rafaga)
+        self._antes, self._despues = partes_combined(columnas, self.con_tls)
+        self._pos = 0
+        self.generadas += self.tamano_trozo
+
+    def tomar(self, n, fecha):
+        """Las `n` líneas siguientes, todas con la fecha `fecha` (ya en formato de Apache)"""
+        lineas = []
+        while len(lineas) < n:
+            if self._pos >= len(self._antes):
+                self._nuevo_trozo()
+            fin = min(len(self._antes), self._pos + n - len(lineas))
+            lineas.extend(a + fecha + d for a, d in zip(self._antes[self._pos:fin], self._despues[self._pos:fin]))
+            self._pos = fin
+        return lineas
+
+
+def escribir_en_vivo(salida, fuente, ritmo, perfil='constante', duracion=None, periodo=60.0, factor=5.0,
+                     duracion_rafaga=5.0, intervalo=0.05, al_escribir=None, detener=None):
+    """Añade líneas de `fuente` a `salida` al ritmo del perfil, como un access.log que crece.
+
+    Cada `intervalo` s escribe (y vacía a disco) las líneas que tocan según el
+    tiempo transcurrido, arrastrando la fracción sobrante. Tras cada escritura
+    llama a `al_escribir(total_escritas, time.monotonic())`. Termina tras
+    `duracion` s, al activarse el Event `detener` o con Ctrl+C. Devuelve el
+    total de líneas escritas.
+    """
+    escritas = 0
+    pendiente = 0.0
+    inicio = anterior = siguiente = time.monotonic()
+    ultimo_informe = inicio
+    with open(salida, 'a', encoding='utf-8') as f:
+        try:
+            while (duracion is None or anterior - inicio < duracion) and not (detener and detener.is_set()):
+                siguiente += intervalo
+                time.sleep(max(0.0, siguiente - time.monotonic()))
+                ahora = time.monotonic()
+                if duracion is not None:
+                    ahora = min(ahora, inicio + duracion)
+                pendiente += ritmo_perfil(perfil, ritmo, ahora - inicio, periodo, factor, duracion_rafaga) * (ahora - anterior)
+                anterior = ahora
+                n = int(pendiente)
+                if not n:
+                    continue
+                pendiente -= n
+                f.write('\n'.join(fuente.tomar(n, fecha_apache(datetime.now(timezone.utc)))))
+                f.write('\n')
+                f.flush()
+                escritas += n
+                if al_escribir:
+                    al_escribir(escritas, time.monotonic())
+                if ahora - ultimo_informe >= 5:
+                    print(f"[*] {escritas} líneas escritas ({escritas / (ahora - inicio):.0f} líneas/s de media)")
+                    ultimo_informe = ahora
+        except KeyboardInterrupt:
+            pass
+    return escritas
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generador de logs simulados: CSV de entrenamiento o access.log de Apache')
+    parser.add_argument('--filas', type=int, default=NUM_ROWS, help='Número de registros a generar')
+    parser.add_argument('--salida', default=FILENAME, help='Ruta del fichero de salida')
+    parser.add_argument('--formato', choices=FORMATOS_SALIDA, default='csv',
+                        help='csv (entrenamiento) o apache (access.log en Combined Log Format)')
+    parser.add_argument('--tls', action='store_true',
+                        help='En formato apache, añade %%{SSL_PROTOCOL}x %%{SSL_CIPHER}x al final de cada línea')
+    parser.add_argument('--semilla', type=int, default=None, help='Semilla para reproducir el mismo fichero')
+    parser.add_argument('--tamano-trozo', type=int, default=TAMANO_TROZO)
+    parser.add_argument('--inicio', default=None, help='Timestamp de la primera fila (por defecto, ahora)')
+    parser.add_argument('--fraccion-ataques', type=float, default=0.0,
+                        help='Fracción de filas sustituidas por ráfagas de ataque (añade label y attack_type)')
+    parser.add_argument('--tipos-ataque', default=','.join(TIPOS_ATAQUE),
+                        help=f'Tipos de ataque separados por comas: {", ".join(TIPOS_ATAQUE)}')
+    parser.add_argument('--rafaga', type=int, nargs=2, default=[20, 200], metavar=('MIN', 'MAX'),
+                        help='Longitud mínima y máxima de cada ráfaga de ataque')
+    vivo = parser.add_argument_group('modo en vivo', 'Añade líneas Combined a --salida a un ritmo dado')
+    vivo.add_argument('--en-vivo', action='store_true', help='Escribir como un access.log que crece')
+    vivo.add_argument('--ritmo', type=float, default=100.0, help='Líneas/s base')
+    vivo.add_argument('--perfil', choices=PERFILES_RITMO, default='constante')
+    vivo.add_argument('--factor-pico', type=float, default=5.0, help='Ritmo de pico = ritmo * factor')
+    vivo.add_argument('--periodo', type=float, default=60.0, help='Segundos entre picos')
+    vivo.add_argument('--duracion-pico', type=float, default=5.0, help='Segundos de cada ráfaga (perfil rafagas)')
+    vivo.add_argument('--duracion', type=float, default=None, help='Segundos de escritura (por defecto, hasta Ctrl+C)')
+    args = parser.parse_args()
+
+    tipos = tuple(t.strip() for t in args.tipos_ataque.split(',') if t.strip())
+    desconocidos = set(tipos) - set(TIPOS_ATAQUE)
+    if desconocidos:
+        parser.error(f"Tipos de ataque desconocidos: {sorted(desconocidos)}. Opciones: {TIPOS_ATAQUE}")
+
+    if args.en_vivo:
+        fuente = FuenteLineas(args.semilla, con_tls=args.tls, fraccion_ataques=args.fraccion_ataques,
+                              tipos_ataque=tipos, rafaga=tuple(args.rafaga))
+        print(f"[+] Escribiendo en vivo en '{args.salida}': {args.ritmo:.0f} líneas/s, perfil '{args.perfil}'"
+              + (f" (pico x{args.factor_pico:g} cada {args.periodo:g}s)" if args.perfil != 'constante' else ''))
+        escritas = escribir_en_vivo(args.salida, fuente, args.ritmo, args.perfil, args.duracion, args.periodo,
+                                    args.factor_pico, args.duracion_pico)
+        print(f"[✓] {escritas} líneas añadidas a '{args.salida}'")
+        return
+
+    print(f"[+] Generando {args.filas} registros de logs simulados...")
+    print(f"[+] Datos expandidos con categorías masivas:")
+    print(f"    - Métodos HTTP: {len(methods)}")
+    print(f"    - URLs: {len(urls)}")
+    print(f"    - User Agents: {len(user_agents)}")
+    print(f"    - Versiones HTTP: {len(http_versions)}")
+    print(f"    - Códigos de estado: {len(status_codes)}")
+    print(f"    - Versiones TLS: {len(tls_versions)}")
+    print(f"    - Cipher Suites: {len(cipher_suites)}")
+    print(f"    - IPs disponibles: {sum(c for _, c, _ in RANGOS_IPS) + len(special_ips) + len(known_service_ips)}")
+    print(f"    - Referers: {len(referers)}")
+    print(f"    - Fuentes de log: {len(log_sources)}")
+    if args.fraccion_ataques > 0:
+        print(f"    - Ataques: {args.fraccion_ataques:.1%} de las filas ({', '.join(tipos)})")
+    print()
+
+    resumen = generar_logs(args.filas, args.salida, args.semilla, args.tamano_trozo, args.fraccion_ataques,
+                           tipos, tuple(args.rafaga), args.inicio, args.formato, args.tls)
+
+    print()
+    print(f"[✓] Archivo '{args.salida}' generado exitosamente.")
+    print(f"[✓] Total de registros: {resumen['filas']}")
+    print(f"[✓] Tamaño del archivo en disco: {os.path.getsize(args.salida) / (1024 * 1024):.2f} MB")
+    print()
+    print("[-] Resumen estadístico:")
+    print(f"    - IPs únicas: {len(resumen['ip'])}")
+    print(f"    - URLs únicas: {len(resumen['url'])}")
+    print(f"    - User Agents únicos: {len(resumen['user_agent'])}")
+    print(f"    - Métodos HTTP únicos: {sorted(resumen['method'])}")
+    print(f"    - Rango de códigos de estado: {resumen['status_min']} - {resumen['status_max']}")
+    print(f"    - Fuentes de log únicas: {len(resumen['log_source'])}")
+    if args.fraccion_ataques > 0:
+        print(f"    - Filas de ataque (label=1): {resumen['ataques']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,19 @@ import pandas as pd
 import numpy as np
 import joblib
 import os
+import math
+import time
+import shutil
+import resource
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.preprocessing import MinMaxScaler, LabelEncoder
-from sklearn.model_selection import train_test_split
 import matplotlib
 matplotlib.use('Agg')  # Backend sin GUI
 import matplotlib.pyplot as plt
+from cache_datos import CacheDatos, huella_fichero
+from codificacion import COLUMNAS_ALTA_CARDINALIDAD, CodificadorHash, numero_codigos
+from inferencia import errores_reconstruccion
+from umbral_adaptativo import estadisticas_validacion, guardar_json, ruta_estadisticas_umbral
 
 # --- CONFIGURACIÓN TENSORFLOW Y GPU ---
 import tensorflow as tf
@@ -70,43 +78,91 @@ MODEL_NAME = 'modelo_logs_3.h5'
 SCALER_FILE = 'scaler_logs_3.joblib'
 ENCODERS_FILE = 'encoders_logs_3.joblib'
 TIMESTEPS = 10 
+BATCH_SIZE = 32
+
+# Modo streaming: CSV por trozos y ventanas generadas al vuelo (ENTRENAMIENTO_STREAMING=1)
+STREAMING = os.getenv('ENTRENAMIENTO_STREAMING', '0') == '1'
+TAMANO_CHUNK = int(os.getenv('TAMANO_CHUNK', '100000'))
+MATRIZ_FILE = 'datos_escalados_3.npy'
+
+# Caché del dataset preprocesado (matriz + encoders + scaler), por huella del CSV y configuración
+USAR_CACHE = os.getenv('CACHE_DATOS', '1') == '1'
+CACHE_DIR = os.getenv('CACHE_DATOS_DIR', 'cache_datos')
+REFRESCAR_CACHE = os.getenv('CACHE_DATOS_REFRESCAR', '0') == '1'
+# Subir si cambia cualquier detalle del preprocesado que no esté en configuracion_preprocesado()
+VERSION_PREPROCESADO = 2
+
+# Experimentos rápidos: una de cada PASO_VENTANAS ventanas y, de ellas, una fracción aleatoria
+PASO_VENTANAS = int(os.getenv('PASO_VENTANAS', '1'))
+FRACCION_VENTANAS = float(os.getenv('FRACCION_VENTANAS', '1.0'))
+
+CATEGORICAL_COLS = ['ip', 'method', 'url', 'http_version', 'referer',
+                    'user_agent', 'tls_version', 'cipher_suite', 'log_source']
+NUMERICAL_COLS = ['status_code', 'response_size']
+# Las categóricas se leen como texto en los dos modos: un entero con huecos no
+# pasa a float ('2.0' en lugar de '2') y el encoder ve el valor tal como está en el CSV
+DTYPES_CSV = {col: str for col in CATEGORICAL_COLS}
+
+# Codificación de las columnas de alta cardinalidad: 'label' (LabelEncoder, vocabulario completo)
+# o 'hash' (CodificadorHash: HASH_TOP_K valores frecuentes + HASH_CUBETAS cubetas, tamaño fijo)
+CODIFICACION = os.getenv('CODIFICACION_CATEGORICAS', 'label')
+HASH_TOP_K = int(os.getenv('HASH_TOP_K', '1024'))
+HASH_CUBETAS = int(os.getenv('HASH_CUBETAS', '4096'))
+
+
+def crear_encoder(col):
+    """Encoder sin ajustar de una columna categórica según CODIFICACION"""
+    if CODIFICACION == 'hash' and col in COLUMNAS_ALTA_CARDINALIDAD:
+        return CodificadorHash(HASH_TOP_K, HASH_CUBETAS)
+    return LabelEncoder()
+
+
+def texto_categorica(serie):
+    """Columna categórica como texto; los huecos quedan como 'nan' en cualquier versión de pandas"""
+    return serie.fillna('nan').astype(str)
+
+
+def ajustar_scaler(extremos_por_columna, feature_cols):
+    """MinMaxScaler ajustado con el [mínimo, máximo] de cada columna"""
+    scaler = MinMaxScaler()
+    scaler.fit(pd.DataFrame({col: extremos_por_columna[col] for col in feature_cols}))
+    return scaler
+
 
 def cargar_y_preprocesar_datos(filepath):
     print(f"[*] Cargando datos desde {filepath}...")
     try:
         if filepath.endswith('.csv'):
-            df = pd.read_csv(filepath)
+            df = pd.read_csv(filepath, dtype=DTYPES_CSV)
         elif filepath.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(filepath)
+            df = pd.read_excel(filepath, dtype=DTYPES_CSV)
         else:
             print("[*] Extensión desconocida, intentando leer como CSV...")
-            df = pd.read_csv(filepath)
+            df = pd.read_csv(filepath, dtype=DTYPES_CSV)
             
     except Exception as e:
         print(f"[!] Error leyendo el archivo de datos: {e}")
         print("    Sugerencia: Si es un CSV, revisa el separador (coma vs punto y coma).")
         exit()
 
-    # 1. Ordenar por tiempo
+    # 1. Ordenar por tiempo (estable: las líneas del mismo instante conservan el orden del fichero)
     if 'timestamp' in df.columns:
         df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
         df = df.dropna(subset=['timestamp'])
-        df = df.sort_values('timestamp')
+        df = df.sort_values('timestamp', kind='stable')
         df = df.drop(columns=['timestamp'])
     
     # 2. Manejo de columnas categóricas
-    categorical_cols = ['ip', 'method', 'url', 'http_version', 'referer', 
-                        'user_agent', 'tls_version', 'cipher_suite', 'log_source']
-    
-    numerical_cols = ['status_code', 'response_size']
+    categorical_cols = CATEGORICAL_COLS
+    numerical_cols = NUMERICAL_COLS
 
     encoders = {}
     
     print("[*] Codificando columnas categóricas...")
     for col in categorical_cols:
         if col in df.columns:
-            df[col] = df[col].astype(str)
-            le = LabelEncoder()
+            df[col] = texto_categorica(df[col])
+            le = crear_encoder(col)
             df[col] = le.fit_transform(df[col])
             encoders[col] = le
 
@@ -121,7 +177,15 @@ def cargar_y_preprocesar_datos(filepath):
         print(f"    Columnas disponibles en el archivo: {list(df.columns)}")
         exit()
 
-    data_scaled = scaler.fit_transform(df[feature_cols])
+    if any(isinstance(le, CodificadorHash) for le in encoders.values()):
+        # Con hashing el rango es el de todos los códigos posibles, no solo los vistos
+        extremos = {col: [df[col].min(), df[col].max()] for col in feature_cols}
+        extremos.update({col: [0, numero_codigos(le) - 1] for col, le in encoders.items() if col in feature_cols})
+        scaler = ajustar_scaler(extremos, feature_cols)
+        scaler.n_samples_seen_ = len(df)
+        data_scaled = scaler.transform(df[feature_cols])
+    else:
+        data_scaled = scaler.fit_transform(df[feature_cols])
     
     joblib.dump(scaler, SCALER_FILE)
     joblib.dump(encoders, ENCODERS_FILE)
@@ -130,11 +194,406 @@ def cargar_y_preprocesar_datos(filepath):
     return data_scaled, len(feature_cols)
 
 def crear_secuencias(data, time_steps=10):
+    """Ventanas (n, time_steps, features) como vista de solo lectura sobre `data`, sin copiar.
+
+    Mismas ventanas que la versión con bucle: empiezan en 0..len(data)-time_steps-1.
+    """
     print(f"[*] Creando secuencias con ventana de tiempo = {time_steps}...")
-    sequences = []
-    for i in range(len(data) - time_steps):
-        sequences.append(data[i:(i + time_steps)])
-    return np.array(sequences)
+    n_ventanas = max(0, len(data) - time_steps)
+    if n_ventanas == 0:
+        return np.empty((0, time_steps, data.shape[1]), dtype=data.dtype)
+    return sliding_window_view(data, time_steps, axis=0).transpose(0, 2, 1)[:n_ventanas]
+
+def seleccionar_ventanas(n_ventanas, paso=1, fraccion=1.0, semilla=42):
+    """Índices de las ventanas a usar (orden cronológico): una de cada `paso` y una fracción de ellas"""
+    indices = np.arange(0, n_ventanas, max(1, paso))
+    if fraccion < 1.0:
+        rng = np.random.default_rng(semilla)
+        indices = np.sort(rng.choice(indices, size=max(1, int(len(indices) * fraccion)), replace=False))
+    return indices
+
+# --- MODO STREAMING ---
+class MedidorMemoria:
+    """Pico de memoria del proceso por etapas.
+
+    En Linux muestrea RssAnon (memoria propia del proceso, la que provoca el
+    OOM); las páginas de la matriz en disco (memmap) no cuentan porque el
+    kernel puede liberarlas. `ru_maxrss` se muestra como referencia.
+    """
+
+    def __init__(self):
+        self.pico_mb = 0.0
+        self.etapa_pico = None
+
+    @staticmethod
+    def rss_anonimo_mb():
+        try:
+            with open('/proc/self/status') as f:
+                for linea in f:
+                    if linea.startswith('RssAnon:'):
+                        return int(linea.split()[1]) / 1024
+        except OSError:
+            pass
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    def muestrear(self, etapa):
+        actual = self.rss_anonimo_mb()
+        if actual > self.pico_mb:
+            self.pico_mb = actual
+            self.etapa_pico = etapa
+        return actual
+
+    def informe(self):
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"[*] Pico de memoria anónima: {self.pico_mb:.1f} MB (en '{self.etapa_pico}'); ru_maxrss: {maxrss:.1f} MB")
+
+
+def _leer_csv_por_trozos(filepath, usecols=None):
+    return pd.read_csv(filepath, chunksize=TAMANO_CHUNK, usecols=usecols, dtype=DTYPES_CSV)
+
+
+def _marcas_validas(trozo):
+    """(máscara de filas con timestamp válido, sus timestamps en ns como int64)"""
+    marcas = pd.to_datetime(trozo['timestamp'], errors='coerce')
+    validas = marcas.notna().to_numpy()
+    return validas, marcas.to_numpy()[validas].astype('datetime64[ns]').view(np.int64)
+
+
+def mezclar_tramos(marcas, filas, limites, destino, filas_en_memoria=TAMANO_CHUNK):
+    """Mezcla k tramos ordenados de `filas` en `destino` con el orden de un sort estable global.
+
+    `limites` son los (inicio, fin) de cada tramo, en el orden del fichero, y
+    cada tramo viene ordenado de forma estable por `marcas`. Los empates se
+    resuelven por (tramo, posición), que es el orden original de las filas.
+    En cada vuelta se carga un bloque de cada tramo (unas `filas_en_memoria`
+    filas en total) y se emite todo lo que no supera la frontera: el menor
+    último elemento de los bloques que no agotan su tramo.
+    """
+    punteros = [inicio for inicio, _ in limites]
+    salida = 0
+    while True:
+        activos = [t for t, (_, fin) in enumerate(limites) if punteros[t] < fin]
+        if not activos:
+            break
+        tamano_bloque = max(1, filas_en_memoria // len(activos))
+        bloques = {}
+        frontera = None
+        for t in activos:
+            fin_bloque = min(punteros[t] + tamano_bloque, limites[t][1])
+            bloques[t] = np.asarray(marcas[punteros[t]:fin_bloque])
+            if fin_bloque < limites[t][1]:
+                ultimo = (int(bloques[t][-1]), t, fin_bloque - 1)
+                frontera = ultimo if frontera is None else min(frontera, ultimo)
+
+        claves, tramos, posiciones, trozos = [], [], [], []
+        for t in activos:
+            bloque = bloques[t]
+            if frontera is None:
+                n = len(bloque)
+            else:
+                # Filas con (marca, tramo, posición) <= frontera: un prefijo del bloque.
+                # Los empates con la frontera entran solo desde los tramos anteriores o el suyo
+                lado = 'right' if t <= frontera[1] else 'left'
+                n = int(np.searchsorted(bloque, frontera[0], side=lado))
+            if n == 0:
+                continue
+            claves.append(bloque[:n])
+            tramos.append(np.full(n, t, dtype=np.int64))
+            posiciones.append(np.arange(punteros[t], punteros[t] + n, dtype=np.int64))
+            trozos.append(np.asarray(filas[punteros[t]:punteros[t] + n]))
+            punteros[t] += n
+
+        orden = np.lexsort((np.concatenate(posiciones), np.concatenate(tramos), np.concatenate(claves)))
+        emitidas = np.concatenate(trozos)[orden]
+        destino[salida:salida + len(emitidas)] = emitidas
+        salida += len(emitidas)
+    return salida
+
+
+def preprocesar_por_trozos(filepath, ruta_matriz=MATRIZ_FILE, medidor=None):
+    """Versión out-of-core de `cargar_y_preprocesar_datos`.
+
+    Dos pasadas por el CSV a trozos de TAMANO_CHUNK filas, con los mismos
+    tipos que la lectura en memoria (DTYPES_CSV):
+      1. Vocabulario de cada categórica, mínimo/máximo de las numéricas y
+         número de filas con timestamp válido.
+      2. Codifica y escala cada trozo, lo ordena (estable) por timestamp y lo
+         escribe como un tramo ordenado en un fichero temporal; después
+         `mezclar_tramos` los combina en la matriz final, en el mismo orden
+         que el sort estable de la versión en memoria.
+    La memoria no depende del número de filas (trozos de TAMANO_CHUNK y
+    vocabularios); en disco hacen falta temporalmente unas dos veces la matriz.
+    Devuelve la matriz (memmap de solo lectura) y el número de features.
+    """
+    medidor = medidor or MedidorMemoria()
+    print(f"[*] Preprocesando {filepath} por trozos de {TAMANO_CHUNK} filas...")
+
+    columnas = list(pd.read_csv(filepath, nrows=0).columns)
+    feature_cols = [c for c in columnas if c in CATEGORICAL_COLS or c in NUMERICAL_COLS]
+    if not feature_cols:
+        print("[!] Error: No se encontraron columnas válidas para entrenar.")
+        print(f"    Columnas disponibles en el archivo: {columnas}")
+        exit()
+    con_tiempo = 'timestamp' in columnas
+    categoricas = [c for c in feature_cols if c in CATEGORICAL_COLS]
+    numericas = [c for c in feature_cols if c in NUMERICAL_COLS]
+
+    # Pasada 1: vocabularios (o recuentos de los CodificadorHash), rangos y número de filas
+    encoders = {col: crear_encoder(col) for col in categoricas}
+    vocabularios = {col: set() for col in categoricas if not isinstance(encoders[col], CodificadorHash)}
+    minimos = {col: np.inf for col in numericas}
+    maximos = {col: -np.inf for col in numericas}
+    n_filas = 0
+    for trozo in _leer_csv_por_trozos(filepath):
+        if con_tiempo:
+            trozo = trozo[_marcas_validas(trozo)[0]]
+        n_filas += len(trozo)
+        for col in categoricas:
+            if col in vocabularios:
+                vocabularios[col].update(texto_categorica(trozo[col]).unique())
+            else:
+                encoders[col].contar(texto_categorica(trozo[col]))
+        for col in numericas:
+            minimos[col] = min(minimos[col], trozo[col].min())
+            maximos[col] = max(maximos[col], trozo[col].max())
+        medidor.muestrear('pasada 1')
+
+    for col, le in encoders.items():
+        if col in vocabularios:
+            le.fit(np.array(sorted(vocabularios[col]), dtype=object))
+        else:
+            le.ajustar()
+    del vocabularios
+
+    # Cada categórica codificada va de 0 a numero_codigos - 1: el scaler se ajusta con los extremos
+    scaler = ajustar_scaler({
+        col: ([0, numero_codigos(encoders[col]) - 1] if col in encoders else [minimos[col], maximos[col]])
+        for col in feature_cols
+    }, feature_cols)
+    scaler.n_samples_seen_ = n_filas
+
+    # Pasada 2: codificar y escalar cada trozo; con timestamp, cada trozo es un tramo ordenado
+    forma = (n_filas, len(feature_cols))
+    matriz = np.lib.format.open_memmap(ruta_matriz, mode='w+', dtype=np.float32, shape=forma)
+    if con_tiempo:
+        ruta_tramos, ruta_marcas = ruta_matriz + '.tramos.npy', ruta_matriz + '.marcas.npy'
+        tramos = np.lib.format.open_memmap(ruta_tramos, mode='w+', dtype=np.float32, shape=forma)
+        marcas = np.lib.format.open_memmap(ruta_marcas, mode='w+', dtype=np.int64, shape=(n_filas,))
+        limites = []
+    inicio = 0
+    for trozo in _leer_csv_por_trozos(filepath):
+        if con_tiempo:
+            validas, tiempos = _marcas_validas(trozo)
+            trozo = trozo[validas]
+        trozo = trozo[feature_cols].copy()
+        for col in categoricas:
+            trozo[col] = encoders[col].transform(texto_categorica(trozo[col]))
+        escalado = scaler.transform(trozo)
+        fin = inicio + len(escalado)
+        if con_tiempo:
+            orden = np.argsort(tiempos, kind='stable')
+            tramos[inicio:fin] = escalado[orden]
+            marcas[inicio:fin] = tiempos[orden]
+            limites.append((inicio, fin))
+        else:
+            matriz[inicio:fin] = escalado
+        inicio = fin
+        medidor.muestrear('pasada 2')
+
+    if con_tiempo:
+        tramos.flush()
+        marcas.flush()
+        mezclar_tramos(marcas, tramos, limites, matriz, TAMANO_CHUNK)
+        medidor.muestrear('mezcla de tramos')
+        del tramos, marcas
+        os.remove(ruta_tramos)
+        os.remove(ruta_marcas)
+    matriz.flush()
+    del matriz
+
+    joblib.dump(scaler, SCALER_FILE)
+    joblib.dump(encoders, ENCODERS_FILE)
+    print(f"[*] Preprocesamiento guardado en '{SCALER_FILE}' y '{ENCODERS_FILE}'")
+    print(f"[*] Matriz escalada ({n_filas} x {len(feature_cols)}, float32) en '{ruta_matriz}'")
+
+    return np.load(ruta_matriz, mmap_mode='r'), len(feature_cols)
+
+
+def configuracion_preprocesado():
+    """Lo que determina la matriz resultante, además del contenido del CSV.
+
+    El camino (en memoria o por trozos) y TAMANO_CHUNK no forman parte: los dos
+    leen con los mismos tipos, ordenan igual y cuentan los valores de los
+    CodificadorHash de forma exacta, así que dan la misma matriz, el mismo
+    scaler y los mismos encoders (tests/test_preprocesado.py).
+    """
+    config = {
+        'version': VERSION_PREPROCESADO,
+        'categoricas': CATEGORICAL_COLS,
+        'numericas': NUMERICAL_COLS,
+        'orden': 'timestamp',
+        'dtype': 'float32',
+    }
+    # Solo con hashing, para no invalidar las entradas ya guardadas con LabelEncoder
+    if CODIFICACION == 'hash':
+        # 'recuento': las entradas de antes, con el top podado por trozos, no se reutilizan
+        config['codificacion'] = {'modo': 'hash', 'top_k': HASH_TOP_K, 'cubetas': HASH_CUBETAS, 'recuento': 'exacto'}
+    return config
+
+
+def _preprocesar(ruta_matriz, medidor=None):
+    """Preprocesa DATA_FILE en memoria o por trozos según STREAMING (matriz en float32)"""
+    if STREAMING:
+        return preprocesar_por_trozos(DATA_FILE, ruta_matriz, medidor)
+    data_scaled, num_features = cargar_y_preprocesar_datos(DATA_FILE)
+    # Keras trabaja en float32: se convierte una vez en lugar de en cada lote
+    return data_scaled.astype(np.float32), num_features
+
+
+def preparar_datos(medidor=None):
+    """Matriz escalada (float32) y número de features, reutilizando la caché si se puede.
+
+    Si hay una entrada para la huella de DATA_FILE y la configuración actual,
+    se abre mapeada en disco y se restauran SCALER_FILE y ENCODERS_FILE desde
+    ella; si no, se preprocesa y se publica para las próximas ejecuciones.
+    """
+    if not USAR_CACHE:
+        return _preprocesar(MATRIZ_FILE, medidor)
+
+    inicio = time.perf_counter()
+    huella = huella_fichero(DATA_FILE)
+    cache = CacheDatos(CACHE_DIR)
+    config = configuracion_preprocesado()
+    clave = cache.clave(DATA_FILE, config, huella)
+    print(f"[*] Huella de '{DATA_FILE}' calculada en {time.perf_counter() - inicio:.2f}s (clave de caché {clave})")
+
+    def construir(directorio):
+        matriz, _ = _preprocesar(os.path.join(directorio, 'matriz.npy'), medidor)
+        if not isinstance(matriz, np.memmap):
+            np.save(os.path.join(directorio, 'matriz.npy'), matriz)
+        shutil.copyfile(SCALER_FILE, os.path.join(directorio, 'scaler.joblib'))
+        shutil.copyfile(ENCODERS_FILE, os.path.join(directorio, 'encoders.joblib'))
+
+    meta = {'fichero': os.path.abspath(DATA_FILE), 'huella': huella, 'config': config}
+    entrada, construida = cache.obtener(clave, construir, meta, refrescar=REFRESCAR_CACHE)
+    if construida:
+        print(f"[*] Dataset preprocesado guardado en caché: '{entrada.directorio}'")
+    else:
+        shutil.copyfile(entrada.ruta_scaler, SCALER_FILE)
+        shutil.copyfile(entrada.ruta_encoders, ENCODERS_FILE)
+        print(f"[✓] Dataset cargado desde caché '{entrada.directorio}' en {time.perf_counter() - inicio:.2f}s "
+              f"({entrada.meta['filas']} x {entrada.meta['features']})")
+        print(f"[*] Preprocesamiento restaurado en '{SCALER_FILE}' y '{ENCODERS_FILE}'")
+
+    data_scaled = entrada.matriz()
+    if medidor:
+        medidor.muestrear('datos preparados')
+    return data_scaled, data_scaled.shape[1]
+
+
+class GeneradorVentanas(tf.keras.utils.Sequence):
+    """Lotes de ventanas (batch, time_steps, features) creados al vuelo.
+
+    `ventanas` es la vista de `crear_secuencias` (sobre un array o un memmap);
+    cada lote se copia con un único gather de los `indices` que le tocan y el
+    resto de ventanas nunca se materializa.
+    """
+
+    def __init__(self, ventanas, indices, batch_size=BATCH_SIZE, shuffle=True, semilla=42, **kwargs):
+        super().__init__(**kwargs)
+        self.ventanas = ventanas
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self._orden = self.indices.copy() if shuffle else self.indices
+        self._rng = np.random.default_rng(semilla)
+        self.on_epoch_end()
+
+    def __len__(self):
+        return math.ceil(len(self.indices) / self.batch_size)
+
+    def __getitem__(self, indice):
+        lote = self.ventanas[self._orden[indice * self.batch_size:(indice + 1) * self.batch_size]]
+        return lote, lote
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            self._rng.shuffle(self._orden)
+
+
+def dividir_cronologicamente(indices, test_size=0.2):
+    """Índices de entrenamiento y validación (vistas), como train_test_split(shuffle=False)"""
+    n_test = math.ceil(len(indices) * test_size)
+    n_train = len(indices) - n_test
+    return indices[:n_train], indices[n_train:]
+
+
+def _generadores(ventanas):
+    """Generadores de entrenamiento y validación sobre las ventanas seleccionadas"""
+    indices = seleccionar_ventanas(len(ventanas), PASO_VENTANAS, FRACCION_VENTANAS)
+    indices_train, indices_test = dividir_cronologicamente(indices)
+    _, time_steps, num_features = ventanas.shape
+    print(f"    -> Datos de entrenamiento: ({len(indices_train)}, {time_steps}, {num_features})")
+    print(f"    -> Datos de prueba: ({len(indices_test)}, {time_steps}, {num_features})")
+    return (GeneradorVentanas(ventanas, indices_train, BATCH_SIZE, shuffle=True),
+            GeneradorVentanas(ventanas, indices_test, BATCH_SIZE, shuffle=False))
+
+
+def guardar_estadisticas_umbral(validacion):
+    """MAE del mejor modelo sobre la validación, guardado junto al modelo para el umbral adaptativo"""
+    modelo = tf.keras.models.load_model(MODEL_NAME, compile=False)
+    maes = []
+    for indice in range(len(validacion)):
+        lote, _ = validacion[indice]
+        maes.append(errores_reconstruccion(modelo.predict_on_batch(lote), lote))
+    estadisticas = estadisticas_validacion(np.concatenate(maes))
+    ruta = ruta_estadisticas_umbral(MODEL_NAME)
+    guardar_json(estadisticas, ruta)
+    percentiles = ', '.join(f"p{p}={v:.4f}" for p, v in estadisticas['percentiles'].items())
+    print(f"[✓] Estadísticas de umbral ({estadisticas['n']} ventanas de validación) guardadas en '{ruta}': "
+          f"media={estadisticas['media']:.4f}, desviación={estadisticas['desviacion']:.4f}, {percentiles}")
+
+
+def entrenar_streaming():
+    """Entrena sin cargar el CSV ni las secuencias en memoria"""
+    medidor = MedidorMemoria()
+    medidor.muestrear('inicio')
+
+    data_scaled, num_features = preparar_datos(medidor)
+
+    X = crear_secuencias(data_scaled, TIMESTEPS)
+    if len(X) == 0:
+        print("[!] No hay suficientes datos para crear secuencias. Necesitas más filas en tu CSV.")
+        return None
+
+    entrenamiento, validacion = _generadores(X)
+
+    model = construir_modelo((TIMESTEPS, num_features))
+    medidor.muestrear('modelo construido')
+
+    early_stopping = EarlyStopping(monitor='val_loss', patience=5, mode='min', verbose=1)
+    checkpoint = ModelCheckpoint(MODEL_NAME, save_best_only=True, monitor='val_loss', mode='min', verbose=1)
+
+    class _MuestreoMemoria(tf.keras.callbacks.Callback):
+        def on_epoch_end(self, epoch, logs=None):
+            medidor.muestrear(f'época {epoch + 1}')
+
+    print("\n" + "="*70)
+    print("INICIANDO ENTRENAMIENTO (STREAMING)")
+    print("="*70)
+
+    with tf.device('/GPU:0' if tf.config.list_physical_devices('GPU') else '/CPU:0'):
+        history = model.fit(
+            entrenamiento,
+            epochs=50,
+            validation_data=validacion,
+            callbacks=[early_stopping, checkpoint, _MuestreoMemoria()],
+            verbose=1
+        )
+        guardar_estadisticas_umbral(validacion)
+
+    medidor.informe()
+    return history
 
 def construir_modelo(input_shape):
     print(f"[*] Construyendo modelo Stacked LSTM con input: {input_shape}...")
@@ -170,20 +629,25 @@ def entrenar():
         print(f"[!] No se encuentra el archivo '{DATA_FILE}'.")
         return
 
-    data_scaled, num_features = cargar_y_preprocesar_datos(DATA_FILE)
+    if STREAMING:
+        history = entrenar_streaming()
+        if history is not None:
+            print(f"\n[✓] Modelo guardado exitosamente como '{MODEL_NAME}'")
+            graficar_entrenamiento(history)
+        return
+
+    data_scaled, num_features = preparar_datos()
     
+    # Vista sin copia; cada lote se materializa al pedirlo
     X = crear_secuencias(data_scaled, TIMESTEPS)
     
     if len(X) == 0:
         print("[!] No hay suficientes datos para crear secuencias. Necesitas más filas en tu CSV.")
         return
 
-    X_train, X_test = train_test_split(X, test_size=0.2, random_state=42, shuffle=False)
-    
-    print(f"    -> Datos de entrenamiento: {X_train.shape}")
-    print(f"    -> Datos de prueba: {X_test.shape}")
+    entrenamiento, validacion = _generadores(X)
 
-    model = construir_modelo((X_train.shape[1], X_train.shape[2]))
+    model = construir_modelo((X.shape[1], X.shape[2]))
     
     early_stopping = EarlyStopping(monitor='val_loss', patience=5, mode='min', verbose=1)
     checkpoint = ModelCheckpoint(MODEL_NAME, save_best_only=True, monitor='val_loss', mode='min', verbose=1)
@@ -195,16 +659,18 @@ def entrenar():
     # Mostrar en qué dispositivo se está entrenando
     with tf.device('/GPU:0' if tf.config.list_physical_devices('GPU') else '/CPU:0'):
         history = model.fit(
-            X_train, X_train,
+            entrenamiento,
             epochs=50,
-            batch_size=32,
-            validation_data=(X_test, X_test),
+            validation_data=validacion,
             callbacks=[early_stopping, checkpoint],
             verbose=1
         )
+        guardar_estadisticas_umbral(validacion)
 
     print(f"\n[✓] Modelo guardado exitosamente como '{MODEL_NAME}'")
-    
+    graficar_entrenamiento(history)
+
+def graficar_entrenamiento(history):
     # Graficar resultados
     try:
         plt.figure(figsize=(10, 6))
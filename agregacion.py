@@ -0,0 +1,192 @@
+"""Agregación de los resultados antes de InfluxDB.
+
+Sin ella cada línea puntuada es un punto 'web_traffic' con la IP como tag y
+la URL como campo: millones de series y de puntos. Con INFLUX_AGREGACION=1
+solo las anomalías se escriben como punto completo y el resto se resume por
+intervalos de `intervalo` segundos:
+
+- 'web_traffic_resumen', por método y clase de status (tags `method`,
+  `status_class`): `count`, `score_mean`, `score_max` y `anomalies`;
+- 'web_traffic_top', las `top_k` IPs y URLs más frecuentes del intervalo
+  (tags `dimension` = ip|url y `rank`; el valor va en el campo `valor`) con
+  los mismos campos más `count_error`, calculadas con un sketch
+  space-saving de `capacidad` contadores por dimensión.
+
+Las series quedan acotadas (métodos × clases + 2 × top_k) sea cual sea el
+tráfico. Los puntos llevan la hora de inicio del intervalo.
+
+Métricas: `agregacion_lineas_total`, `agregacion_puntos_total{tipo}`
+(resumen, top, anomalia) y `agregacion_puntos_ahorrados`, líneas menos
+puntos escritos desde el arranque.
+"""
+import time
+import logging
+import threading
+from influxdb_client import Point, WritePrecision
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from estadisticas_score import METODOS_HTTP, CLASES_STATUS
+
+logger = logging.getLogger(__name__)
+
+TIPOS_PUNTO = ('resumen', 'top', 'anomalia')
+
+
+class EspacioAhorro:
+    """Top-k aproximado de un flujo (space-saving) con memoria acotada.
+
+    Cada entrada es [conteo, error, suma de scores, score máximo, anomalías];
+    el recuento real está entre `conteo - error` y `conteo`. Variante por
+    lotes: se admiten hasta 2 × `capacidad` claves y al llenarse se quedan las
+    `capacidad` más frecuentes; una clave nueva empieza en el mayor recuento
+    descartado (`_suelo`), que es lo que pudo tener sin que se contara.
+    """
+
+    def __init__(self, capacidad):
+        self.capacidad = max(1, int(capacidad))
+        self._entradas = {}
+        self._suelo = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def sumar(self, clave, score, es_anomalia):
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            if len(self._entradas) >= 2 * self.capacidad:
+                self._podar()
+            entrada = self._entradas[clave] = [self._suelo, self._suelo, 0.0, 0.0, 0]
+        entrada[0] += 1
+        entrada[2] += score
+        if score > entrada[3]:
+            entrada[3] = score
+        if es_anomalia:
+            entrada[4] += 1
+
+    def _podar(self):
+        orden = sorted(self._entradas.items(), key=lambda par: par[1][0], reverse=True)
+        self._suelo = max(self._suelo, orden[self.capacidad][1][0])
+        self._entradas = dict(orden[:self.capacidad])
+
+    def top(self, k):
+        """[(clave, entrada)...] de las `k` más frecuentes, de mayor a menor"""
+        return sorted(self._entradas.items(), key=lambda par: par[1][0], reverse=True)[:k]
+
+
+class AgregadorInflux:
+    """Resúmenes por intervalo para InfluxDB en lugar de un punto por línea.
+
+    `registrar` se llama con cada línea puntuada (desde el hilo del motor); un
+    hilo propio cierra los intervalos aunque deje de llegar tráfico. También
+    es un colector de Prometheus (`REGISTRY.register`).
+    """
+
+    def __init__(self, escritor, intervalo=10.0, top_k=20, capacidad=None, reloj=time.time):
+        self.escritor = escritor
+        self.intervalo = max(0.1, float(intervalo))
+        self.top_k = max(1, int(top_k))
+        self.capacidad = max(self.top_k, int(capacidad or 10 * self.top_k))
+        self.reloj = reloj
+        self._lock = threading.Lock()
+        self.lineas = 0
+        self.puntos = dict.fromkeys(TIPOS_PUNTO, 0)
+        self._abrir_intervalo(reloj())
+
+        self._detenido = threading.Event()
+        self._hilo = threading.Thread(target=self._bucle, name='agregador-influx', daemon=True)
+        self._hilo.start()
+
+    def _abrir_intervalo(self, ahora):
+        self._inicio = ahora
+        # (método, clase de status) -> [líneas, suma de scores, score máximo, anomalías]
+        self._grupos = {}
+        self._ips = EspacioAhorro(self.capacidad)
+        self._urls = EspacioAhorro(self.capacidad)
+
+    def registrar(self, mae, parsed_data, es_anomalia):
+        """Suma la línea al intervalo en curso (las anomalías se escriben además como punto completo)"""
+        metodo = parsed_data.get('method')
+        metodo = metodo if metodo in METODOS_HTTP else 'otro'
+        clase = CLASES_STATUS.get(str(parsed_data.get('status_code'))[:1], 'otro')
+        score = float(mae)
+        with self._lock:
+            grupo = self._grupos.get((metodo, clase))
+            if grupo is None:
+                grupo = self._grupos[(metodo, clase)] = [0, 0.0, 0.0, 0]
+            grupo[0] += 1
+            grupo[1] += score
+            if score > grupo[2]:
+                grupo[2] = score
+            if es_anomalia:
+                grupo[3] += 1
+            self._ips.sumar(str(parsed_data.get('ip', '-')), score, es_anomalia)
+            self._urls.sumar(str(parsed_data.get('url', '-')), score, es_anomalia)
+            self.lineas += 1
+            if es_anomalia:
+                self.puntos['anomalia'] += 1
+
+    def vaciar(self):
+        """Cierra el intervalo en curso y escribe sus resúmenes"""
+        with self._lock:
+            inicio, grupos, ips, urls = self._inicio, self._grupos, self._ips, self._urls
+            self._abrir_intervalo(self.reloj())
+        if not grupos:
+            return
+
+        tiempo_ns = int(inicio * 1e9)
+        puntos = []
+        for (metodo, clase), (n, suma, maximo, anomalias) in grupos.items():
+            puntos.append(Point("web_traffic_resumen")
+                          .tag("method", metodo)
+                          .tag("status_class", clase)
+                          .field("count", n)
+                          .field("score_mean", suma / n)
+                          .field("score_max", maximo)
+                          .field("anomalies", anomalias)
+                          .time(tiempo_ns, WritePrecision.NS))
+        resumenes = len(puntos)
+        for dimension, sketch in (('ip', ips), ('url', urls)):
+            for rango, (valor, (conteo, error, suma, maximo, anomalias)) in enumerate(sketch.top(self.top_k)):
+                puntos.append(Point("web_traffic_top")
+                              .tag("dimension", dimension)
+                              .tag("rank", str(rango))
+                              .field("valor", valor)
+                              .field("count", conteo)
+                              .field("count_error", error)
+                              .field("score_mean", suma / max(conteo - error, 1))
+                              .field("score_max", maximo)
+                              .field("anomalies", anomalias)
+                              .time(tiempo_ns, WritePrecision.NS))
+
+        try:
+            for punto in puntos:
+                self.escritor.escribir(punto)
+        except Exception as e:
+            logger.error(f"Error escribiendo resúmenes a InfluxDB: {e}")
+        with self._lock:
+            self.puntos['resumen'] += resumenes
+            self.puntos['top'] += len(puntos) - resumenes
+
+    def _bucle(self):
+        while not self._detenido.wait(max(0.0, self._inicio + self.intervalo - self.reloj())):
+            if self.reloj() - self._inicio >= self.intervalo:
+                self.vaciar()
+
+    def detener(self, timeout=None):
+        """Para el hilo y escribe el intervalo a medias"""
+        self._detenido.set()
+        self._hilo.join(timeout)
+        self.vaciar()
+
+    def collect(self):
+        with self._lock:
+            lineas, puntos = self.lineas, dict(self.puntos)
+        yield CounterMetricFamily('agregacion_lineas', 'Líneas puntuadas que pasaron por la agregación',
+                                  value=lineas)
+        familia = CounterMetricFamily('agregacion_puntos', 'Puntos escritos en InfluxDB por la agregación',
+                                      labels=['tipo'])
+        for tipo in TIPOS_PUNTO:
+            familia.add_metric([tipo], puntos[tipo])
+        yield familia
+        yield GaugeMetricFamily('agregacion_puntos_ahorrados',
+                                'Puntos que no se escribieron frente a uno por línea (negativo con poco tráfico)',
+                                value=lineas - sum(puntos.values()))
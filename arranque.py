@@ -0,0 +1,54 @@
+import time
+import logging
+import threading
+import contextlib
+from prometheus_client import Gauge
+
+logger = logging.getLogger(__name__)
+
+# --- MÉTRICAS DE ARRANQUE ---
+LISTO = Gauge(
+    'capturador_listo',
+    '1 cuando el capturador ya sigue el log y puntúa líneas, 0 mientras arranca'
+)
+DURACION_FASE = Gauge(
+    'capturador_arranque_fase_segundos',
+    'Duración de cada fase del arranque (algunas corren en paralelo)',
+    ['fase']
+)
+TIEMPO_HASTA_LISTO = Gauge(
+    'capturador_arranque_segundos',
+    'Segundos desde el inicio del proceso hasta estar listo'
+)
+
+
+class Arranque:
+    """Cronometra las fases del arranque, que pueden solaparse en varios hilos, y publica la disponibilidad"""
+
+    def __init__(self, inicio=None):
+        self.inicio = time.monotonic() if inicio is None else inicio
+        self.fases = {}
+        self._lock = threading.Lock()
+        LISTO.set(0)
+
+    @contextlib.contextmanager
+    def fase(self, nombre):
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            segundos = time.monotonic() - t0
+            with self._lock:
+                self.fases[nombre] = segundos
+            DURACION_FASE.labels(fase=nombre).set(segundos)
+            logger.info(f"[⏱] Fase de arranque '{nombre}': {segundos:.2f}s")
+
+    def listo(self):
+        """Marca el capturador como listo y devuelve los segundos transcurridos desde `inicio`"""
+        total = time.monotonic() - self.inicio
+        TIEMPO_HASTA_LISTO.set(total)
+        LISTO.set(1)
+        with self._lock:
+            detalle = ', '.join(f"{nombre} {segundos:.2f}s" for nombre, segundos in self.fases.items())
+        logger.info(f"[✓] Capturador listo en {total:.2f}s ({detalle})")
+        return total
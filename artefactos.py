@@ -0,0 +1,114 @@
+import os
+import logging
+import threading
+import warnings
+import joblib
+from codificacion import compilar_tablas, verificar_tablas
+from caracteristicas import PipelineCaracteristicas, COLUMNAS_CATEGORICAS, COLUMNAS_NUMERICAS
+from inferencia import BACKENDS_SIN_TENSORFLOW, BackendKeras, crear_backend, verificar_backend
+
+logger = logging.getLogger(__name__)
+
+# Orden esperado de características si el scaler no guarda sus nombres
+FEATURE_NAMES_POR_DEFECTO = COLUMNAS_CATEGORICAS + COLUMNAS_NUMERICAS
+
+
+def cargar_modelo_keras(ruta_modelo):
+    """Importa TensorFlow y carga el modelo sin compilar"""
+    from tensorflow.keras.models import load_model
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        modelo = load_model(ruta_modelo, compile=False)
+    logger.info(f"[✓] Modelo Keras cargado: {modelo}")
+    return modelo
+
+
+class Artefactos:
+    """Modelo, scaler y encoders junto con lo que se compila a partir de ellos.
+
+    El modelo Keras se carga la primera vez que se pide: con un backend que no
+    lo necesita (numpy) TensorFlow no llega a importarse.
+    """
+
+    def __init__(self, ruta_modelo, modelo, scaler, encoders, feature_names, tablas, pipeline):
+        self.ruta_modelo = ruta_modelo
+        self._modelo = modelo
+        self._lock_modelo = threading.Lock()
+        self.scaler = scaler
+        self.encoders = encoders
+        self.feature_names = feature_names
+        self.tablas = tablas
+        self.pipeline = pipeline
+
+    @property
+    def modelo(self):
+        if self._modelo is None:
+            with self._lock_modelo:
+                if self._modelo is None:
+                    self._modelo = cargar_modelo_keras(self.ruta_modelo)
+        return self._modelo
+
+    @property
+    def modelo_cargado(self):
+        return self._modelo is not None
+
+
+def cargar_artefactos(ruta_modelo, ruta_scaler, ruta_encoders, tamano_cache_vocab=4096):
+    """Carga los artefactos de entrenamiento y compila tablas de vocabulario y pipeline"""
+    logger.info("[*] Cargando modelo y transformadores...")
+
+    # Verificar existencia de archivos
+    for ruta in (ruta_modelo, ruta_scaler, ruta_encoders):
+        if not os.path.exists(ruta):
+            logger.error(f"[!] ERROR CRÍTICO: No se encuentra el archivo {ruta}")
+            logger.error(f"    Archivos en directorio actual: {os.listdir('.')}")
+            raise FileNotFoundError(ruta)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        scaler = joblib.load(ruta_scaler)
+        encoders = joblib.load(ruta_encoders)
+
+    logger.info("[✓] Artefactos cargados exitosamente.")
+    logger.info(f"    - Modelo: {ruta_modelo} (se carga al usarlo)")
+    logger.info(f"    - Encoders disponibles: {list(encoders.keys())}")
+
+    # Extraer nombres de características del scaler
+    if hasattr(scaler, 'feature_names_in_'):
+        feature_names = list(scaler.feature_names_in_)
+        logger.info(f"    - Feature names detectados: {feature_names}")
+    else:
+        feature_names = list(FEATURE_NAMES_POR_DEFECTO)
+        logger.warning(f"    - Feature names no encontrados, usando orden por defecto")
+
+    # Vocabularios compilados a tablas de búsqueda directa
+    tablas = compilar_tablas(encoders, tamano_cache=tamano_cache_vocab)
+    verificar_tablas(encoders, tablas)
+    logger.info(f"    - Tablas de vocabulario verificadas: { {col: len(t) for col, t in tablas.items()} }")
+
+    # Codificación + escalado sin DataFrames por línea
+    pipeline = PipelineCaracteristicas(scaler, tablas, feature_names)
+
+    return Artefactos(ruta_modelo, None, scaler, encoders, feature_names, tablas, pipeline)
+
+
+def preparar_backend(nombre, artefactos, timesteps, tamano_lote, tolerancia, verificar=True):
+    """Crea el backend pedido y lo verifica contra Keras; si falla, usa Keras predict.
+
+    Con `verificar=False` se omite la comparación, de modo que un backend sin
+    TensorFlow no obliga a cargar el modelo Keras.
+    """
+    logger.info(f"[*] Preparando backend de inferencia '{nombre}'...")
+    n_features = len(artefactos.feature_names)
+    try:
+        modelo = None if nombre in BACKENDS_SIN_TENSORFLOW else artefactos.modelo
+        backend = crear_backend(nombre, modelo, artefactos.ruta_modelo, timesteps, n_features, tamano_lote)
+        if verificar and backend.nombre != 'keras':
+            diferencia = verificar_backend(backend, artefactos.modelo, timesteps, n_features, tolerancia)
+            logger.info(f"[✓] Backend '{backend.nombre}' coincide con Keras (diferencia máxima {diferencia:.2e})")
+    except Exception as e:
+        logger.error(f"[!] Backend '{nombre}' no disponible: {e}")
+        logger.warning("    Usando Keras predict como backend...")
+        backend = BackendKeras(artefactos.modelo)
+    return backend
@@ -0,0 +1,88 @@
+"""Atribución del error de reconstrucción a cada característica.
+
+El motor ya calcula |reconstrucción - ventana| en un buffer (n, TIMESTEPS,
+n_features) para obtener el MAE; aquí se reutiliza ese mismo buffer, sin otra
+pasada del modelo:
+
+- por lote, la suma del error medio de cada característica, para las métricas
+  `log_anomalia_error_caracteristica_total{caracteristica}` (dividido entre
+  `logs_procesados_total`: error medio por característica);
+- solo para las ventanas marcadas como anomalía, el error por característica y
+  por paso de la ventana, del que salen las causas principales que acompañan
+  a la línea en el log y en InfluxDB, y
+  `log_anomalias_causa_total{caracteristica}` (la causa principal de cada
+  anomalía).
+
+Los errores están en la escala del MinMaxScaler, así que son comparables entre
+características.
+"""
+import threading
+from collections import namedtuple
+import numpy as np
+from prometheus_client.core import CounterMetricFamily
+
+# principales: [(característica, error)...] de mayor a menor error
+# paso: paso de la ventana con más error (0 = la línea más antigua, TIMESTEPS-1 = la puntuada)
+Causas = namedtuple('Causas', ['principales', 'paso'])
+
+
+def formatear_causas(causas):
+    """'url=0.412,user_agent=0.221'"""
+    return ','.join(f"{nombre}={error:.3f}" for nombre, error in causas.principales)
+
+
+class AtribucionErrores:
+    """Errores por característica de cada lote y causas principales de las anomalías"""
+
+    def __init__(self, nombres, top=3):
+        self.nombres = list(nombres)
+        self.top = max(1, min(int(top), len(self.nombres)))
+        self._lock = threading.Lock()
+        self._suma = np.zeros(len(self.nombres), dtype=np.float64)
+        self._suma_anomalias = np.zeros(len(self.nombres), dtype=np.float64)
+        self._causas = np.zeros(len(self.nombres), dtype=np.int64)
+
+    def lote(self, diferencias, anomalias):
+        """`diferencias`: |error| (n, TIMESTEPS, n_features) del lote; devuelve {índice: Causas} de las anomalías"""
+        pasos = diferencias.shape[1]
+        suma = diferencias.sum(axis=(0, 1)) / pasos
+        indices = np.flatnonzero(anomalias)
+        if not len(indices):
+            with self._lock:
+                self._suma += suma
+            return {}
+
+        ventanas = diferencias[indices]
+        por_caracteristica = ventanas.mean(axis=1)
+        por_paso = ventanas.mean(axis=2)
+        # Orden descendente de las `top` mayores (n_features es pequeño: argsort basta)
+        orden = np.argsort(-por_caracteristica, axis=1, kind='stable')[:, :self.top]
+        principales = np.take_along_axis(por_caracteristica, orden, axis=1)
+        with self._lock:
+            self._suma += suma
+            self._suma_anomalias += por_caracteristica.sum(axis=0)
+            self._causas += np.bincount(orden[:, 0], minlength=len(self.nombres))
+
+        pasos_max = por_paso.argmax(axis=1)
+        return {
+            int(i): Causas([(self.nombres[k], float(e)) for k, e in zip(fila_orden, fila_error)], int(paso))
+            for i, fila_orden, fila_error, paso in zip(indices, orden.tolist(), principales.tolist(), pasos_max.tolist())
+        }
+
+    def collect(self):
+        with self._lock:
+            suma, suma_anomalias, causas = self._suma.copy(), self._suma_anomalias.copy(), self._causas.copy()
+        familias = (
+            (CounterMetricFamily('log_anomalia_error_caracteristica',
+                                 'Suma del error de reconstrucción medio por característica, en todas las ventanas',
+                                 labels=['caracteristica']), suma),
+            (CounterMetricFamily('log_anomalia_error_caracteristica_anomalias',
+                                 'Suma del error de reconstrucción medio por característica, en las anomalías',
+                                 labels=['caracteristica']), suma_anomalias),
+            (CounterMetricFamily('log_anomalias_causa', 'Anomalías según la característica con más error',
+                                 labels=['caracteristica']), causas),
+        )
+        for familia, valores in familias:
+            for nombre, valor in zip(self.nombres, valores.tolist()):
+                familia.add_metric([nombre], valor)
+            yield familia
@@ -0,0 +1,126 @@
+"""Tiempo hasta estar listo: lanza capturador.py y sondea /metrics hasta que capturador_listo vale 1.
+
+Cada ejecución arranca el capturador en un proceso nuevo (con los artefactos
+de --directorio, un access.log temporal vacío, un puerto libre y, por defecto,
+un InfluxDB inalcanzable) y mide desde el lanzamiento hasta que responde
+/metrics y hasta que publica capturador_listo 1. Después muestra las fases
+que el propio capturador expone en capturador_arranque_fase_segundos.
+
+Con --max-segundos sale con código 1 si alguna ejecución tarda más en estar
+lista, para usarlo como comprobación en CI.
+
+Uso: python benchmarks/bench_arranque.py [--backends tf_function numpy] [--repeticiones 3] [--max-segundos 20]
+"""
+import os
+import re
+import sys
+import time
+import socket
+import signal
+import argparse
+import tempfile
+import contextlib
+import subprocess
+import urllib.request
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CAPTURADOR = os.path.join(RAIZ, 'capturador.py')
+
+METRICA_FASE = re.compile(r'^capturador_arranque_fase_segundos\{fase="([^"]+)"\} (\S+)$', re.M)
+METRICA_LISTO = re.compile(r'^capturador_listo (\S+)$', re.M)
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def leer_metricas(puerto):
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{puerto}/metrics', timeout=1) as r:
+            return r.read().decode()
+    except OSError:
+        return None
+
+
+@contextlib.contextmanager
+def capturador_en_marcha(backend, args):
+    """Lanza capturador.py (log vacío, puerto libre) y da (proceso, puerto, instante de lanzamiento)"""
+    puerto = puerto_libre()
+    directorio = tempfile.mkdtemp(prefix='bench_arranque_')
+    ruta_log = os.path.join(directorio, 'access.log')
+    open(ruta_log, 'w').close()
+    entorno = dict(os.environ, PYTHONPATH=RAIZ, PROMETHEUS_PORT=str(puerto), LOG_FILE_PATH=ruta_log,
+                   SEGUIDOR_CHECKPOINT='', BACKEND_INFERENCIA=backend, INFLUXDB_URL=args.influx)
+
+    inicio = time.monotonic()
+    proceso = subprocess.Popen([sys.executable, CAPTURADOR], cwd=args.directorio, env=entorno,
+                               stdout=subprocess.DEVNULL if not args.verbose else None, stderr=subprocess.STDOUT)
+    try:
+        yield proceso, puerto, inicio
+    finally:
+        proceso.send_signal(signal.SIGINT)
+        try:
+            proceso.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proceso.kill()
+            proceso.wait()
+        os.remove(ruta_log)
+        os.rmdir(directorio)
+
+
+def medir(backend, args):
+    """Una ejecución: (segundos hasta /metrics, segundos hasta listo, fases)"""
+    hasta_metricas = hasta_listo = None
+    texto = ''
+    with capturador_en_marcha(backend, args) as (proceso, puerto, inicio):
+        while time.monotonic() - inicio < args.limite:
+            if proceso.poll() is not None:
+                raise RuntimeError(f"capturador.py terminó con código {proceso.returncode} antes de estar listo")
+            texto = leer_metricas(puerto)
+            if texto is not None:
+                if hasta_metricas is None:
+                    hasta_metricas = time.monotonic() - inicio
+                listo = METRICA_LISTO.search(texto)
+                if listo and float(listo.group(1)) == 1:
+                    hasta_listo = time.monotonic() - inicio
+                    break
+            time.sleep(args.intervalo)
+
+    if hasta_listo is None:
+        raise RuntimeError(f"capturador.py no estuvo listo en {args.limite:g}s")
+    fases = {fase: float(valor) for fase, valor in METRICA_FASE.findall(texto)}
+    return hasta_metricas, hasta_listo, fases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+', default=['tf_function', 'numpy'])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--directorio', default=RAIZ, help='Directorio con modelo, scaler y encoders')
+    parser.add_argument('--influx', default='http://127.0.0.1:9', help='INFLUXDB_URL para el capturador')
+    parser.add_argument('--intervalo', type=float, default=0.05, help='Segundos entre sondeos de /metrics')
+    parser.add_argument('--limite', type=float, default=120.0, help='Segundos máximos de espera por ejecución')
+    parser.add_argument('--max-segundos', type=float, help='Falla si alguna ejecución tarda más en estar lista')
+    parser.add_argument('--verbose', action='store_true', help='Muestra la salida del capturador')
+    args = parser.parse_args()
+
+    excedido = False
+    print(f"{'backend':<12} {'/metrics s':>11} {'listo s':>9} {'máx s':>7}  fases (mediana, s)")
+    for backend in args.backends:
+        medidas = [medir(backend, args) for _ in range(args.repeticiones)]
+        hasta_metricas = np.median([m[0] for m in medidas])
+        hasta_listo = [m[1] for m in medidas]
+        fases = {fase: np.median([m[2].get(fase, np.nan) for m in medidas]) for fase in medidas[0][2]}
+        print(f"{backend:<12} {hasta_metricas:>11.2f} {np.median(hasta_listo):>9.2f} {max(hasta_listo):>7.2f}  "
+              + ', '.join(f"{fase} {s:.2f}" for fase, s in fases.items()))
+        if args.max_segundos is not None and max(hasta_listo) > args.max_segundos:
+            print(f"    [!] '{backend}' tardó {max(hasta_listo):.2f}s en estar listo (máximo {args.max_segundos:g}s)")
+            excedido = True
+    return 1 if excedido else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""Latencia por ventana de cada backend de inferencia.
+
+Uso: python benchmarks/bench_backends.py [--modelo modelo_logs_1.h5] [--lotes 1 8 64]
+"""
+import os
+import sys
+import time
+import argparse
+import warnings
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inferencia import BACKENDS, crear_backend, verificar_backend
+
+
+def medir(backend, secuencias, repeticiones):
+    backend(secuencias)  # Calentamiento (trazado de grafos, buffers de entrada y del backend NumPy)
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        backend(secuencias)
+    return (time.perf_counter() - inicio) / (repeticiones * len(secuencias))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modelo', default='modelo_logs_1.h5')
+    parser.add_argument('--timesteps', type=int, default=10)
+    parser.add_argument('--features', type=int, default=11)
+    parser.add_argument('--lotes', type=int, nargs='+', default=[1, 8, 64, 256])
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    from tensorflow.keras.models import load_model
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        modelo = load_model(args.modelo, compile=False)
+
+    rng = np.random.default_rng(0)
+    print(f"{'backend':<12} {'lote':>6} {'us/ventana':>12} {'dif. máx.':>10}")
+    for nombre in BACKENDS:
+        backend = crear_backend(nombre, modelo, args.modelo, args.timesteps, args.features, max(args.lotes))
+        diferencia = verificar_backend(backend, modelo, args.timesteps, args.features, tolerancia=np.inf)
+        for lote in args.lotes:
+            secuencias = rng.random((lote, args.timesteps, args.features))
+            latencia = medir(backend, secuencias, args.repeticiones)
+            print(f"{nombre:<12} {lote:>6} {latencia * 1e6:>12.1f} {diferencia:>10.1e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""Prueba de carga de extremo a extremo: access.log que crece -> SeguidorLog -> parser -> ventana -> motor.
+
+Un proceso aparte añade líneas Combined al ritmo y perfil pedidos
+(LOGS_RANDOM_V2.escribir_en_vivo) mientras este proceso recorre el mismo camino
+que capturador.procesar_log, sin InfluxDB. Para cada línea puntuada se mide la
+latencia desde que el escritor la vació a disco hasta que el motor entregó su
+score. Con varios ritmos se ve hasta dónde aguanta el detector: un ritmo se
+considera sostenido si, al parar el escritor, el atraso se vacía en menos de
+--margen-drenaje segundos.
+
+Uso: python benchmarks/bench_carga.py [--ritmos 500 1000 2000] [--duracion 30] [--perfil rafagas]
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import multiprocessing as mp
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from configuracion import (
+    MODEL_FILE, SCALER_FILE, ENCODERS_FILE, TIMESTEPS, UMBRAL, TAMANO_LOTE, ESPERA_MAX_LOTE_MS,
+    BACKEND_INFERENCIA, TOLERANCIA_BACKEND, TAMANO_CACHE_VOCAB, configurar_logging
+)
+from LOGS_RANDOM_V2 import PERFILES_RITMO, FuenteLineas, escribir_en_vivo
+from parser_apache import ParserApache, FORMATO_COMBINED, FORMATO_COMBINED_SSL
+from seguidor_logs import SeguidorLog
+
+
+def _escritor(ruta, marcas, args):
+    """Proceso escritor: manda a `marcas` (total_escritas, time.monotonic()) tras cada escritura"""
+    fuente = FuenteLineas(args.semilla, con_tls=args.tls, fraccion_ataques=args.fraccion_ataques)
+    escribir_en_vivo(ruta, fuente, args.ritmo_actual, args.perfil, args.duracion, args.periodo,
+                     args.factor_pico, args.duracion_pico, al_escribir=lambda n, t: marcas.put((n, t)))
+    marcas.put(None)
+
+
+def percentiles(valores, qs=(50, 90, 99, 99.9)):
+    if not len(valores):
+        return {q: float('nan') for q in qs}
+    return dict(zip(qs, np.percentile(valores, qs)))
+
+
+def ejecutar(ritmo, args, artefactos, backend):
+    from inferencia import MotorInferenciaPorLotes
+    from ventana import VentanaAnillo
+    from resultados import RegistroResultados
+
+    ctx = mp.get_context('spawn')
+    directorio = tempfile.mkdtemp(prefix='bench_carga_')
+    ruta = os.path.join(directorio, 'access.log')
+    open(ruta, 'w').close()
+
+    # Mismos componentes que capturador, con el score entregado a RegistroResultados sin Influx
+    registrar_resultado = RegistroResultados(UMBRAL, None)
+    secuencias_puntuadas = []
+    instantes_score = []
+
+    def al_puntuar(mae, parsed_data):
+        registrar_resultado(mae, parsed_data)
+        secuencias_puntuadas.append(parsed_data['_linea'])
+        instantes_score.append(time.monotonic())
+
+    motor = MotorInferenciaPorLotes(backend, al_puntuar, tamano_lote=TAMANO_LOTE, espera_max_ms=ESPERA_MAX_LOTE_MS)
+    ventana = VentanaAnillo(TIMESTEPS, len(artefactos.feature_names))
+    parser_log = ParserApache(FORMATO_COMBINED_SSL if args.tls else FORMATO_COMBINED)
+    seguidor = SeguidorLog(ruta, desde_inicio=True)
+
+    args.ritmo_actual = ritmo
+    marcas = ctx.Queue()
+    escritor = ctx.Process(target=_escritor, args=(ruta, marcas, args), name='escritor', daemon=True)
+    escritor.start()
+
+    fines, instantes_escritura = [], []
+    escritor_vivo = True
+    leidas = fallidas = 0
+    for line in seguidor.lineas(ceder_inactivo=True):
+        if line is None:
+            # Inactivo: recoger marcas del escritor y comprobar si ya está todo leído
+            while escritor_vivo and not marcas.empty():
+                marca = marcas.get()
+                if marca is None:
+                    escritor_vivo = False
+                else:
+                    fines.append(marca[0])
+                    instantes_escritura.append(marca[1])
+            if not escritor_vivo and leidas >= (fines[-1] if fines else 0):
+                break
+            continue
+
+        leidas += 1
+        parsed_data = parser_log.parsear(line)
+        if not parsed_data:
+            fallidas += 1
+            continue
+        parsed_data['_linea'] = leidas
+        artefactos.pipeline.transformar(parsed_data, salida=ventana.reservar())
+        if ventana.lleno:
+            motor.enviar(ventana.vista(), parsed_data)
+
+    motor.detener()
+    seguidor.cerrar()
+    escritor.join()
+    os.remove(ruta)
+    os.rmdir(directorio)
+
+    # Instante de escritura de cada línea: el de la escritura que la incluyó
+    fines = np.asarray(fines)
+    instantes_escritura = np.asarray(instantes_escritura)
+    lineas = np.asarray(secuencias_puntuadas)
+    escritas_en = instantes_escritura[np.searchsorted(fines, lineas)]
+    latencias = np.asarray(instantes_score) - escritas_en
+
+    # Fuera del calentamiento inicial
+    inicio = instantes_escritura[0] if len(instantes_escritura) else 0.0
+    medidas = latencias[escritas_en - inicio >= args.calentamiento] * 1e3
+    duracion = (instantes_score[-1] - inicio) if instantes_score else float('nan')
+    # Lo que tarda en puntuarse lo pendiente una vez que el escritor ha parado
+    drenaje = (instantes_score[-1] - instantes_escritura[-1]) if instantes_score else float('nan')
+    return {
+        'ritmo': ritmo,
+        'escritas': int(fines[-1]) if len(fines) else 0,
+        'puntuadas': len(lineas),
+        'fallidas': fallidas,
+        'puntuadas_s': len(lineas) / duracion,
+        'latencias': percentiles(medidas),
+        'max': float(medidas.max()) if len(medidas) else float('nan'),
+        'drenaje': drenaje,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ritmos', type=float, nargs='+', default=[250, 500, 1000, 2000],
+                        help='Líneas/s base a probar, una ejecución por ritmo')
+    parser.add_argument('--duracion', type=float, default=20.0, help='Segundos de escritura por ejecución')
+    parser.add_argument('--perfil', choices=PERFILES_RITMO, default='constante')
+    parser.add_argument('--factor-pico', type=float, default=5.0)
+    parser.add_argument('--periodo', type=float, default=10.0)
+    parser.add_argument('--duracion-pico', type=float, default=2.0)
+    parser.add_argument('--fraccion-ataques', type=float, default=0.0)
+    parser.add_argument('--tls', action='store_true', help='Líneas con %%{SSL_PROTOCOL}x %%{SSL_CIPHER}x')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--calentamiento', type=float, default=2.0, help='Segundos iniciales fuera de las latencias')
+    parser.add_argument('--margen-drenaje', type=float, default=1.0)
+    parser.add_argument('--backend', default=BACKEND_INFERENCIA)
+    args = parser.parse_args()
+
+    configurar_logging()
+    # Las alertas por línea de RegistroResultados saturarían la salida
+    logging.getLogger('resultados').setLevel(logging.ERROR)
+
+    from artefactos import cargar_artefactos, preparar_backend
+    artefactos = cargar_artefactos(MODEL_FILE, SCALER_FILE, ENCODERS_FILE, TAMANO_CACHE_VOCAB)
+    backend = preparar_backend(args.backend, artefactos, TIMESTEPS, TAMANO_LOTE, TOLERANCIA_BACKEND)
+
+    resultados = [ejecutar(ritmo, args, artefactos, backend) for ritmo in args.ritmos]
+
+    print(f"\nperfil '{args.perfil}'" + (f" (pico x{args.factor_pico:g} cada {args.periodo:g}s)"
+                                      if args.perfil != 'constante' else '') + f", {args.duracion:g}s por ritmo")
+    print(f"{'ritmo':>7} {'escritas':>9} {'puntuadas':>10} {'punt./s':>9} {'p50 ms':>8} {'p90 ms':>8} "
+          f"{'p99 ms':>8} {'p99.9 ms':>9} {'máx ms':>9} {'drenaje s':>10} {'sostenido':>10}")
+    for r in resultados:
+        p = r['latencias']
+        sostenido = 'sí' if r['drenaje'] <= args.margen_drenaje else 'no'
+        print(f"{r['ritmo']:>7.0f} {r['escritas']:>9} {r['puntuadas']:>10} {r['puntuadas_s']:>9.0f} "
+              f"{p[50]:>8.1f} {p[90]:>8.1f} {p[99]:>8.1f} {p[99.9]:>9.1f} {r['max']:>9.1f} "
+              f"{r['drenaje']:>10.2f} {sostenido:>10}")
+        if r['fallidas']:
+            print(f"        [!] {r['fallidas']} líneas sin parsear")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""CPU ahorrada frente a anomalías perdidas por la cascada (cascada.py) sobre un access.log.
+
+Cada ventana del log se puntúa con el modelo (la referencia, como sin
+cascada) y a la vez pasa por la primera etapa, con el reloj que marca la hora
+de cada línea. Se informa de la fracción de ventanas que llegarían al modelo,
+de qué parte de las anomalías de la referencia (MAE > --umbral) estarían entre
+ellas y del coste por línea de la primera etapa frente al del modelo.
+
+Uso: python benchmarks/bench_cascada.py access.log [--directorio .] [--umbral 0.15] [--muestreo 0.01 0.05]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from artefactos import cargar_artefactos, preparar_backend
+from cascada import Cascada
+from parser_apache import ParserApache
+from puntuar_historico import puntuar_secuencias
+from ventana import VentanaAnillo, VentanasPorClave
+from configuracion import (LOG_FORMAT, MODEL_FILE, SCALER_FILE, ENCODERS_FILE, TIMESTEPS, UMBRAL,
+                           CASCADA_COLUMNAS, CASCADA_RAREZA, CASCADA_MAX_PETICIONES, CASCADA_MAX_ERRORES,
+                           CASCADA_PERIODO, CASCADA_CALENTAMIENTO)
+
+
+def ventanas_del_log(lineas, artefactos, clave):
+    """(líneas parseadas, ventanas (n, TIMESTEPS, n_features), índice de línea de cada ventana)"""
+    parser = ParserApache(LOG_FORMAT)
+    registros = [r for r in map(parser.parsear, lineas) if r]
+    n_features = len(artefactos.feature_names)
+    ventanas = VentanasPorClave(TIMESTEPS, n_features) if clave else VentanaAnillo(TIMESTEPS, n_features)
+    secuencias, posiciones = [], []
+    for i, registro in enumerate(registros):
+        ventana = ventanas.ventana(registro.get(clave)) if clave else ventanas
+        artefactos.pipeline.transformar(registro, salida=ventana.reservar())
+        if ventana.lleno:
+            secuencias.append(ventana.vista().copy())
+            posiciones.append(i)
+    return registros, np.stack(secuencias), np.asarray(posiciones)
+
+
+def simular(registros, artefactos, clave, muestreo, calentamiento):
+    """Decisión de la primera etapa por línea (None si no cierra ventana) y segundos que costó"""
+    momento = [0.0]
+    cascada = Cascada(artefactos.pipeline, artefactos.tablas, TIMESTEPS, CASCADA_COLUMNAS,
+                      rareza=CASCADA_RAREZA, max_peticiones=CASCADA_MAX_PETICIONES,
+                      max_errores=CASCADA_MAX_ERRORES, periodo=CASCADA_PERIODO, muestreo=muestreo,
+                      calentamiento=calentamiento, reloj=lambda: momento[0], aleatorio=random.Random(0).random)
+    n_features = len(artefactos.feature_names)
+    ventanas = VentanasPorClave(TIMESTEPS, n_features) if clave else VentanaAnillo(TIMESTEPS, n_features)
+    instantes = [_instante(r) for r in registros]
+    filas = artefactos.pipeline.transformar_lote(registros)
+
+    decisiones = []
+    inicio = time.perf_counter()
+    for registro, instante, fila in zip(registros, instantes, filas):
+        momento[0] = instante
+        ventana = ventanas.ventana(registro.get(clave)) if clave else ventanas
+        fila_ventana = ventana.reservar()
+        fila_ventana[...] = fila
+        lleno = ventana.lleno
+        decision = cascada.decidir(registro, fila_ventana, ventana)
+        if lleno:
+            decisiones.append(decision or 'filtrada')
+    return np.asarray(decisiones), time.perf_counter() - inicio
+
+
+def _instante(registro):
+    try:
+        return datetime.strptime(registro['timestamp'], '%d/%b/%Y:%H:%M:%S %z').timestamp()
+    except (KeyError, ValueError):
+        return 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('log')
+    parser.add_argument('--directorio', default='.', help='Directorio con modelo, scaler y encoders')
+    parser.add_argument('--umbral', type=float, default=UMBRAL, help='Umbral fijo de la referencia')
+    parser.add_argument('--muestreo', type=float, nargs='+', default=[0.0, 0.01, 0.05])
+    parser.add_argument('--calentamiento', type=int, default=CASCADA_CALENTAMIENTO)
+    parser.add_argument('--clave', default='', help='Ventana por clave (vacío: global)')
+    parser.add_argument('--backend', default='numpy')
+    parser.add_argument('--max-lineas', type=int, default=None)
+    args = parser.parse_args()
+
+    ruta = lambda nombre: os.path.join(args.directorio, nombre)
+    artefactos = cargar_artefactos(ruta(MODEL_FILE), ruta(SCALER_FILE), ruta(ENCODERS_FILE))
+    backend = preparar_backend(args.backend, artefactos, TIMESTEPS, 256, np.inf, verificar=False)
+    with open(args.log, encoding='utf-8', errors='replace') as f:
+        lineas = f.readlines()[:args.max_lineas]
+
+    registros, secuencias, _ = ventanas_del_log(lineas, artefactos, args.clave)
+    puntuar_secuencias(backend, secuencias[:256], 256)  # Calentamiento
+    inicio = time.perf_counter()
+    maes = puntuar_secuencias(backend, secuencias, 256)
+    coste_modelo = (time.perf_counter() - inicio) / len(secuencias)
+    anomalias = maes > args.umbral
+    print(f"{len(registros)} líneas, {len(secuencias)} ventanas, {int(anomalias.sum())} anomalías con umbral "
+          f"{args.umbral:g}; modelo ({backend.nombre}): {coste_modelo * 1e6:.1f} us/ventana")
+
+    print(f"{'muestreo':>9} {'al modelo':>10} {'recall':>8} {'1ª etapa us/línea':>18} {'CPU ahorrada':>13}")
+    for muestreo in args.muestreo:
+        decisiones, segundos = simular(registros, artefactos, args.clave, muestreo, args.calentamiento)
+        pasan = decisiones != 'filtrada'
+        recall = (pasan & anomalias).sum() / max(anomalias.sum(), 1)
+        coste_etapa = segundos / len(registros)
+        ahorro = 1 - (pasan.sum() * coste_modelo + len(registros) * coste_etapa) / (len(secuencias) * coste_modelo)
+        print(f"{muestreo:>9g} {pasan.mean():>10.1%} {recall:>8.1%} {coste_etapa * 1e6:>18.1f} {ahorro:>13.1%}")
+
+
+if __name__ == '__main__':
+    main()
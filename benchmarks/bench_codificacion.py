@@ -0,0 +1,68 @@
+"""Coste por valor de LabelEncoder.transform (safe_transform) frente a las tablas compiladas.
+
+Antes de medir comprueba que todas las tablas dan exactamente los mismos códigos
+que el LabelEncoder para cada valor del vocabulario de entrenamiento.
+
+Uso: python benchmarks/bench_codificacion.py [--encoders encoders_logs_1.joblib]
+"""
+import os
+import sys
+import time
+import argparse
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from codificacion import compilar_tablas, verificar_tablas, safe_transform
+
+
+def medir(funcion, valores):
+    inicio = time.perf_counter()
+    for valor in valores:
+        funcion(valor)
+    return (time.perf_counter() - inicio) / len(valores)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--encoders', default='encoders_logs_1.joblib')
+    parser.add_argument('--muestras', type=int, default=20000)
+    parser.add_argument('--desconocidos', type=float, default=0.1,
+                        help='Fracción de valores que no están en el vocabulario')
+    parser.add_argument('--tamano-cache', type=int, default=4096)
+    args = parser.parse_args()
+
+    encoders = joblib.load(args.encoders)
+
+    inicio = time.perf_counter()
+    tablas = compilar_tablas(encoders, tamano_cache=args.tamano_cache)
+    print(f"[*] Tablas compiladas en {(time.perf_counter() - inicio) * 1e3:.1f} ms")
+
+    verificar_tablas(encoders, tablas)
+    print("[✓] Todos los vocabularios de entrenamiento dan códigos idénticos")
+
+    rng = np.random.default_rng(0)
+    print(f"{'columna':<14} {'vocab':>8} {'tabla':>6} {'sklearn us':>11} {'tabla us':>9} {'x':>7}")
+    for col, encoder in encoders.items():
+        if not hasattr(encoder, 'classes_'):
+            # CodificadorHash: ver bench_hashing.py
+            continue
+        clases = [str(clase) for clase in encoder.classes_]
+        valores = [clases[i] for i in rng.integers(0, len(clases), args.muestras)]
+        for i in np.flatnonzero(rng.random(args.muestras) < args.desconocidos):
+            valores[i] = f"desconocido-{i}"
+
+        # Los códigos deben coincidir también en la muestra, incluidos los desconocidos
+        muestra = valores[:2000]
+        if [tablas[col](v) for v in muestra] != [safe_transform(encoder, v) for v in muestra]:
+            raise SystemExit(f"[!] Discrepancia de códigos en la columna '{col}'")
+
+        t_sklearn = medir(lambda v: safe_transform(encoder, v), valores[:2000])
+        t_tabla = medir(tablas[col], valores)
+        tipo = type(tablas[col]).__name__.replace('TablaVocabulario', '') or 'dict'
+        print(f"{col:<14} {len(clases):>8} {tipo:>6} {t_sklearn * 1e6:>11.2f} {t_tabla * 1e6:>9.3f} {t_sklearn / t_tabla:>7.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""LabelEncoder frente a CodificadorHash (CODIFICACION_CATEGORICAS=hash) en una columna de alta cardinalidad.
+
+Para cada número de valores distintos se ajustan los dos sobre el mismo
+tráfico sintético (frecuencias Zipf, como IPs o URLs reales) y se informa del
+tamaño del artefacto joblib, del tiempo de carga hasta tener la tabla de
+inferencia (joblib.load + compilar_tablas) y del coste por valor de la tabla
+sobre un tráfico con una fracción de valores nuevos. `propio` es la parte del
+tráfico con código propio: en el vocabulario (label) o en el top (hash); el
+resto es 0 con LabelEncoder y una cubeta compartida con hashing.
+
+Uso: python benchmarks/bench_hashing.py [--distintos 10000 100000 1000000] [--top-k 1024] [--cubetas 4096]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import joblib
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from codificacion import CodificadorHash, compilar_tablas
+
+
+def trafico(rng, distintos, n, zipf=1.2):
+    """`n` URLs con frecuencias Zipf sobre `distintos` valores"""
+    rangos = np.minimum(rng.zipf(zipf, n), distintos) - 1
+    return [f"/producto/{i}?ref={i * 7919 % 100003}" for i in rangos.tolist()]
+
+
+def artefacto(encoder, directorio, nombre):
+    """(bytes en disco, segundos de joblib.load + compilar_tablas, tabla)"""
+    ruta = os.path.join(directorio, nombre)
+    joblib.dump({'url': encoder}, ruta)
+    inicio = time.perf_counter()
+    tablas = compilar_tablas(joblib.load(ruta))
+    return os.path.getsize(ruta), time.perf_counter() - inicio, tablas['url']
+
+
+def medir(tabla, valores):
+    inicio = time.perf_counter()
+    for valor in valores:
+        tabla(valor)
+    return (time.perf_counter() - inicio) / len(valores)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--distintos', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--top-k', type=int, default=1024)
+    parser.add_argument('--cubetas', type=int, default=4096)
+    parser.add_argument('--muestras', type=int, default=200000)
+    parser.add_argument('--nuevos', type=float, default=0.1, help='Fracción de valores nunca vistos al medir')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'distintos':>10} {'modo':>6} {'artefacto KB':>13} {'carga ms':>9} {'us/valor':>9} {'propio':>7}")
+    with tempfile.TemporaryDirectory() as directorio:
+        for distintos in args.distintos:
+            # Entrenamiento: todo el vocabulario más el tráfico que fija las frecuencias
+            vocabulario = [f"/producto/{i}?ref={i * 7919 % 100003}" for i in range(distintos)]
+            entrenamiento = vocabulario + trafico(rng, distintos, args.muestras)
+            valores = trafico(rng, distintos, args.muestras)
+            for i in np.flatnonzero(rng.random(len(valores)) < args.nuevos).tolist():
+                valores[i] = f"/nuevo/{i}"
+
+            label = LabelEncoder().fit(np.array(sorted(set(entrenamiento)), dtype=object))
+            hash_ = CodificadorHash(args.top_k, args.cubetas).fit(entrenamiento)
+            for modo, encoder in (('label', label), ('hash', hash_)):
+                tamano, carga, tabla = artefacto(encoder, directorio, f"{modo}.joblib")
+                coste = medir(tabla, valores)
+                propio = 1 - tabla.desconocidos / len(valores)
+                print(f"{distintos:>10} {modo:>6} {tamano / 1024:>13.1f} {carga * 1e3:>9.1f} "
+                      f"{coste * 1e6:>9.3f} {propio:>7.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Líneas/s del parser original (regex por llamada) frente a ParserApache y su modo por lotes.
+
+Antes de medir comprueba que ParserApache devuelve exactamente el mismo dict
+que el parser original para cada línea del fichero.
+
+Uso: python benchmarks/bench_parser.py --log access.log [--repeticiones 3]
+"""
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser_apache import ParserApache, FORMATO_COMBINED
+
+
+def parse_original(line):
+    """El parser anterior, tal cual, como referencia"""
+    regex = r'^(\S+) \S+ \S+ \[(.*?)\] "(\S+) (\S+) (\S+)" (\d+) (\d+|-) "(.*?)" "(.*?)"'
+    match = re.match(regex, line)
+    if not match:
+        return None
+    data = match.groups()
+    size = 0 if data[6] == '-' else int(data[6])
+    return {
+        'ip': data[0], 'timestamp': data[1], 'method': data[2], 'url': data[3],
+        'http_version': data[4], 'status_code': int(data[5]), 'response_size': size,
+        'referer': data[7], 'user_agent': data[8], 'tls_version': '-', 'cipher_suite': '-',
+        'log_source': 'apache_access_log'
+    }
+
+
+def medir(funcion, repeticiones):
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--log', required=True, help='Fichero en formato Combined')
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    with open(args.log, 'rb') as f:
+        crudo = f.read()
+    lineas = crudo.decode('utf-8', 'replace').splitlines()
+    parser_log = ParserApache(FORMATO_COMBINED)
+
+    distintas = sum(parser_log.parsear(linea) != parse_original(linea) for linea in lineas)
+    if distintas:
+        print(f"[!] {distintas} líneas con resultado distinto al parser original")
+        sys.exit(1)
+    rapidas = sum(parser_log._rapido(linea) is not None for linea in lineas)
+    print(f"[✓] {len(lineas)} líneas idénticas al parser original ({rapidas / max(len(lineas), 1):.1%} por el camino rápido)")
+
+    casos = [
+        ('original (re.match por línea)', lambda: [parse_original(linea) for linea in lineas]),
+        ('ParserApache.parsear', lambda: [parser_log.parsear(linea) for linea in lineas]),
+        ('ParserApache.parsear_lote', lambda: parser_log.parsear_lote(lineas)),
+        ('ParserApache.parsear_lote (bytes)', lambda: parser_log.parsear_lote(crudo)),
+    ]
+    base = None
+    print(f"{'variante':<36} {'líneas/s':>12} {'aceleración':>12}")
+    for nombre, funcion in casos:
+        segundos = medir(funcion, args.repeticiones)
+        base = base or segundos
+        print(f"{nombre:<36} {len(lineas) / segundos:>12,.0f} {base / segundos:>11.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Escalado del pipeline multiproceso: líneas/s con 1..N workers sobre un access.log fijo.
+
+Uso: python benchmarks/bench_pipeline.py --log access.log [--workers 1 2 4 8]
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from configuracion import configurar_logging
+from pipeline_multiproceso import ejecutar_pipeline, configuracion_worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--log', required=True, help='Fichero en Apache Combined Log Format')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--clave', default='', help='CLAVE_VENTANA de los workers (vacío: ventana global)')
+    parser.add_argument('--backend', default=None, help='Backend de inferencia (por defecto BACKEND_INFERENCIA)')
+    parser.add_argument('--tamano-bloque', type=int, default=256)
+    args = parser.parse_args()
+
+    configurar_logging()
+    resultados = []
+    for n in sorted(set(args.workers)):
+        config = configuracion_worker(n, args.clave)
+        if args.backend:
+            config['backend'] = args.backend
+        e = ejecutar_pipeline(args.log, lambda mae, parsed_data: None, n_workers=n, clave=args.clave,
+                              seguir=False, tamano_bloque=args.tamano_bloque, config=config)
+        duracion = e['t_fin'] - e['t_listo']
+        resultados.append((n, e['lineas'], e['puntuadas'], e['lineas'] / duracion))
+
+    base = resultados[0][3]
+    print(f"\n{'workers':>7} {'líneas':>9} {'puntuadas':>10} {'líneas/s':>10} {'escalado':>9}")
+    for n, lineas, puntuadas, velocidad in resultados:
+        print(f"{n:>7} {lineas:>9} {puntuadas:>10} {velocidad:>10.0f} {velocidad / base:>8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Tiempo y memoria de crear_secuencias: bucle + np.array frente a vistas con sliding_window_view.
+
+Para cada tamaño mide la construcción de las ventanas (tiempo y pico de
+memoria asignada según tracemalloc) y el coste de materializar lotes con el
+gather de GeneradorVentanas. La versión original se omite cuando su copia
+superaría --limite-original-mb.
+
+Uso: python benchmarks/bench_secuencias.py [--filas 100000 1000000 10000000]
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MODELO_LOGS_V2 import crear_secuencias, seleccionar_ventanas
+
+
+def crear_secuencias_original(data, time_steps=10):
+    """La versión anterior, como referencia"""
+    sequences = []
+    for i in range(len(data) - time_steps):
+        sequences.append(data[i:(i + time_steps)])
+    return np.array(sequences)
+
+
+def medir(funcion, *args):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, segundos, pico / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, nargs='+', default=[100000, 1000000, 10000000])
+    parser.add_argument('--features', type=int, default=11)
+    parser.add_argument('--time-steps', type=int, default=10)
+    parser.add_argument('--batch', type=int, default=32)
+    parser.add_argument('--lotes', type=int, default=2000, help='Lotes aleatorios materializados por tamaño')
+    parser.add_argument('--paso', type=int, default=1, help='Una de cada N ventanas')
+    parser.add_argument('--limite-original-mb', type=float, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'filas':>10} {'variante':<22} {'tiempo':>10} {'pico MB':>10} {'lote µs':>9}")
+    for filas in args.filas:
+        data = rng.random((filas, args.features), dtype=np.float32)
+        copia_mb = (filas - args.time_steps) * args.time_steps * args.features * data.itemsize / 2**20
+
+        if copia_mb <= args.limite_original_mb:
+            original, segundos, pico = medir(crear_secuencias_original, data, args.time_steps)
+            print(f"{filas:>10} {'bucle + np.array':<22} {segundos:>9.3f}s {pico:>10.1f} {'-':>9}")
+            del original
+        else:
+            print(f"{filas:>10} {'bucle + np.array':<22} {'omitido':>10} {copia_mb:>9.0f}* {'-':>9}")
+
+        ventanas, segundos, pico = medir(crear_secuencias, data, args.time_steps)
+        indices = seleccionar_ventanas(len(ventanas), args.paso)
+        lotes = rng.choice(indices, size=(args.lotes, args.batch))
+        inicio = time.perf_counter()
+        for lote in lotes:
+            ventanas[lote]
+        por_lote = (time.perf_counter() - inicio) / args.lotes * 1e6
+        print(f"{filas:>10} {'vista + gather':<22} {segundos * 1e3:>8.3f}ms {pico:>10.3f} {por_lote:>9.1f}")
+        del data, ventanas
+    print("* memoria estimada de la copia que se habría creado")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""Caché en disco del dataset de entrenamiento ya codificado y escalado.
+
+Cada entrada es un directorio `<directorio>/<clave>/` con:
+  - matriz.npy       matriz escalada (filas en orden cronológico, float32)
+  - scaler.joblib    MinMaxScaler ajustado
+  - encoders.joblib  LabelEncoders ajustados
+  - meta.json        fichero de origen, huella, configuración, forma...
+
+La clave combina la huella del contenido del CSV y la configuración de
+preprocesado: si cambia cualquiera de las dos, la entrada ya no se encuentra.
+No caduca sola; se invalida explícitamente (`invalidar`, o este módulo por
+línea de comandos).
+
+Varios procesos pueden usarla a la vez: quien construye una entrada lo hace
+en un directorio temporal bajo un flock por clave y la publica con un rename
+atómico, así que un lector nunca ve una entrada a medias y dos escritores de
+la misma clave no duplican el trabajo.
+
+Uso: python cache_datos.py listar | invalidar CLAVE... | invalidar --fichero datos.csv | invalidar --todo
+"""
+import os
+import sys
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+import argparse
+import tempfile
+import contextlib
+import joblib
+import numpy as np
+
+DIRECTORIO_CACHE = 'cache_datos'
+MATRIZ = 'matriz.npy'
+SCALER = 'scaler.joblib'
+ENCODERS = 'encoders.joblib'
+META = 'meta.json'
+
+
+def huella_fichero(ruta, tamano_bloque=1 << 20):
+    """BLAKE2b del contenido del fichero, leído por bloques"""
+    h = hashlib.blake2b(digest_size=20)
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(tamano_bloque), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class EntradaCache:
+    """Una entrada publicada; la matriz se abre mapeada en disco, sin leerla"""
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        with open(os.path.join(directorio, META), encoding='utf-8') as f:
+            self.meta = json.load(f)
+
+    @property
+    def clave(self):
+        return self.meta['clave']
+
+    @property
+    def ruta_matriz(self):
+        return os.path.join(self.directorio, MATRIZ)
+
+    @property
+    def ruta_scaler(self):
+        return os.path.join(self.directorio, SCALER)
+
+    @property
+    def ruta_encoders(self):
+        return os.path.join(self.directorio, ENCODERS)
+
+    def matriz(self):
+        return np.load(self.ruta_matriz, mmap_mode='r')
+
+    def scaler(self):
+        return joblib.load(self.ruta_scaler)
+
+    def encoders(self):
+        return joblib.load(self.ruta_encoders)
+
+
+class CacheDatos:
+    """Directorio de entradas indexadas por `clave(ruta, config)`"""
+
+    def __init__(self, directorio=DIRECTORIO_CACHE):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+
+    def clave(self, ruta, config, huella=None):
+        """Clave de la entrada para el CSV `ruta` preprocesado con `config` (dict serializable a JSON)"""
+        huella = huella or huella_fichero(ruta)
+        h = hashlib.blake2b(digest_size=16)
+        h.update(huella.encode())
+        h.update(json.dumps(config, sort_keys=True).encode())
+        return h.hexdigest()
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave)
+
+    @contextlib.contextmanager
+    def _bloqueo(self, clave):
+        """flock exclusivo por clave entre todos los procesos que usan el directorio"""
+        with open(os.path.join(self.directorio, f'.{clave}.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def buscar(self, clave):
+        """La entrada publicada para `clave`, o None"""
+        try:
+            return EntradaCache(self._ruta(clave))
+        except FileNotFoundError:
+            return None
+
+    def obtener(self, clave, construir, meta=None, refrescar=False):
+        """Devuelve (entrada, construida).
+
+        Si no hay entrada (o `refrescar`), llama a `construir(directorio)`, que
+        debe dejar en ese directorio temporal matriz.npy, scaler.joblib y
+        encoders.joblib, y publica el resultado. Si otro proceso está
+        construyendo la misma clave, espera y reutiliza la suya.
+        """
+        if not refrescar:
+            entrada = self.buscar(clave)
+            if entrada is not None:
+                return entrada, False
+
+        with self._bloqueo(clave):
+            if refrescar:
+                self._retirar(clave)
+            else:
+                entrada = self.buscar(clave)
+                if entrada is not None:
+                    return entrada, False
+
+            temporal = tempfile.mkdtemp(prefix=f'.{clave}.', dir=self.directorio)
+            try:
+                inicio = time.perf_counter()
+                construir(temporal)
+                for nombre in (MATRIZ, SCALER, ENCODERS):
+                    if not os.path.exists(os.path.join(temporal, nombre)):
+                        raise FileNotFoundError(f"La construcción no generó '{nombre}'")
+                forma = np.load(os.path.join(temporal, MATRIZ), mmap_mode='r').shape
+                meta = dict(meta or {}, clave=clave, filas=forma[0], features=forma[1],
+                            creado=time.strftime('%Y-%m-%dT%H:%M:%S'),
+                            segundos_construccion=round(time.perf_counter() - inicio, 3))
+                with open(os.path.join(temporal, META), 'w', encoding='utf-8') as f:
+                    json.dump(meta, f, indent=2, ensure_ascii=False)
+                os.rename(temporal, self._ruta(clave))
+            except BaseException:
+                shutil.rmtree(temporal, ignore_errors=True)
+                raise
+        return self.buscar(clave), True
+
+    def _retirar(self, clave):
+        """Quita la entrada con un rename (los memmaps ya abiertos siguen siendo válidos) y la borra"""
+        try:
+            retirada = tempfile.mkdtemp(prefix=f'.borrar.{clave}.', dir=self.directorio)
+            os.rename(self._ruta(clave), os.path.join(retirada, clave))
+        except FileNotFoundError:
+            os.rmdir(retirada)
+            return False
+        shutil.rmtree(retirada, ignore_errors=True)
+        return True
+
+    def invalidar(self, clave):
+        """Borra la entrada `clave`; True si existía"""
+        with self._bloqueo(clave):
+            return self._retirar(clave)
+
+    def entradas(self):
+        """Entradas publicadas, de la más reciente a la más antigua"""
+        entradas = []
+        for nombre in os.listdir(self.directorio):
+            if nombre.startswith('.'):
+                continue
+            entrada = self.buscar(nombre)
+            if entrada is not None:
+                entradas.append(entrada)
+        return sorted(entradas, key=lambda e: e.meta.get('creado', ''), reverse=True)
+
+    def invalidar_fichero(self, ruta):
+        """Borra las entradas creadas a partir de `ruta` (por ruta o por contenido actual)"""
+        ruta = os.path.abspath(ruta)
+        huella = huella_fichero(ruta) if os.path.exists(ruta) else None
+        claves = [e.clave for e in self.entradas()
+                  if e.meta.get('fichero') == ruta or (huella and e.meta.get('huella') == huella)]
+        return [clave for clave in claves if self.invalidar(clave)]
+
+    def invalidar_todo(self):
+        return [e.clave for e in self.entradas() if self.invalidar(e.clave)]
+
+
+def _tamano_directorio(ruta):
+    return sum(os.path.getsize(os.path.join(ruta, nombre)) for nombre in os.listdir(ruta))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Caché del dataset de entrenamiento preprocesado')
+    parser.add_argument('--directorio', default=os.getenv('CACHE_DATOS_DIR', DIRECTORIO_CACHE))
+    ordenes = parser.add_subparsers(dest='orden', required=True)
+    ordenes.add_parser('listar', help='Entradas publicadas')
+    invalidar = ordenes.add_parser('invalidar', help='Borrar entradas')
+    invalidar.add_argument('claves', nargs='*')
+    invalidar.add_argument('--fichero', help='Todas las entradas creadas a partir de este CSV')
+    invalidar.add_argument('--todo', action='store_true')
+    args = parser.parse_args()
+
+    cache = CacheDatos(args.directorio)
+    if args.orden == 'listar':
+        entradas = cache.entradas()
+        if not entradas:
+            print(f"[*] Caché vacía ({args.directorio})")
+        for e in entradas:
+            print(f"{e.clave}  {e.meta['filas']:>10} x {e.meta['features']:<3} "
+                  f"{_tamano_directorio(e.directorio) / 2**20:>9.1f} MB  {e.meta.get('creado', '?')}  "
+                  f"{e.meta.get('fichero', '?')}")
+        return
+
+    if args.todo:
+        borradas = cache.invalidar_todo()
+    elif args.fichero:
+        borradas = cache.invalidar_fichero(args.fichero)
+    elif args.claves:
+        borradas = [clave for clave in args.claves if cache.invalidar(clave)]
+    else:
+        parser.error('indica CLAVE..., --fichero o --todo')
+    print(f"[✓] {len(borradas)} entradas invalidadas" + (f": {', '.join(borradas)}" if borradas else ''))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,275 +1,448 @@
 import time
-import pandas as pd
-import numpy as np
-import joblib
+_INICIO = time.monotonic()
+
 import os
-import re
 import sys
 import logging
-from collections import deque
-from tensorflow.keras.models import load_model
-from prometheus_client import start_http_server, Counter, Gauge
-from influxdb_client import InfluxDBClient, Point
-from influxdb_client.client.write_api import SYNCHRONOUS
-import warnings
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from prometheus_client import REGISTRY, CollectorRegistry, start_http_server
+from configuracion import (
+    LOG_FILE_PATH, LOG_FORMAT, SEGUIDOR_CHECKPOINT, LOG_SOURCE, FUENTES, FUENTES_REVISION, MODEL_FILE, SCALER_FILE, ENCODERS_FILE,
+    INFLUXDB_URL, INFLUXDB_TOKEN, INFLUXDB_ORG, INFLUXDB_BUCKET,
+    INFLUX_TAMANO_LOTE, INFLUX_INTERVALO_MS, INFLUX_MAX_COLA, INFLUX_REINTENTOS,
+    INFLUX_POLITICA_COLA_LLENA, INFLUX_RUTA_DERRAME, INFLUX_AGREGACION, INFLUX_AGREGACION_INTERVALO,
+    INFLUX_AGREGACION_TOP_K,
+    TIMESTEPS, UMBRAL, UMBRAL_MODO, UMBRAL_SIGMAS, UMBRAL_PERCENTIL, UMBRAL_ALFA, UMBRAL_CALENTAMIENTO,
+    UMBRAL_ESTADO, TAMANO_LOTE, ESPERA_MAX_LOTE_MS, BACKEND_INFERENCIA, TOLERANCIA_BACKEND,
+    TAMANO_CACHE_VOCAB, CLAVE_VENTANA, MAX_CLAVES_VENTANA, PROMETHEUS_PORT,
+    INSTRUMENTACION, INSTRUMENTACION_MUESTREO, PERFIL_DIRECTORIO, ATRIBUCION, ATRIBUCION_TOP,
+    CASCADA, CASCADA_COLUMNAS, CASCADA_RAREZA, CASCADA_MAX_PETICIONES, CASCADA_MAX_ERRORES, CASCADA_PERIODO,
+    CASCADA_MUESTREO, CASCADA_CALENTAMIENTO, MODELOS_DIR, MODELOS_REVISION,
+    MODELOS_CONTROL_PUERTO, MODELOS_CONTROL_HOST, MODELOS_CONTROL_TOKEN,
+    BUCKETS_SCORE, VENTANAS_CUANTILES, CUANTILES_SCORE, PRECISION_CUANTILES,
+    configurar_logging, mostrar_configuracion
+)
+from arranque import Arranque
+
+# El resto de módulos (TensorFlow, sklearn, influxdb_client...) se importan
+# dentro de las fases de arranque, con el servidor de métricas ya levantado.
 
 # Configuración de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+configurar_logging()
 logger = logging.getLogger(__name__)
 
-# --- CONFIGURACIÓN ---
-LOG_FILE_PATH = '/var/log/apache2/access.log'
-INFLUXDB_URL = os.getenv('INFLUXDB_URL', 'http://localhost:8086')
-INFLUXDB_TOKEN = os.getenv('INFLUXDB_TOKEN', 'my-super-secret-token')
-INFLUXDB_ORG = os.getenv('INFLUXDB_ORG', 'my-org')
-INFLUXDB_BUCKET = os.getenv('INFLUXDB_BUCKET', 'network_traffic')
-TIMESTEPS = 10 
-UMBRAL = 0.15
-
-logger.info("=" * 60)
-logger.info("INICIANDO SISTEMA DE DETECCIÓN DE ANOMALÍAS EN LOGS")
-logger.info("=" * 60)
-logger.info(f"INFLUXDB_URL: {INFLUXDB_URL}")
-logger.info(f"INFLUXDB_ORG: {INFLUXDB_ORG}")
-logger.info(f"INFLUXDB_BUCKET: {INFLUXDB_BUCKET}")
-logger.info(f"LOG_FILE_PATH: {LOG_FILE_PATH}")
-logger.info(f"TIMESTEPS: {TIMESTEPS}")
-logger.info(f"UMBRAL: {UMBRAL}")
-logger.info("=" * 60)
-
-# --- CARGA DE ARTEFACTOS ---
-logger.info("[*] Cargando modelo y transformadores...")
-try:
-    # Verificar existencia de archivos
-    required_files = [
-        'modelo_logs_1.h5',
-        'scaler_logs_1.joblib',
-        'encoders_logs_1.joblib'
-    ]
-    
-    for file in required_files:
-        if not os.path.exists(file):
-            logger.error(f"[!] ERROR CRÍTICO: No se encuentra el archivo {file}")
-            logger.error(f"    Archivos en directorio actual: {os.listdir('.')}")
-            sys.exit(1)
-    
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore")
-        modelo = load_model('modelo_logs_1.h5', compile=False)
-        scaler = joblib.load('scaler_logs_1.joblib')
-        encoders = joblib.load('encoders_logs_1.joblib')
-    
-    logger.info("[✓] Artefactos cargados exitosamente.")
-    logger.info(f"    - Modelo: {modelo}")
-    logger.info(f"    - Encoders disponibles: {list(encoders.keys())}")
-    
-    # NUEVO: Extraer nombres de características del scaler
-    if hasattr(scaler, 'feature_names_in_'):
-        FEATURE_NAMES = list(scaler.feature_names_in_)
-        logger.info(f"    - Feature names detectados: {FEATURE_NAMES}")
-    else:
-        # Fallback: orden esperado de características
-        FEATURE_NAMES = ['ip', 'method', 'url', 'http_version', 'referer', 
-                        'user_agent', 'tls_version', 'cipher_suite', 'log_source',
-                        'status_code', 'response_size']
-        logger.warning(f"    - Feature names no encontrados, usando orden por defecto")
-        
-except Exception as e:
-    logger.error(f"[!] Error crítico cargando archivos: {e}")
-    logger.error(f"    Tipo de error: {type(e).__name__}")
-    import traceback
-    logger.error(traceback.format_exc())
-    sys.exit(1)
-
-# --- CONEXIÓN INFLUXDB ---
-logger.info("[*] Conectando a InfluxDB...")
-try:
-    influx_client = InfluxDBClient(url=INFLUXDB_URL, token=INFLUXDB_TOKEN, org=INFLUXDB_ORG)
-    write_api = influx_client.write_api(write_options=SYNCHRONOUS)
-    
-    # Verificar conexión
-    health = influx_client.health()
-    logger.info(f"[✓] Conexión a InfluxDB exitosa - Estado: {health.status}")
-except Exception as e:
-    logger.error(f"[!] Error conectando a InfluxDB: {e}")
-    logger.warning("    Continuando sin InfluxDB...")
-    write_api = None
-
-# --- MÉTRICAS PROMETHEUS ---
-logger.info("[*] Configurando métricas Prometheus...")
-PAQUETES_PROCESADOS = Counter('logs_procesados_total', 'Total de líneas de log analizadas')
-ANOMALIA_SCORE = Gauge('log_anomalia_score', 'Score de anomalía del último log')
-ANOMALIA_DETECTADA = Gauge('log_anomalia_detectada', '1 si es anomalía, 0 si no')
-
-# Buffer
-ventana_deslizante = deque(maxlen=TIMESTEPS)
-
-def safe_transform(encoder, value):
-    """Maneja valores nuevos asignándolos a clase 'desconocida' (0)"""
-    try:
-        return encoder.transform([str(value)])[0]
-    except ValueError:
-        return 0 
-
-def parse_apache_log(line):
-    """Parsea logs de Apache Combined Format usando Regex"""
-    regex = r'^(\S+) \S+ \S+ \[(.*?)\] "(\S+) (\S+) (\S+)" (\d+) (\d+|-) "(.*?)" "(.*?)"'
-    
-    match = re.match(regex, line)
-    if not match:
-        return None
-    
-    data = match.groups()
-    
-    size = data[6]
-    if size == '-':
-        size = 0
-    else:
-        size = int(size)
-
-    return {
-        'ip': data[0],
-        'timestamp': data[1],
-        'method': data[2],
-        'url': data[3],
-        'http_version': data[4],
-        'status_code': int(data[5]),
-        'response_size': size,
-        'referer': data[7],
-        'user_agent': data[8],
-        'tls_version': '-', 
-        'cipher_suite': '-',
-        'log_source': 'apache_access_log'
-    }
-
-def procesar_log(raw_line):
-    parsed_data = parse_apache_log(raw_line)
-    
-    if not parsed_data: 
-        return
 
-    try:
-        # SOLUCIÓN: Crear DataFrame con nombres de columnas
-        features_dict = {}
-        
-        # Procesar Columnas Categóricas
-        cat_cols = ['ip', 'method', 'url', 'http_version', 'referer', 
-                    'user_agent', 'tls_version', 'cipher_suite', 'log_source']
-        
-        for col in cat_cols:
-            val = str(parsed_data.get(col, '-'))
-            if col in encoders:
-                val_encoded = safe_transform(encoders[col], val)
+class Capturador:
+    """Parser, ventanas y motor de inferencia listos para procesar líneas del log.
+
+    Con `instrumentacion` (ver instrumentacion.py) una de cada `cada` líneas
+    recorre `_procesar_medido`; sin ella `procesar_log` es directamente el
+    camino sin medir. Con CASCADA (ver cascada.py) solo las ventanas que deja
+    pasar la primera etapa llegan al motor. Parser y ventanas son de cada fuente
+    (`FuenteLog`, ver ingesta.py); sin indicarla, la de LOG_FILE_PATH.
+
+    Con MODELOS_DIR (ver recarga.py) el conjunto de modelo (artefactos,
+    backend, umbral y cascada) se sustituye en caliente con `aplicar_conjunto`.
+    """
+
+    def __init__(self, artefactos, backend, escritor_influx, instrumentacion=None, version=''):
+        from inferencia import MotorInferenciaPorLotes
+        from instrumentacion import LINEAS_FALLIDAS
+        from resultados import RegistroResultados
+        from estadisticas_score import EstadisticasScore
+        from atribucion import AtribucionErrores
+        from agregacion import AgregadorInflux
+        from recarga import ConjuntoModelo
+
+        self.artefactos = artefactos
+        self.pipeline = artefactos.pipeline
+        self.escritor_influx = escritor_influx
+        self.instrumentacion = instrumentacion
+        self._lineas_fallidas = LINEAS_FALLIDAS
+
+        logger.info("[*] Configurando métricas Prometheus...")
+        self.estadisticas = EstadisticasScore(BUCKETS_SCORE, VENTANAS_CUANTILES, CUANTILES_SCORE, PRECISION_CUANTILES)
+        self.umbral = self._crear_umbral(artefactos.ruta_modelo)
+        self.atribucion = AtribucionErrores(artefactos.feature_names, ATRIBUCION_TOP) if ATRIBUCION else None
+        self.agregador = None
+        if INFLUX_AGREGACION and escritor_influx:
+            self.agregador = AgregadorInflux(escritor_influx, INFLUX_AGREGACION_INTERVALO, INFLUX_AGREGACION_TOP_K)
+        self.registrar_resultado = RegistroResultados(self.umbral, escritor_influx, self.estadisticas,
+                                                      self.atribucion, self.agregador)
+
+        # Parser y buffer de LOG_FILE_PATH: una ventana global o una por valor de CLAVE_VENTANA (p. ej. 'ip')
+        self.fuente = self.crear_fuente(LOG_SOURCE, LOG_FILE_PATH)
+
+        self.cascada = self._crear_cascada(artefactos)
+
+        # Motor de inferencia por lotes
+        self.motor = MotorInferenciaPorLotes(
+            backend,
+            self.registrar_resultado,
+            tamano_lote=TAMANO_LOTE,
+            espera_max_ms=ESPERA_MAX_LOTE_MS,
+            instrumentacion=instrumentacion,
+            al_puntuar_lote=self.registrar_resultado.lote if self.cascada is None else self._puntuar_lote_cascada
+        )
+
+        # Conjunto de modelo vigente y el pendiente de cambiar (lo aplica el hilo lector entre dos líneas)
+        self.conjunto = ConjuntoModelo(version, artefactos, backend, self.umbral, self.cascada)
+        self._cambio = None
+
+        if instrumentacion is None:
+            self.procesar_log = self._procesar
+        else:
+            self._hasta_medida = 1
+
+    def _crear_umbral(self, ruta_modelo):
+        from umbral_adaptativo import umbral_para_modelo
+        return umbral_para_modelo(ruta_modelo, UMBRAL_MODO, UMBRAL, UMBRAL_ESTADO or None,
+                                  sigmas=UMBRAL_SIGMAS, percentil=UMBRAL_PERCENTIL, alfa=UMBRAL_ALFA,
+                                  calentamiento=UMBRAL_CALENTAMIENTO, precision=PRECISION_CUANTILES)
+
+    def _crear_cascada(self, artefactos):
+        if not CASCADA:
+            return None
+        from cascada import Cascada
+        return Cascada(
+            artefactos.pipeline, artefactos.tablas, TIMESTEPS, CASCADA_COLUMNAS,
+            rareza=CASCADA_RAREZA, max_peticiones=CASCADA_MAX_PETICIONES, max_errores=CASCADA_MAX_ERRORES,
+            periodo=CASCADA_PERIODO, muestreo=CASCADA_MUESTREO, calentamiento=CASCADA_CALENTAMIENTO
+        )
+
+    def preparar_conjunto(self, rutas):
+        """Carga, calienta y valida otra versión de los artefactos sin tocar la actual (hilo de recarga)"""
+        from artefactos import cargar_artefactos, preparar_backend
+        from inferencia import calentar_backend
+        from recarga import ConjuntoModelo, validar_conjunto
+
+        artefactos = cargar_artefactos(rutas.modelo, rutas.scaler, rutas.encoders, TAMANO_CACHE_VOCAB)
+        backend = preparar_backend(BACKEND_INFERENCIA, artefactos, TIMESTEPS, TAMANO_LOTE, TOLERANCIA_BACKEND)
+        calentar_backend(backend, TIMESTEPS, len(artefactos.feature_names), TAMANO_LOTE)
+        validar_conjunto(artefactos, backend, self.artefactos.feature_names, TIMESTEPS)
+        return ConjuntoModelo(rutas.version, artefactos, backend, self._crear_umbral(rutas.modelo),
+                              self._crear_cascada(artefactos))
+
+    def aplicar_conjunto(self, conjunto):
+        """Pide el cambio a `conjunto`; se hace antes de procesar la siguiente línea"""
+        self._cambio = conjunto
+
+    def _cambiar_conjunto(self):
+        # Hilo lector: las líneas siguientes se codifican con el conjunto nuevo y el motor
+        # cambia de modelo justo después de puntuar las ventanas ya encoladas
+        conjunto, self._cambio = self._cambio, None
+        self.conjunto = conjunto
+        self.artefactos = conjunto.artefactos
+        self.pipeline = conjunto.artefactos.pipeline
+        self.cascada = conjunto.cascada
+        self.motor.cambiar(conjunto.backend, lambda: self._cambiar_umbral(conjunto.umbral))
+
+    def _cambiar_umbral(self, umbral):
+        # Hilo del motor, entre dos lotes
+        self.umbral = umbral
+        self.registrar_resultado.cambiar_umbral(umbral)
+
+    def crear_fuente(self, nombre, ruta=None):
+        """Parser con `log_source=nombre` y ventanas propias para un log"""
+        from ingesta import FuenteLog
+        return FuenteLog(nombre, LOG_FORMAT, TIMESTEPS, len(self.artefactos.feature_names), CLAVE_VENTANA,
+                         MAX_CLAVES_VENTANA, ruta)
+
+    def procesar_log(self, raw_line, fuente=None):
+        self._hasta_medida -= 1
+        if self._hasta_medida:
+            return self._procesar(raw_line, fuente)
+        self._hasta_medida = self.instrumentacion.cada
+        return self._procesar_medido(raw_line, fuente)
+
+    def _procesar(self, raw_line, fuente=None):
+        """Procesa una línea de `fuente`; devuelve la línea parseada (None si no se pudo parsear)"""
+        if fuente is None:
+            fuente = self.fuente
+        if self._cambio is not None:
+            self._cambiar_conjunto()
+        parsed_data = fuente.parser.parsear(raw_line)
+
+        if not parsed_data:
+            self._lineas_fallidas.inc()
+            return None
+
+        try:
+            ventana = fuente.ventana(parsed_data)
+
+            # Codificación y escalado fusionados en el buffer del pipeline; la fila
+            # solo entra en la ventana si se transformó entera
+            fila = ventana.agregar(self.pipeline.transformar(parsed_data))
+
+            # Cuando la ventana está llena se encola para el siguiente lote
+            if self.cascada is not None:
+                self._filtrar(parsed_data, fila, ventana)
+            elif ventana.lleno:
+                self.motor.enviar(ventana.vista(), parsed_data)
+
+        except Exception as e:
+            logger.error(f"[!] Error procesando log: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+        return parsed_data
+
+    def _procesar_medido(self, raw_line, fuente=None):
+        """Mismo camino que `_procesar`, cronometrando cada etapa"""
+        instr = self.instrumentacion
+        reloj = time.perf_counter
+        if fuente is None:
+            fuente = self.fuente
+        if self._cambio is not None:
+            self._cambiar_conjunto()
+
+        inicio = reloj()
+        parsed_data = fuente.parser.parsear(raw_line)
+        parseado = reloj()
+        instr.parsear(parseado - inicio)
+
+        if not parsed_data:
+            self._lineas_fallidas.inc()
+            return None
+
+        try:
+            ventana = fuente.ventana(parsed_data)
+            buscado = reloj()
+
+            fila = self.pipeline.codificar(parsed_data)
+            codificado = reloj()
+            instr.codificar(codificado - buscado)
+
+            fila = self.pipeline.escalar(fila)
+            escalado = reloj()
+            instr.escalar(escalado - codificado)
+
+            fila_ventana = ventana.agregar(fila)
+            agregado = reloj()
+
+            if self.cascada is not None:
+                decision = self.cascada.decidir(parsed_data, fila_ventana, ventana)
+                filtrado = reloj()
+                instr.cascada(filtrado - agregado)
+                if decision:
+                    parsed_data['cascada'] = decision
+                    self.motor.enviar(ventana.vista(), parsed_data)
+                instr.ventana((buscado - parseado) + (agregado - escalado) + (reloj() - filtrado))
             else:
-                val_encoded = 0
-            features_dict[col] = val_encoded
-
-        # Procesar Columnas Numéricas
-        num_cols = ['status_code', 'response_size']
-        for col in num_cols:
-            val = parsed_data.get(col, 0)
-            features_dict[col] = float(val)
-
-        # CAMBIO PRINCIPAL: Crear DataFrame en lugar de numpy array
-        df_row = pd.DataFrame([features_dict])
-        
-        # Asegurar orden correcto de columnas
-        df_row = df_row[FEATURE_NAMES]
-        
-        # Escalar usando DataFrame (elimina el warning)
-        vector_scaled = scaler.transform(df_row)
-
-        # Añadir a ventana temporal
-        ventana_deslizante.append(vector_scaled[0])
-
-        # Predicción cuando la ventana está llena
-        if len(ventana_deslizante) == TIMESTEPS:
-            secuencia = np.array([list(ventana_deslizante)])
-            
-            reconstruccion = modelo.predict(secuencia, verbose=0)
-            
-            mae = np.mean(np.abs(reconstruccion - secuencia))
-            
-            es_anomalia = mae > UMBRAL
-
-            # Métricas
-            PAQUETES_PROCESADOS.inc()
-            ANOMALIA_SCORE.set(mae)
-            ANOMALIA_DETECTADA.set(1 if es_anomalia else 0)
-
-            if es_anomalia:
-                logger.warning(f"🚨 ANOMALÍA: IP={parsed_data['ip']} URL={parsed_data['url']} Score={mae:.4f}")
-            
-            # Enviar a InfluxDB
-            if write_api:
-                try:
-                    p = Point("web_traffic") \
-                        .tag("ip", str(parsed_data['ip'])) \
-                        .tag("method", str(parsed_data['method'])) \
-                        .tag("status", str(parsed_data['status_code'])) \
-                        .field("score_anomalia", float(mae)) \
-                        .field("is_anomaly", int(es_anomalia)) \
-                        .field("response_size", int(parsed_data['response_size'])) \
-                        .field("url", str(parsed_data['url']))
-                    
-                    write_api.write(bucket=INFLUXDB_BUCKET, org=INFLUXDB_ORG, record=p)
-                except Exception as e:
-                    logger.error(f"Error escribiendo a InfluxDB: {e}")
+                if ventana.lleno:
+                    self.motor.enviar(ventana.vista(), parsed_data)
+                instr.ventana((buscado - parseado) + (reloj() - escalado))
 
-    except Exception as e:
-        logger.error(f"[!] Error procesando log: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
+        except Exception as e:
+            logger.error(f"[!] Error procesando log: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+        return parsed_data
+
+    def _filtrar(self, parsed_data, fila, ventana):
+        decision = self.cascada.decidir(parsed_data, fila, ventana)
+        if decision:
+            parsed_data['cascada'] = decision
+            self.motor.enviar(ventana.vista(), parsed_data)
+
+    def _puntuar_lote_cascada(self, maes, contextos, diferencias):
+        # El umbral adaptativo solo aprende de lo que no eligió la primera etapa
+        anomalias = self.registrar_resultado.lote(maes, contextos, diferencias,
+                                                  actualizar_umbral=self.cascada.sin_sesgo(contextos))
+        self.cascada.comparar(contextos, anomalias)
+
+    def detener(self):
+        self.motor.detener(timeout=5)
+        self.umbral.guardar()
+        if self.agregador:
+            self.agregador.detener(timeout=5)
+        if self.escritor_influx:
+            self.escritor_influx.detener(timeout=10)
+
+
+# --- FASES DE ARRANQUE ---
+def cargar_modelo(arranque, rutas=None):
+    """Artefactos, backend verificado y una pasada de calentamiento.
+
+    Devuelve (artefactos, backend, verificacion_pendiente): con un backend sin
+    TensorFlow la comparación con Keras se deja para después de estar listo.
+    `rutas` (RutasModelo) sustituye a MODEL_FILE, SCALER_FILE y ENCODERS_FILE.
+    """
+    from artefactos import cargar_artefactos, preparar_backend
+    from inferencia import BACKENDS_SIN_TENSORFLOW, calentar_backend
+
+    modelo, scaler, encoders = (rutas.modelo, rutas.scaler, rutas.encoders) if rutas else \
+        (MODEL_FILE, SCALER_FILE, ENCODERS_FILE)
+    with arranque.fase('artefactos'):
+        artefactos = cargar_artefactos(modelo, scaler, encoders, TAMANO_CACHE_VOCAB)
+
+    diferir_verificacion = BACKEND_INFERENCIA in BACKENDS_SIN_TENSORFLOW
+    if not diferir_verificacion:
+        with arranque.fase('modelo'):
+            artefactos.modelo
+
+    with arranque.fase('backend'):
+        backend = preparar_backend(BACKEND_INFERENCIA, artefactos, TIMESTEPS, TAMANO_LOTE, TOLERANCIA_BACKEND,
+                                   verificar=not diferir_verificacion)
+
+    # Traza grafos y reserva buffers antes de la primera línea real
+    with arranque.fase('calentamiento'):
+        calentar_backend(backend, TIMESTEPS, len(artefactos.feature_names), TAMANO_LOTE)
 
-def tail_file(filepath):
-    """Lee el archivo en modo 'tail -f'"""
-    retry_count = 0
-    max_retries = 30
-    
-    while not os.path.exists(filepath):
-        logger.warning(f"[*] Esperando archivo {filepath}... ({retry_count}/{max_retries})")
-        time.sleep(2)
-        retry_count += 1
-        if retry_count >= max_retries:
-            logger.error(f"[!] TIMEOUT: El archivo {filepath} no apareció después de {max_retries * 2} segundos")
+    return artefactos, backend, diferir_verificacion and backend.nombre != 'keras'
+
+
+def conectar_influx(arranque):
+    from escritor_influx import conectar_escritor_influx
+
+    with arranque.fase('influx'):
+        return conectar_escritor_influx(
+            INFLUXDB_URL, INFLUXDB_TOKEN, INFLUXDB_ORG, INFLUXDB_BUCKET,
+            tamano_lote=INFLUX_TAMANO_LOTE,
+            intervalo_ms=INFLUX_INTERVALO_MS,
+            max_cola=INFLUX_MAX_COLA,
+            reintentos=INFLUX_REINTENTOS,
+            politica_cola_llena=INFLUX_POLITICA_COLA_LLENA,
+            ruta_derrame=INFLUX_RUTA_DERRAME
+        )
+
+
+def verificar_en_segundo_plano(arranque, capturador, backend, recargador=None):
+    """Compara el backend con Keras sin retrasar el arranque; si no coincide, el conjunto inicial pasa a
+    Keras predict por el mismo camino que una recarga (con `recargador`, también si ya es el anterior)"""
+    from inferencia import BackendKeras, verificar_backend
+    conjunto = capturador.conjunto
+
+    def verificar():
+        try:
+            with arranque.fase('verificacion_backend'):
+                diferencia = verificar_backend(backend, capturador.artefactos.modelo, TIMESTEPS,
+                                               len(capturador.artefactos.feature_names), TOLERANCIA_BACKEND)
+            logger.info(f"[✓] Backend '{backend.nombre}' coincide con Keras (diferencia máxima {diferencia:.2e})")
+        except Exception as e:
+            logger.error(f"[!] Backend '{backend.nombre}' no superó la verificación: {e}")
+            logger.warning("    Usando Keras predict como backend...")
+            keras = conjunto._replace(backend=BackendKeras(conjunto.artefactos.modelo))
+            if recargador is None:
+                capturador.aplicar_conjunto(keras)
+            elif not recargador.sustituir(conjunto, keras):
+                logger.info(f"    La versión '{conjunto.version}' ya no está en uso")
+
+    threading.Thread(target=verificar, name='verificacion-backend', daemon=True).start()
+
+
+def arrancar(arranque, instrumentacion=None, rutas=None, recargador=None):
+    """Carga del modelo y conexión con InfluxDB en paralelo; devuelve el Capturador listo para procesar
+    (y, con `recargador`, ya a cargo de sus cambios de versión)"""
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix='arranque') as pool:
+        futuro_modelo = pool.submit(cargar_modelo, arranque, rutas)
+        futuro_influx = pool.submit(conectar_influx, arranque)
+        try:
+            artefactos, backend, verificacion_pendiente = futuro_modelo.result()
+        except Exception as e:
+            logger.error(f"[!] Error crítico cargando archivos: {e}")
+            logger.error(f"    Tipo de error: {type(e).__name__}")
+            import traceback
+            logger.error(traceback.format_exc())
             sys.exit(1)
+        escritor_influx = futuro_influx.result()
+
+    version = rutas.version if rutas else os.path.splitext(os.path.basename(MODEL_FILE))[0]
+    capturador = Capturador(artefactos, backend, escritor_influx, instrumentacion, version)
+    if recargador:
+        # Antes de la verificación: si falla, cambia el backend también en el conjunto del recargador
+        recargador.iniciar(capturador.conjunto, capturador.preparar_conjunto, capturador.aplicar_conjunto)
+    if verificacion_pendiente:
+        verificar_en_segundo_plano(arranque, capturador, backend, recargador)
+    return capturador
 
-    logger.info(f"[✓] Archivo encontrado: {filepath}")
-    
-    file = open(filepath, 'r')
-    file.seek(0, 2)  # Ir al final
-    logger.info(f"[✓] Escuchando logs de Apache en: {filepath}")
-    
-    while True:
-        line = file.readline()
-        if not line:
-            time.sleep(0.1)
-            continue
-        yield line
 
 if __name__ == '__main__':
+    arranque = Arranque(_INICIO)
+    capturador = None
+    seguidor = None
+    recargador = None
     try:
-        logger.info("[*] Iniciando servidor HTTP Prometheus en puerto 8000...")
-        start_http_server(8000)
-        logger.info("[✓] Servidor Prometheus iniciado en http://0.0.0.0:8000")
-        
-        logger.info("[*] Iniciando monitoreo de logs...")
-        
-        # Iniciar bucle principal
-        for line in tail_file(LOG_FILE_PATH):
-            procesar_log(line)
-            
+        mostrar_configuracion(logger)
+
+        # Métricas y disponibilidad (capturador_listo) desde el primer momento
+        rutas = None
+        with arranque.fase('servidor_metricas'):
+            logger.info(f"[*] Iniciando servidor HTTP Prometheus en puerto {PROMETHEUS_PORT}...")
+            if MODELOS_DIR:
+                # Versión más reciente del directorio; GET /modelo en el mismo puerto y modelo_version en cada métrica
+                from recarga import Recargador, ColectorVersionado, servir_metricas, servir_control, ultima_version
+                rutas = ultima_version(MODELOS_DIR)
+                if rutas is None:
+                    logger.warning(f"[!] Ninguna versión completa en {MODELOS_DIR}; usando {MODEL_FILE}")
+                recargador = Recargador(MODELOS_DIR, MODELOS_REVISION, rutas.version if rutas else '')
+                registro_metricas = CollectorRegistry(auto_describe=False)
+                registro_metricas.register(ColectorVersionado(REGISTRY, lambda: recargador.version))
+                servir_metricas(PROMETHEUS_PORT, registro_metricas, recargador)
+                if MODELOS_CONTROL_PUERTO:
+                    # Revertir va aparte: el puerto de métricas (0.0.0.0) es de solo lectura
+                    servir_control(MODELOS_CONTROL_HOST, MODELOS_CONTROL_PUERTO, recargador, MODELOS_CONTROL_TOKEN)
+            else:
+                start_http_server(PROMETHEUS_PORT)
+            logger.info(f"[✓] Servidor Prometheus iniciado en http://0.0.0.0:{PROMETHEUS_PORT}")
+
+        instrumentacion = None
+        if INSTRUMENTACION:
+            from instrumentacion import Instrumentacion, Perfilador
+            instrumentacion = Instrumentacion(INSTRUMENTACION_MUESTREO)
+            Perfilador(PERFIL_DIRECTORIO).instalar()
+
+        capturador = arrancar(arranque, instrumentacion, rutas, recargador)
+        REGISTRY.register(capturador.estadisticas)
+        if recargador:
+            from recarga import ColectorDelegado
+            REGISTRY.register(ColectorDelegado(lambda: capturador.umbral))
+            recargador.instalar()
+        else:
+            REGISTRY.register(capturador.umbral)
+        if capturador.atribucion:
+            REGISTRY.register(capturador.atribucion)
+        if capturador.agregador:
+            REGISTRY.register(capturador.agregador)
+
+        if FUENTES:
+            import asyncio
+            from ingesta import IngestaMultiple, parsear_fuentes
+            logger.info("[*] Iniciando monitoreo de varios logs...")
+            ingesta = IngestaMultiple(capturador, parsear_fuentes(FUENTES), SEGUIDOR_CHECKPOINT or None,
+                                      revision=FUENTES_REVISION,
+                                      al_leer=instrumentacion.leer if instrumentacion else None)
+            REGISTRY.register(ingesta)
+            if instrumentacion:
+                instrumentacion.vigilar(None, capturador.registrar_resultado, lambda: capturador.artefactos.tablas)
+            arranque.listo()
+            # Cada fuente guarda su checkpoint al cancelarse su tarea (Ctrl+C)
+            asyncio.run(ingesta.ejecutar())
+        else:
+            from seguidor_logs import SeguidorLog
+            logger.info("[*] Iniciando monitoreo de logs...")
+
+            # Iniciar bucle principal (reanuda desde el checkpoint si existe)
+            seguidor = SeguidorLog(LOG_FILE_PATH, ruta_checkpoint=SEGUIDOR_CHECKPOINT or None,
+                                   al_leer=instrumentacion.leer if instrumentacion else None)
+            if instrumentacion:
+                instrumentacion.vigilar(seguidor, capturador.registrar_resultado,
+                                        lambda: capturador.artefactos.tablas)
+            arranque.listo()
+            for line in seguidor.lineas():
+                capturador.procesar_log(line)
+
     except KeyboardInterrupt:
         logger.info("\n[*] Deteniendo capturador...")
+        if recargador:
+            recargador.detener()
+        if capturador:
+            capturador.detener()
+        if seguidor:
+            seguidor.cerrar()
         sys.exit(0)
     except Exception as e:
         logger.error(f"[!] Error fatal: {e}")
         import traceback
         logger.error(traceback.format_exc())
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -0,0 +1,105 @@
+import numpy as np
+
+# --- COLUMNAS DEL MODELO ---
+COLUMNAS_CATEGORICAS = ['ip', 'method', 'url', 'http_version', 'referer',
+                        'user_agent', 'tls_version', 'cipher_suite', 'log_source']
+COLUMNAS_NUMERICAS = ['status_code', 'response_size']
+
+
+class PipelineCaracteristicas:
+    """Codificación + MinMaxScaler fusionados sobre un vector float32 preasignado.
+
+    Reproduce `scaler.transform(pd.DataFrame([features])[feature_names])` sin
+    construir DataFrames: el escalado se hace en float64 con las mismas dos
+    operaciones que sklearn (`X *= scale_; X += min_`) y solo al final se
+    escribe en el buffer de salida. El resultado es igual al de sklearn tras
+    la conversión a float32 (el scaler devuelve float64).
+    """
+
+    def __init__(self, scaler, tablas, feature_names, dtype=np.float32):
+        self.feature_names = list(feature_names)
+        self.dtype = dtype
+
+        # scale_/min_ reordenados según feature_names
+        if hasattr(scaler, 'feature_names_in_'):
+            orden = [list(scaler.feature_names_in_).index(col) for col in self.feature_names]
+        else:
+            orden = list(range(len(self.feature_names)))
+        self._escala = np.asarray(scaler.scale_, dtype=np.float64)[orden]
+        self._minimo = np.asarray(scaler.min_, dtype=np.float64)[orden]
+        self._recorte = tuple(scaler.feature_range) if getattr(scaler, 'clip', False) else None
+
+        # (columna, tabla de vocabulario o None si es numérica/sin encoder)
+        self._columnas = []
+        for col in self.feature_names:
+            if col in COLUMNAS_CATEGORICAS:
+                self._columnas.append((col, tablas.get(col), True))
+            else:
+                self._columnas.append((col, None, False))
+
+        self._fila = np.empty(len(self.feature_names), dtype=np.float64)
+        self._salida = np.empty(len(self.feature_names), dtype=dtype)
+
+    @property
+    def n_features(self):
+        return len(self.feature_names)
+
+    def _escalar(self, x):
+        x *= self._escala
+        x += self._minimo
+        if self._recorte is not None:
+            np.clip(x, self._recorte[0], self._recorte[1], out=x)
+        return x
+
+    def codificar(self, parsed_data):
+        """Primera mitad de `transformar`: fila float64 sin escalar (buffer interno reutilizado)"""
+        fila = self._fila
+        for j, (col, tabla, categorica) in enumerate(self._columnas):
+            if categorica:
+                fila[j] = tabla(str(parsed_data.get(col, '-'))) if tabla is not None else 0
+            else:
+                fila[j] = float(parsed_data.get(col, 0))
+        return fila
+
+    def escalar(self, fila, salida=None):
+        """Segunda mitad de `transformar`: escala `fila` en el sitio y la escribe en `salida`"""
+        self._escalar(fila)
+        if salida is None:
+            salida = self._salida
+        salida[...] = fila
+        return salida
+
+    def transformar(self, parsed_data, salida=None):
+        """Codifica y escala una línea parseada.
+
+        Escribe en `salida` (o en un buffer interno reutilizado, que el llamador
+        debe copiar si quiere conservarlo) y lo devuelve.
+        """
+        return self.escalar(self.codificar(parsed_data), salida)
+
+    def transformar_columnas(self, columnas, n, salida=None):
+        """Versión vectorizada: `columnas` mapea cada columna a una secuencia de `n` valores"""
+        matriz = np.empty((n, self.n_features), dtype=np.float64)
+        for j, (col, tabla, categorica) in enumerate(self._columnas):
+            valores = columnas.get(col)
+            if categorica:
+                if tabla is None or valores is None:
+                    matriz[:, j] = 0
+                else:
+                    matriz[:, j] = np.fromiter((tabla(str(v)) for v in valores), dtype=np.float64, count=n)
+            else:
+                matriz[:, j] = 0 if valores is None else np.asarray(valores, dtype=np.float64)
+        self._escalar(matriz)
+
+        if salida is None:
+            return matriz.astype(self.dtype)
+        salida[...] = matriz
+        return salida
+
+    def transformar_lote(self, registros, salida=None):
+        """Codifica y escala una lista de líneas parseadas en una matriz (n, n_features)"""
+        columnas = {
+            col: [r.get(col, '-' if categorica else 0) for r in registros]
+            for col, _, categorica in self._columnas
+        }
+        return self.transformar_columnas(columnas, len(registros), salida)
@@ -0,0 +1,206 @@
+"""Cascada de puntuación: un filtro estadístico barato delante del autoencoder.
+
+Cada línea pasa por una primera etapa de coste constante que la marca como
+sospechosa si:
+
+- algún valor de `columnas` no está en el vocabulario de entrenamiento (solo
+  para las tablas pequeñas, las de dict) o es raro en el tráfico reciente:
+  su frecuencia en la última `periodo_rareza` es menor que `rareza` (recuento
+  exacto por código en las tablas de dict, count-min sketch en el resto);
+- la IP supera `max_peticiones` peticiones o `max_errores` respuestas 4xx/5xx
+  en los últimos `periodo` segundos (count-min sketch por IP);
+- una característica numérica escalada cae fuera del rango de entrenamiento.
+
+Una ventana va al modelo si contiene alguna línea sospechosa (las
+TIMESTEPS siguientes a una sospechosa, contadas en `ventana.sospecha`) o, para
+calibrar, con probabilidad `muestreo`. El resto se descarta sin llamar al
+modelo. Durante el calentamiento (`calentamiento` líneas) todo va al modelo.
+
+Métricas:
+- `cascada_ventanas_total{decision}`: sospechosa, muestra, calentamiento o
+  filtrada. (sospechosa + muestra + calentamiento) / total es la fracción que
+  llega al modelo.
+- `cascada_acuerdo_total{decision, modelo}`: lo que dijo el modelo (anomalia o
+  normal) de las ventanas que sí puntuó. Las anomalías entre las de muestra
+  estiman las que se pierden entre las filtradas.
+"""
+import time
+import random
+import numpy as np
+from prometheus_client import Counter
+from codificacion import TablaVocabulario
+
+DECISIONES = ('sospechosa', 'muestra', 'calentamiento', 'filtrada')
+
+VENTANAS = Counter('cascada_ventanas', 'Ventanas completas según la primera etapa de la cascada', ['decision'])
+ACUERDO = Counter('cascada_acuerdo', 'Veredicto del modelo sobre las ventanas que dejó pasar la cascada',
+                  ['decision', 'modelo'])
+
+
+class ContadorDeslizante:
+    """Recuentos de los últimos `periodo` segundos con memoria constante.
+
+    Guarda dos juegos de contadores, el del periodo actual y el del anterior;
+    del anterior se cuenta la parte que aún cae dentro de la ventana. Con
+    `n` los contadores son exactos, uno por clave entera en [0, n); sin él es
+    un count-min sketch de `profundidad` filas de `ancho` contadores (nunca
+    estima por debajo del real) que saca todas las filas de un único hash.
+    """
+
+    def __init__(self, periodo, n=None, ancho=4096, profundidad=4, reloj=time.monotonic):
+        self.periodo = float(periodo)
+        self.reloj = reloj
+        if n is None:
+            # Cada fila usa 16 bits del hash: ancho potencia de 2 y como mucho 2^16
+            self._bits = min(max(int(ancho) - 1, 1).bit_length(), 16)
+            self._filas = tuple((16 * r, r << self._bits) for r in range(max(1, min(int(profundidad), 4))))
+            n = len(self._filas) << self._bits
+        else:
+            self._filas = None
+        self._actual = [0] * n
+        self._anterior = [0] * n
+        self._total_actual = self._total_anterior = 0
+        self._inicio = reloj()
+        self._peso_anterior = 1.0
+
+    def _avanzar(self, ahora):
+        transcurrido = ahora - self._inicio
+        if transcurrido >= self.periodo:
+            self._anterior, self._actual = self._actual, self._anterior
+            self._total_anterior, self._total_actual = self._total_actual, 0
+            if transcurrido >= 2 * self.periodo:
+                self._anterior[:] = [0] * len(self._anterior)
+                self._total_anterior = 0
+            self._actual[:] = [0] * len(self._actual)
+            self._inicio = ahora
+            transcurrido = 0.0
+        self._peso_anterior = 1.0 - transcurrido / self.periodo
+
+    def sumar(self, clave, ahora):
+        """Cuenta una aparición de `clave` y devuelve su recuento estimado en la ventana"""
+        self._avanzar(ahora)
+        self._total_actual += 1
+        actual, anterior = self._actual, self._anterior
+        if self._filas is None:
+            actual[clave] += 1
+            return actual[clave] + self._peso_anterior * anterior[clave]
+
+        h = hash(clave)
+        mascara = (1 << self._bits) - 1
+        estimado = None
+        for desplazamiento, base in self._filas:
+            i = ((h >> desplazamiento) & mascara) | base
+            actual[i] += 1
+            valor = actual[i] + self._peso_anterior * anterior[i]
+            if estimado is None or valor < estimado:
+                estimado = valor
+        return estimado
+
+    @property
+    def total(self):
+        return self._total_actual + self._peso_anterior * self._total_anterior
+
+
+class Cascada:
+    """Primera etapa de la cascada para el capturador.
+
+    `decidir` se llama con cada línea ya escrita en su ventana; devuelve la
+    decisión si la ventana está llena y debe ir al modelo, o None.
+    """
+
+    def __init__(self, pipeline, tablas, timesteps, columnas=('method', 'url', 'http_version', 'user_agent',
+                                                               'tls_version', 'cipher_suite'),
+                 rareza=1e-3, max_peticiones=600, max_errores=60, periodo=60.0, periodo_rareza=3600.0,
+                 muestreo=0.01, calentamiento=10000, ancho=4096, profundidad=4, reloj=time.monotonic,
+                 aleatorio=random.random):
+        self.timesteps = timesteps
+        self.rareza = rareza
+        self.max_peticiones = max_peticiones
+        self.max_errores = max_errores
+        self.muestreo = muestreo
+        self.calentamiento = int(calentamiento)
+        self.reloj = reloj
+        self.aleatorio = aleatorio
+        self.lineas = 0
+
+        # Columnas con vocabulario de dict: recuento exacto por código y valor nuevo = sospechoso.
+        # Las de alta cardinalidad (tablas LRU o sin tabla) van a un count-min sketch común.
+        self._por_codigo = []
+        self._por_valor = []
+        for col in columnas:
+            tabla = tablas.get(col)
+            if isinstance(tabla, TablaVocabulario):
+                self._por_codigo.append((col, tabla, ContadorDeslizante(periodo_rareza, n=len(tabla), reloj=reloj)))
+            else:
+                self._por_valor.append(col)
+        self._frecuencias = ContadorDeslizante(periodo_rareza, ancho=ancho, profundidad=profundidad, reloj=reloj)
+        self._peticiones = ContadorDeslizante(periodo, ancho=ancho, profundidad=profundidad, reloj=reloj)
+        self._errores = ContadorDeslizante(periodo, ancho=ancho, profundidad=profundidad, reloj=reloj)
+        self._numericas = [j for j, col in enumerate(pipeline.feature_names)
+                           if col in ('status_code', 'response_size')]
+
+        self._ventanas = {decision: VENTANAS.labels(decision=decision) for decision in DECISIONES}
+        self._acuerdo = {(decision, modelo): ACUERDO.labels(decision=decision, modelo=modelo)
+                         for decision in DECISIONES[:-1] for modelo in ('anomalia', 'normal')}
+
+    def sospechosa(self, parsed_data, fila):
+        """Primera etapa para una línea: actualiza los recuentos y dice si es sospechosa"""
+        ahora = self.reloj()
+        sospechosa = False
+
+        for col, tabla, recuento in self._por_codigo:
+            codigo = tabla.codigo(str(parsed_data.get(col, '-')))
+            if codigo is None or recuento.sumar(codigo, ahora) < self.rareza * recuento.total:
+                sospechosa = True
+
+        if self._por_valor:
+            frecuencias = self._frecuencias
+            minimo = self.rareza * frecuencias.total / len(self._por_valor)
+            for col in self._por_valor:
+                if frecuencias.sumar((col, str(parsed_data.get(col, '-'))), ahora) < minimo:
+                    sospechosa = True
+
+        ip = parsed_data.get('ip')
+        if self._peticiones.sumar(ip, ahora) > self.max_peticiones:
+            sospechosa = True
+        if parsed_data.get('status_code', 0) >= 400 and self._errores.sumar(ip, ahora) > self.max_errores:
+            sospechosa = True
+
+        for j in self._numericas:
+            if not 0.0 <= fila[j] <= 1.0:
+                sospechosa = True
+        return sospechosa
+
+    def decidir(self, parsed_data, fila, ventana):
+        self.lineas += 1
+        if self.sospechosa(parsed_data, fila):
+            ventana.sospecha = self.timesteps
+        if not ventana.lleno:
+            if ventana.sospecha:
+                ventana.sospecha -= 1
+            return None
+
+        if self.lineas <= self.calentamiento:
+            decision = 'calentamiento'
+        elif ventana.sospecha:
+            decision = 'sospechosa'
+        elif self.aleatorio() < self.muestreo:
+            decision = 'muestra'
+        else:
+            decision = 'filtrada'
+        if ventana.sospecha:
+            ventana.sospecha -= 1
+        self._ventanas[decision].inc()
+        return None if decision == 'filtrada' else decision
+
+    def comparar(self, contextos, anomalias):
+        """Acuerdo entre la primera etapa y el modelo para un lote puntuado"""
+        for parsed_data, es_anomalia in zip(contextos, anomalias):
+            self._acuerdo[(parsed_data['cascada'], 'anomalia' if es_anomalia else 'normal')].inc()
+
+    @staticmethod
+    def sin_sesgo(contextos):
+        """Máscara de las ventanas que no eligió la primera etapa (muestra y calentamiento):
+        las únicas que representan al tráfico filtrado, p. ej. para el umbral adaptativo"""
+        return np.fromiter((parsed_data['cascada'] in ('muestra', 'calentamiento') for parsed_data in contextos),
+                           dtype=bool, count=len(contextos))
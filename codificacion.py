@@ -0,0 +1,221 @@
+import zlib
+from collections import Counter, OrderedDict
+import numpy as np
+
+# Columnas cuyo vocabulario crece sin límite en producción
+COLUMNAS_ALTA_CARDINALIDAD = ('ip', 'url', 'referer', 'user_agent')
+
+
+def safe_transform(encoder, value):
+    """Maneja valores nuevos asignándolos a clase 'desconocida' (0)"""
+    try:
+        return encoder.transform([str(value)])[0]
+    except ValueError:
+        return 0
+
+
+# Marca de valor desconocido dentro de la caché LRU (se devuelve como 0)
+_DESCONOCIDO = -1
+
+
+class TablaVocabulario:
+    """Vocabulario de un LabelEncoder compilado a un dict valor -> código.
+
+    `desconocidos` cuenta los valores fuera del vocabulario vistos hasta ahora.
+    """
+
+    def __init__(self, encoder):
+        self._codigos = {str(clase): codigo for codigo, clase in enumerate(encoder.classes_)}
+        self.desconocidos = 0
+
+    def __len__(self):
+        return len(self._codigos)
+
+    def codigo(self, valor):
+        """Código de `valor` o None si no está en el vocabulario, sin contarlo como desconocido"""
+        return self._codigos.get(valor)
+
+    def __call__(self, valor):
+        codigo = self._codigos.get(valor)
+        if codigo is None:
+            self.desconocidos += 1
+            return 0
+        return codigo
+
+
+class TablaVocabularioLRU:
+    """Vocabulario grande: búsqueda binaria sobre `classes_` con una caché LRU acotada.
+
+    Evita construir un dict con todo el vocabulario; solo los valores recientes
+    quedan en memoria como objetos Python.
+    """
+
+    def __init__(self, encoder, tamano_cache=4096):
+        self._clases = np.asarray([str(clase) for clase in encoder.classes_])
+        self._tamano_cache = max(1, int(tamano_cache))
+        self._cache = OrderedDict()
+        self.desconocidos = 0
+
+    def __len__(self):
+        return len(self._clases)
+
+    def __call__(self, valor):
+        cache = self._cache
+        codigo = cache.get(valor)
+        if codigo is None:
+            i = int(np.searchsorted(self._clases, valor))
+            codigo = i if i < len(self._clases) and self._clases[i] == valor else _DESCONOCIDO
+            cache[valor] = codigo
+            if len(cache) > self._tamano_cache:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(valor)
+
+        if codigo == _DESCONOCIDO:
+            self.desconocidos += 1
+            return 0
+        return codigo
+
+    def limpiar_cache(self):
+        self._cache.clear()
+
+
+def _cubeta(valor, cubetas):
+    # crc32 y no hash(): el de str cambia en cada proceso (PYTHONHASHSEED)
+    return zlib.crc32(valor.encode('utf-8', 'surrogatepass')) % cubetas
+
+
+class CodificadorHash:
+    """Alternativa de tamaño fijo al LabelEncoder para columnas de alta cardinalidad.
+
+    Los `top_k` valores más frecuentes del entrenamiento tienen código propio
+    (0..top_k-1, de más a menos frecuente); el resto se reparte en `cubetas`
+    códigos más por crc32. No hay valor desconocido: uno nuevo cae en su
+    cubeta, y el artefacto solo guarda los `top_k` valores.
+
+    Interfaz mínima de LabelEncoder (`fit`, `transform`, `fit_transform`) más
+    `contar` + `ajustar` para ajustarlo por trozos. El recuento es exacto (como
+    el vocabulario del LabelEncoder, ocupa un entero por valor distinto hasta
+    `ajustar`), así que el top no depende del tamaño de los trozos y es el
+    mismo que el de `fit` con la columna entera.
+    """
+
+    def __init__(self, top_k=1024, cubetas=4096):
+        self.top_k = int(top_k)
+        self.cubetas = max(1, int(cubetas))
+        self.frecuentes = []
+        self._conteos = Counter()
+        self._codigos = {}
+
+    @property
+    def n_codigos(self):
+        return self.top_k + self.cubetas
+
+    def contar(self, valores):
+        self._conteos.update(str(valor) for valor in valores)
+        return self
+
+    def ajustar(self):
+        """Fija los `top_k` frecuentes a partir de lo contado (empates por orden alfabético)"""
+        orden = sorted(self._conteos.items(), key=lambda par: (-par[1], par[0]))
+        self.frecuentes = [valor for valor, _ in orden[:self.top_k]]
+        self._conteos = Counter()
+        self._codigos = {valor: codigo for codigo, valor in enumerate(self.frecuentes)}
+        return self
+
+    def fit(self, valores):
+        return self.contar(valores).ajustar()
+
+    def codigo(self, valor):
+        codigo = self._codigos.get(valor)
+        return self.top_k + _cubeta(valor, self.cubetas) if codigo is None else codigo
+
+    def transform(self, valores):
+        codigo = self.codigo
+        return np.fromiter((codigo(str(valor)) for valor in valores), dtype=np.int64, count=len(valores))
+
+    def fit_transform(self, valores):
+        return self.fit(valores).transform(valores)
+
+    def __getstate__(self):
+        # Solo lo necesario: el dict se reconstruye al cargar
+        return {'top_k': self.top_k, 'cubetas': self.cubetas, 'frecuentes': self.frecuentes}
+
+    def __setstate__(self, estado):
+        # Los artefactos antiguos guardaban también el límite de poda del recuento
+        estado = {clave: valor for clave, valor in estado.items() if clave != 'poda'}
+        self.__dict__.update(estado)
+        self._conteos = Counter()
+        self._codigos = {valor: codigo for codigo, valor in enumerate(self.frecuentes)}
+
+
+def numero_codigos(encoder):
+    """Códigos posibles de un encoder: el rango que ve el MinMaxScaler es [0, numero_codigos - 1]"""
+    if isinstance(encoder, CodificadorHash):
+        return encoder.n_codigos
+    return len(encoder.classes_)
+
+
+class TablaHash:
+    """Tabla de un CodificadorHash: dict de los frecuentes y crc32 para el resto.
+
+    `desconocidos` cuenta los valores que caen en las cubetas (fuera del top).
+    """
+
+    def __init__(self, codificador):
+        self._codigos = dict(codificador._codigos)
+        self._top_k = codificador.top_k
+        self._cubetas = codificador.cubetas
+        self.desconocidos = 0
+
+    def __len__(self):
+        return self._top_k + self._cubetas
+
+    def __call__(self, valor):
+        codigo = self._codigos.get(valor)
+        if codigo is None:
+            self.desconocidos += 1
+            return self._top_k + _cubeta(valor, self._cubetas)
+        return codigo
+
+
+def compilar_tablas(encoders, columnas_lru=COLUMNAS_ALTA_CARDINALIDAD, tamano_cache=4096):
+    """Convierte el dict de encoders en tablas de búsqueda O(1) por columna"""
+    tablas = {}
+    for col, encoder in encoders.items():
+        if isinstance(encoder, CodificadorHash):
+            tablas[col] = TablaHash(encoder)
+        elif col in columnas_lru:
+            tablas[col] = TablaVocabularioLRU(encoder, tamano_cache)
+        else:
+            tablas[col] = TablaVocabulario(encoder)
+    return tablas
+
+
+def verificar_tablas(encoders, tablas, desconocido='\x00__valor_desconocido__'):
+    """Comprueba que cada tabla da el mismo código que `encoder.transform` para
+    todo su vocabulario de entrenamiento y 0 para un valor nuevo (con un
+    CodificadorHash, su cubeta).
+
+    Lanza ValueError con la primera discrepancia encontrada.
+    """
+    for col, encoder in encoders.items():
+        tabla = tablas[col]
+        if isinstance(encoder, CodificadorHash):
+            for valor in encoder.frecuentes + [desconocido]:
+                if tabla(valor) != encoder.codigo(valor):
+                    raise ValueError(f"Columna '{col}': '{valor}' -> {tabla(valor)}, el codificador da "
+                                     f"{encoder.codigo(valor)}")
+            tabla.desconocidos = 0
+            continue
+        clases = [str(clase) for clase in encoder.classes_]
+        esperados = encoder.transform(encoder.classes_)
+        for clase, esperado in zip(clases, esperados):
+            obtenido = tabla(clase)
+            if obtenido != esperado:
+                raise ValueError(f"Columna '{col}': '{clase}' -> {obtenido}, LabelEncoder da {esperado}")
+        if tabla(desconocido) != 0:
+            raise ValueError(f"Columna '{col}': un valor desconocido no devuelve 0")
+        if isinstance(tabla, TablaVocabularioLRU):
+            tabla.limpiar_cache()
+        tabla.desconocidos = 0
@@ -0,0 +1,131 @@
+import os
+import sys
+import logging
+
+def _lista_floats(nombre, defecto):
+    return tuple(float(valor) for valor in os.getenv(nombre, defecto).split(',') if valor.strip())
+
+
+# --- CONFIGURACIÓN ---
+LOG_FILE_PATH = os.getenv('LOG_FILE_PATH', '/var/log/apache2/access.log')
+# LogFormat de Apache; admite %{SSL_PROTOCOL}x y %{SSL_CIPHER}x para tls_version/cipher_suite
+LOG_FORMAT = os.getenv('LOG_FORMAT', '%h %l %u %t "%r" %>s %b "%{Referer}i" "%{User-Agent}i"')
+SEGUIDOR_CHECKPOINT = os.getenv('SEGUIDOR_CHECKPOINT', 'seguidor_checkpoint.json')
+# log_source de LOG_FILE_PATH; con FUENTES cada fuente usa su nombre
+LOG_SOURCE = os.getenv('LOG_SOURCE', 'apache_access_log')
+# Varios logs a la vez (ver ingesta.py): '[nombre=]ruta_o_glob,...'; vacío = solo LOG_FILE_PATH
+FUENTES = os.getenv('FUENTES', '')
+FUENTES_REVISION = float(os.getenv('FUENTES_REVISION', '10'))
+MODEL_FILE = 'modelo_logs_1.h5'
+SCALER_FILE = 'scaler_logs_1.joblib'
+ENCODERS_FILE = 'encoders_logs_1.joblib'
+# Directorio versionado para recargar modelo/scaler/encoders en caliente (ver recarga.py); vacío = los tres de arriba
+MODELOS_DIR = os.getenv('MODELOS_DIR', '')
+MODELOS_REVISION = float(os.getenv('MODELOS_REVISION', '30'))
+# Puerto de control (POST /modelo/revertir), aparte del de métricas; 0 = desactivado (solo SIGUSR2)
+MODELOS_CONTROL_PUERTO = int(os.getenv('MODELOS_CONTROL_PUERTO', '0'))
+MODELOS_CONTROL_HOST = os.getenv('MODELOS_CONTROL_HOST', '127.0.0.1')
+MODELOS_CONTROL_TOKEN = os.getenv('MODELOS_CONTROL_TOKEN', '')
+INFLUXDB_URL = os.getenv('INFLUXDB_URL', 'http://localhost:8086')
+INFLUXDB_TOKEN = os.getenv('INFLUXDB_TOKEN', 'my-super-secret-token')
+INFLUXDB_ORG = os.getenv('INFLUXDB_ORG', 'my-org')
+INFLUXDB_BUCKET = os.getenv('INFLUXDB_BUCKET', 'network_traffic')
+INFLUX_TAMANO_LOTE = int(os.getenv('INFLUX_TAMANO_LOTE', '5000'))
+INFLUX_INTERVALO_MS = float(os.getenv('INFLUX_INTERVALO_MS', '1000'))
+INFLUX_MAX_COLA = int(os.getenv('INFLUX_MAX_COLA', '100000'))
+INFLUX_REINTENTOS = int(os.getenv('INFLUX_REINTENTOS', '5'))
+INFLUX_POLITICA_COLA_LLENA = os.getenv('INFLUX_POLITICA_COLA_LLENA', 'descartar')
+INFLUX_RUTA_DERRAME = os.getenv('INFLUX_RUTA_DERRAME', 'influx_derrame.lp')
+# Resúmenes por intervalo en lugar de un punto por línea; solo las anomalías van completas (ver agregacion.py)
+INFLUX_AGREGACION = os.getenv('INFLUX_AGREGACION', '0') == '1'
+INFLUX_AGREGACION_INTERVALO = float(os.getenv('INFLUX_AGREGACION_INTERVALO', '10'))
+INFLUX_AGREGACION_TOP_K = int(os.getenv('INFLUX_AGREGACION_TOP_K', '20'))
+TIMESTEPS = 10 
+UMBRAL = float(os.getenv('UMBRAL', '0.15'))
+# Umbral: 'fijo' (UMBRAL, por defecto); adaptativo opt-in: 'sigma' (media + UMBRAL_SIGMAS·desviación) o 'percentil'
+UMBRAL_MODO = os.getenv('UMBRAL_MODO', 'fijo')
+UMBRAL_SIGMAS = float(os.getenv('UMBRAL_SIGMAS', '3'))
+UMBRAL_PERCENTIL = float(os.getenv('UMBRAL_PERCENTIL', '0.99'))
+UMBRAL_ALFA = float(os.getenv('UMBRAL_ALFA', '0.001'))
+UMBRAL_CALENTAMIENTO = int(os.getenv('UMBRAL_CALENTAMIENTO', '1000'))
+UMBRAL_ESTADO = os.getenv('UMBRAL_ESTADO', 'umbral_estado.json')
+TAMANO_LOTE = int(os.getenv('TAMANO_LOTE', '64'))
+ESPERA_MAX_LOTE_MS = float(os.getenv('ESPERA_MAX_LOTE_MS', '50'))
+BACKEND_INFERENCIA = os.getenv('BACKEND_INFERENCIA', 'tf_function')
+TOLERANCIA_BACKEND = float(os.getenv('TOLERANCIA_BACKEND', '1e-4'))
+TAMANO_CACHE_VOCAB = int(os.getenv('TAMANO_CACHE_VOCAB', '4096'))
+CLAVE_VENTANA = os.getenv('CLAVE_VENTANA', '')
+MAX_CLAVES_VENTANA = int(os.getenv('MAX_CLAVES_VENTANA', '1024'))
+PROMETHEUS_PORT = int(os.getenv('PROMETHEUS_PORT', '8000'))
+# Distribución de scores: cubos del histograma, ventanas deslizantes (s) y sus cuantiles
+BUCKETS_SCORE = _lista_floats('BUCKETS_SCORE', '0.01,0.02,0.05,0.075,0.1,0.125,0.15,0.2,0.3,0.5,1,2')
+VENTANAS_CUANTILES = _lista_floats('VENTANAS_CUANTILES', '60,300,900')
+CUANTILES_SCORE = _lista_floats('CUANTILES_SCORE', '0.5,0.9,0.99,0.999')
+PRECISION_CUANTILES = float(os.getenv('PRECISION_CUANTILES', '0.01'))
+# Error por característica de cada lote y causas principales de las anomalías (opt-in)
+ATRIBUCION = os.getenv('ATRIBUCION', '0') == '1'
+ATRIBUCION_TOP = int(os.getenv('ATRIBUCION_TOP', '3'))
+# Cascada: primera etapa estadística; solo las ventanas sospechosas (y una muestra) van al modelo
+CASCADA = os.getenv('CASCADA', '0') == '1'
+CASCADA_COLUMNAS = tuple(c.strip() for c in os.getenv(
+    'CASCADA_COLUMNAS', 'method,url,http_version,user_agent,tls_version,cipher_suite').split(',') if c.strip())
+CASCADA_RAREZA = float(os.getenv('CASCADA_RAREZA', '0.001'))
+CASCADA_MAX_PETICIONES = int(os.getenv('CASCADA_MAX_PETICIONES', '600'))
+CASCADA_MAX_ERRORES = int(os.getenv('CASCADA_MAX_ERRORES', '60'))
+CASCADA_PERIODO = float(os.getenv('CASCADA_PERIODO', '60'))
+CASCADA_MUESTREO = float(os.getenv('CASCADA_MUESTREO', '0.01'))
+CASCADA_CALENTAMIENTO = int(os.getenv('CASCADA_CALENTAMIENTO', '10000'))
+# Histogramas por etapa (una de cada INSTRUMENTACION_MUESTREO líneas) y perfilador con SIGUSR1; opt-in
+INSTRUMENTACION = os.getenv('INSTRUMENTACION', '0') == '1'
+INSTRUMENTACION_MUESTREO = int(os.getenv('INSTRUMENTACION_MUESTREO', '100'))
+PERFIL_DIRECTORIO = os.getenv('PERFIL_DIRECTORIO', '/tmp')
+
+# Pipeline multiproceso
+NUM_WORKERS = int(os.getenv('NUM_WORKERS', str(os.cpu_count() or 1)))
+
+
+def configurar_logging():
+    """Configuración de logging común a todos los puntos de entrada"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+
+
+def mostrar_configuracion(logger):
+    logger.info("=" * 60)
+    logger.info("INICIANDO SISTEMA DE DETECCIÓN DE ANOMALÍAS EN LOGS")
+    logger.info("=" * 60)
+    logger.info(f"INFLUXDB_URL: {INFLUXDB_URL}")
+    logger.info(f"INFLUXDB_ORG: {INFLUXDB_ORG}")
+    logger.info(f"INFLUXDB_BUCKET: {INFLUXDB_BUCKET}")
+    logger.info(f"INFLUX_TAMANO_LOTE: {INFLUX_TAMANO_LOTE} / INFLUX_INTERVALO_MS: {INFLUX_INTERVALO_MS}")
+    logger.info(f"INFLUX_POLITICA_COLA_LLENA: {INFLUX_POLITICA_COLA_LLENA}")
+    logger.info(f"INFLUX_AGREGACION: {f'cada {INFLUX_AGREGACION_INTERVALO:g}s, top {INFLUX_AGREGACION_TOP_K}' if INFLUX_AGREGACION else 'desactivada (un punto por línea)'}")
+    if FUENTES:
+        logger.info(f"FUENTES: {FUENTES} (revisión cada {FUENTES_REVISION:g}s)")
+    else:
+        logger.info(f"LOG_FILE_PATH: {LOG_FILE_PATH} / LOG_SOURCE: {LOG_SOURCE}")
+    logger.info(f"LOG_FORMAT: {LOG_FORMAT}")
+    logger.info(f"SEGUIDOR_CHECKPOINT: {SEGUIDOR_CHECKPOINT or '(desactivado)'}")
+    if MODELOS_DIR:
+        logger.info(f"MODELOS_DIR: {MODELOS_DIR} (revisión cada {MODELOS_REVISION:g}s)")
+        control = (f"{MODELOS_CONTROL_HOST}:{MODELOS_CONTROL_PUERTO}{' con token' if MODELOS_CONTROL_TOKEN else ''}"
+                   if MODELOS_CONTROL_PUERTO else 'desactivado (solo SIGUSR2)')
+        logger.info(f"MODELOS_CONTROL: {control}")
+    logger.info(f"TIMESTEPS: {TIMESTEPS}")
+    logger.info(f"UMBRAL: {UMBRAL} / UMBRAL_MODO: {UMBRAL_MODO}")
+    if UMBRAL_MODO != 'fijo':
+        logger.info(f"UMBRAL_SIGMAS: {UMBRAL_SIGMAS} / UMBRAL_PERCENTIL: {UMBRAL_PERCENTIL} / "
+                    f"UMBRAL_ALFA: {UMBRAL_ALFA} / UMBRAL_CALENTAMIENTO: {UMBRAL_CALENTAMIENTO}")
+    logger.info(f"TAMANO_LOTE: {TAMANO_LOTE}")
+    logger.info(f"ESPERA_MAX_LOTE_MS: {ESPERA_MAX_LOTE_MS}")
+    logger.info(f"BACKEND_INFERENCIA: {BACKEND_INFERENCIA}")
+    logger.info(f"ATRIBUCION: {'top ' + str(ATRIBUCION_TOP) if ATRIBUCION else 'desactivada'}")
+    logger.info(f"CASCADA: {'muestreo ' + str(CASCADA_MUESTREO) if CASCADA else 'desactivada'}")
+    logger.info(f"CLAVE_VENTANA: {CLAVE_VENTANA or '(global)'}")
+    logger.info(f"INSTRUMENTACION: {'1 de cada ' + str(INSTRUMENTACION_MUESTREO) + ' líneas' if INSTRUMENTACION else 'desactivada'}")
+    logger.info("=" * 60)
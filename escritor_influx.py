@@ -0,0 +1,247 @@
+import os
+import time
+import queue
+import random
+import itertools
+import logging
+import threading
+import requests
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# --- MÉTRICAS DEL ESCRITOR ---
+INFLUX_COLA = Gauge('influx_cola_profundidad', 'Puntos pendientes en la cola del escritor de InfluxDB')
+INFLUX_LATENCIA_LOTE = Histogram(
+    'influx_lote_latencia_segundos',
+    'Duración de cada escritura de lote en InfluxDB, incluidos los reintentos',
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+INFLUX_ESCRITOS = Counter('influx_puntos_escritos_total', 'Puntos aceptados por InfluxDB')
+INFLUX_DESCARTADOS = Counter('influx_puntos_descartados_total', 'Puntos descartados sin escribir', ['motivo'])
+INFLUX_DERRAMADOS = Counter('influx_puntos_derramados_total', 'Puntos guardados en disco por cola llena o InfluxDB caído')
+
+POLITICAS_COLA_LLENA = ('descartar', 'disco')
+
+_FIN = object()
+
+
+class ErrorNoReintentable(Exception):
+    """InfluxDB rechazó el lote (4xx distinto de 429): reintentar no sirve"""
+
+
+class EscritorInflux:
+    """Escribe puntos en InfluxDB desde un hilo en segundo plano.
+
+    Los puntos se encolan como line protocol en una cola acotada y se envían
+    en lotes al cerrar `tamano_lote` puntos o pasar `intervalo_ms`. Los fallos
+    transitorios se reintentan con backoff exponencial y jitter. Si la cola se
+    llena, o un lote agota los reintentos, se aplica `politica_cola_llena`:
+    'descartar' o 'disco' (se añade a `ruta_derrame` y se reenvía cuando
+    InfluxDB vuelve a aceptar escrituras).
+    """
+
+    def __init__(self, url, token, org, bucket, tamano_lote=5000, intervalo_ms=1000, max_cola=100000,
+                 reintentos=5, backoff_base=0.5, backoff_max=30.0, politica_cola_llena='descartar',
+                 ruta_derrame='influx_derrame.lp', timeout=10.0):
+        if politica_cola_llena not in POLITICAS_COLA_LLENA:
+            raise ValueError(f"Política de cola llena desconocida: '{politica_cola_llena}'. Opciones: {POLITICAS_COLA_LLENA}")
+
+        self.url_escritura = f"{url.rstrip('/')}/api/v2/write"
+        self.parametros = {'org': org, 'bucket': bucket, 'precision': 'ns'}
+        self.tamano_lote = max(1, int(tamano_lote))
+        self.intervalo = max(0.0, float(intervalo_ms)) / 1000.0
+        self.reintentos = max(0, int(reintentos))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.politica_cola_llena = politica_cola_llena
+        self.ruta_derrame = ruta_derrame
+        self.timeout = timeout
+
+        self._sesion = requests.Session()
+        self._sesion.headers.update({
+            'Authorization': f'Token {token}',
+            'Content-Type': 'text/plain; charset=utf-8',
+        })
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._lock_derrame = threading.Lock()
+        self._detenido = threading.Event()
+        self._ultimo_envio_ok = True
+        INFLUX_COLA.set_function(self._cola.qsize)
+
+        self._hilo = threading.Thread(target=self._bucle, name='escritor-influx', daemon=True)
+        self._hilo.start()
+
+    def escribir(self, punto, bloquear=False):
+        """Encola un `Point` o una línea de line protocol.
+
+        Por defecto no bloquea al llamador y, con la cola llena, aplica la
+        política configurada; con `bloquear=True` espera a que haya sitio
+        (para cargas masivas, donde no se puede perder ningún punto).
+        """
+        linea = punto if isinstance(punto, str) else punto.to_line_protocol()
+        if not linea:
+            return
+        if bloquear:
+            self._cola.put(linea)
+            return
+        try:
+            self._cola.put_nowait(linea)
+        except queue.Full:
+            if self.politica_cola_llena == 'disco':
+                self._derramar([linea])
+            else:
+                INFLUX_DESCARTADOS.labels(motivo='cola_llena').inc()
+
+    def detener(self, timeout=None):
+        """Envía lo pendiente y termina el hilo (lo que no se pueda enviar se derrama o descarta)"""
+        self._detenido.set()
+        try:
+            self._cola.put(_FIN, timeout=timeout)
+        except queue.Full:
+            pass
+        self._hilo.join(timeout)
+
+    # --- Derrame a disco ---
+    def _derramar(self, lineas):
+        if not lineas:
+            return
+        try:
+            with self._lock_derrame:
+                with open(self.ruta_derrame, 'a', encoding='utf-8') as f:
+                    f.write('\n'.join(lineas))
+                    f.write('\n')
+            INFLUX_DERRAMADOS.inc(len(lineas))
+        except OSError as e:
+            logger.error(f"[!] No se pudo derramar a disco ({self.ruta_derrame}): {e}")
+            INFLUX_DESCARTADOS.labels(motivo='derrame_fallido').inc(len(lineas))
+
+    def _reenviar_derrame(self):
+        """Reenvía lo derramado a disco por lotes, sin cargar el fichero entero; si un lote
+        vuelve a fallar, ese lote y los que faltan se derraman de nuevo"""
+        ruta_reenvio = self.ruta_derrame + '.reenvio'
+        with self._lock_derrame:
+            # Un '.reenvio' previo (proceso interrumpido a mitad) se reenvía primero
+            if not os.path.exists(ruta_reenvio):
+                if not os.path.exists(self.ruta_derrame):
+                    return
+                os.replace(self.ruta_derrame, ruta_reenvio)
+
+        logger.info(f"[*] Reenviando los puntos derramados a disco ({ruta_reenvio})...")
+        with open(ruta_reenvio, encoding='utf-8') as f:
+            lineas = (linea.rstrip('\n') for linea in f if linea.strip())
+            lotes = iter(lambda: list(itertools.islice(lineas, self.tamano_lote)), [])
+            for lote in lotes:
+                if not self._enviar(lote, derramar_si_falla=True):
+                    # InfluxDB volvió a fallar: el lote ya está en disco y el resto del fichero va detrás
+                    for resto in lotes:
+                        self._derramar(resto)
+                    break
+        os.remove(ruta_reenvio)
+
+    # --- Envío ---
+    def _espera_reintento(self, intento, respuesta=None):
+        if respuesta is not None and 'Retry-After' in respuesta.headers:
+            try:
+                return min(float(respuesta.headers['Retry-After']), self.backoff_max)
+            except ValueError:
+                pass
+        # Backoff exponencial con jitter completo
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** intento)))
+
+    def _post(self, cuerpo):
+        respuesta = self._sesion.post(self.url_escritura, params=self.parametros, data=cuerpo, timeout=self.timeout)
+        if respuesta.status_code < 300:
+            return None
+        if respuesta.status_code == 429 or respuesta.status_code >= 500:
+            return respuesta
+        raise ErrorNoReintentable(f"HTTP {respuesta.status_code}: {respuesta.text[:200]}")
+
+    def _enviar(self, lineas, derramar_si_falla=None):
+        """Escribe un lote; devuelve False si InfluxDB no respondió tras los reintentos"""
+        cuerpo = ('\n'.join(lineas)).encode('utf-8')
+        inicio = time.monotonic()
+        try:
+            for intento in range(self.reintentos + 1):
+                try:
+                    respuesta = self._post(cuerpo)
+                    if respuesta is None:
+                        INFLUX_ESCRITOS.inc(len(lineas))
+                        self._ultimo_envio_ok = True
+                        return True
+                    motivo = f"HTTP {respuesta.status_code}"
+                except requests.RequestException as e:
+                    respuesta = None
+                    motivo = str(e)
+
+                if intento == self.reintentos or self._detenido.is_set():
+                    break
+                espera = self._espera_reintento(intento, respuesta)
+                logger.warning(f"[!] Fallo escribiendo lote en InfluxDB ({motivo}), reintento en {espera:.1f}s")
+                time.sleep(espera)
+        except ErrorNoReintentable as e:
+            logger.error(f"[!] InfluxDB rechazó un lote de {len(lineas)} puntos: {e}")
+            INFLUX_DESCARTADOS.labels(motivo='rechazado').inc(len(lineas))
+            return True
+        finally:
+            INFLUX_LATENCIA_LOTE.observe(time.monotonic() - inicio)
+
+        self._ultimo_envio_ok = False
+        if derramar_si_falla is None:
+            derramar_si_falla = self.politica_cola_llena == 'disco'
+        if derramar_si_falla:
+            self._derramar(lineas)
+        else:
+            logger.error(f"[!] Descartando lote de {len(lineas)} puntos tras {self.reintentos} reintentos")
+            INFLUX_DESCARTADOS.labels(motivo='reintentos_agotados').inc(len(lineas))
+        return False
+
+    def _recolectar(self):
+        """Devuelve (lineas, fin) cerrando el lote por tamaño o por intervalo"""
+        lineas = []
+        limite = time.monotonic() + self.intervalo
+        while len(lineas) < self.tamano_lote:
+            restante = limite - time.monotonic()
+            try:
+                item = self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if item is _FIN:
+                return lineas, True
+            lineas.append(item)
+        return lineas, False
+
+    def _bucle(self):
+        fin = False
+        while not fin:
+            lineas, fin = self._recolectar()
+            try:
+                if lineas:
+                    self._enviar(lineas)
+                # Con InfluxDB respondiendo y la cola vacía, se vacía el derrame pendiente
+                if self._ultimo_envio_ok and not fin and self._cola.empty():
+                    self._reenviar_derrame()
+            except Exception as e:
+                logger.error(f"[!] Error en el escritor de InfluxDB: {e}")
+                import traceback
+                logger.error(traceback.format_exc())
+
+
+def conectar_escritor_influx(url, token, org, bucket, **opciones):
+    """Comprueba la conexión con InfluxDB y crea el escritor; None si no hay conexión"""
+    from influxdb_client import InfluxDBClient
+
+    logger.info("[*] Conectando a InfluxDB...")
+    try:
+        influx_client = InfluxDBClient(url=url, token=token, org=org)
+
+        # Verificar conexión
+        health = influx_client.health()
+        logger.info(f"[✓] Conexión a InfluxDB exitosa - Estado: {health.status}")
+
+        # Escritura asíncrona por lotes: InfluxDB lento no frena la detección
+        return EscritorInflux(url, token, org, bucket, **opciones)
+    except Exception as e:
+        logger.error(f"[!] Error conectando a InfluxDB: {e}")
+        logger.warning("    Continuando sin InfluxDB...")
+        return None
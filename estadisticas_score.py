@@ -0,0 +1,174 @@
+"""Distribución de los scores sin gauges de último valor.
+
+Por cada línea puntuada solo se guarda el score en un buffer preasignado; al
+llenarse, o cuando Prometheus lee /metrics, el buffer se vuelca de una vez con
+NumPy en:
+
+- un histograma con cubos configurables (`log_anomalia_score_distribucion`);
+- cuantiles deslizantes sobre varias ventanas de tiempo
+  (`log_anomalia_score_cuantil{ventana, cuantil}`). Cada ventana guarda
+  recuentos en cubos logarítmicos (estilo DDSketch: error relativo acotado por
+  `precision`) repartidos en `ranuras` sub-intervalos que van caducando, así
+  que la memoria es constante sea cual sea el tráfico.
+
+Las anomalías se cuentan además por método y clase de status
+(`log_anomalias_total`), con métodos fuera de la lista agrupados en 'otro'
+para acotar la cardinalidad.
+"""
+import math
+import time
+import threading
+import numpy as np
+from prometheus_client import Counter
+from prometheus_client.core import GaugeMetricFamily, HistogramMetricFamily
+
+METODOS_HTTP = frozenset(('GET', 'POST', 'PUT', 'DELETE', 'HEAD', 'OPTIONS', 'PATCH', 'CONNECT', 'TRACE'))
+CLASES_STATUS = {'1': '1xx', '2': '2xx', '3': '3xx', '4': '4xx', '5': '5xx'}
+
+ANOMALIAS = Counter('log_anomalias', 'Líneas por encima del umbral, por método y clase de status',
+                    ['method', 'status'])
+
+
+def etiqueta_ventana(segundos):
+    """60 -> '1m', 3600 -> '1h', 45 -> '45s'"""
+    for unidad, tamano in (('h', 3600), ('m', 60)):
+        if segundos >= tamano and segundos % tamano == 0:
+            return f"{int(segundos // tamano)}{unidad}"
+    return f"{segundos:g}s"
+
+
+class CubosLogaritmicos:
+    """Cubo k = (gamma^(k-1), gamma^k] con gamma = (1+precision)/(1-precision), entre `minimo` y `maximo`"""
+
+    def __init__(self, precision=0.01, minimo=1e-6, maximo=1e3):
+        self.gamma = (1 + precision) / (1 - precision)
+        self._log_gamma = math.log(self.gamma)
+        self._k0 = math.ceil(math.log(minimo) / self._log_gamma)
+        self.n = math.ceil(math.log(maximo) / self._log_gamma) - self._k0 + 1
+        # Valor que representa a cada cubo: a menos de `precision` (relativo) de cualquiera de sus valores
+        self.representantes = 2 * self.gamma ** (np.arange(self.n) + self._k0) / (self.gamma + 1)
+
+    def indices(self, valores):
+        """Cubo de cada valor; los que quedan fuera de [minimo, maximo] van al primero o al último"""
+        k = np.ceil(np.log(np.maximum(valores, 1e-300)) / self._log_gamma)
+        return np.clip(k - self._k0, 0, self.n - 1).astype(np.intp)
+
+
+class VentanaDeslizante:
+    """Recuentos por cubo de los últimos `duracion` segundos, en `ranuras` sub-intervalos.
+
+    Al avanzar el reloj se vacían las ranuras caducadas, de modo que la
+    ventana efectiva está entre duracion*(1 - 1/ranuras) y duracion.
+    """
+
+    def __init__(self, duracion, n_cubos, ranuras=12):
+        self.duracion = duracion
+        self.ancho = duracion / ranuras
+        self.recuentos = np.zeros((ranuras, n_cubos), dtype=np.int64)
+        self._actual = None
+
+    def _avanzar(self, ahora):
+        actual = int(ahora // self.ancho)
+        ranuras = len(self.recuentos)
+        if self._actual is None:
+            self._actual = actual
+        elif actual > self._actual:
+            for r in range(self._actual + 1, min(actual, self._actual + ranuras) + 1):
+                self.recuentos[r % ranuras] = 0
+            self._actual = actual
+        return actual % ranuras
+
+    def sumar(self, por_cubo, ahora):
+        self.recuentos[self._avanzar(ahora)] += por_cubo
+
+    def cuantiles(self, qs, representantes, ahora):
+        """Cuantiles `qs` de lo que hay en la ventana; NaN si está vacía"""
+        self._avanzar(ahora)
+        acumulado = np.cumsum(self.recuentos.sum(axis=0))
+        total = acumulado[-1]
+        if not total:
+            return np.full(len(qs), np.nan)
+        rangos = np.maximum(np.ceil(np.asarray(qs) * total), 1)
+        return representantes[np.searchsorted(acumulado, rangos)]
+
+
+class EstadisticasScore:
+    """Histograma, cuantiles deslizantes y anomalías por etiqueta de los scores.
+
+    `registrar` se llama por línea desde el motor; `collect` lo llama
+    prometheus_client desde el hilo del servidor HTTP (ver `REGISTRY.register`).
+    """
+
+    def __init__(self, cubos_histograma, ventanas=(60, 300, 900), cuantiles=(0.5, 0.9, 0.99, 0.999),
+                 precision=0.01, ranuras=12, tamano_buffer=1024, reloj=time.monotonic):
+        self.limites = np.asarray(sorted(cubos_histograma), dtype=np.float64)
+        self.cuantiles = tuple(cuantiles)
+        self.reloj = reloj
+        self.cubos = CubosLogaritmicos(precision)
+        self.ventanas = [VentanaDeslizante(duracion, self.cubos.n, ranuras) for duracion in ventanas]
+
+        self._recuentos = np.zeros(len(self.limites) + 1, dtype=np.int64)
+        self._suma = 0.0
+        self._buffer = np.empty(max(1, int(tamano_buffer)), dtype=np.float64)
+        self._n = 0
+        self._lock = threading.Lock()
+        self._anomalias = {}
+
+    def registrar(self, mae, es_anomalia, parsed_data):
+        with self._lock:
+            self._buffer[self._n] = mae
+            self._n += 1
+            if self._n == len(self._buffer):
+                self._volcar()
+        if es_anomalia:
+            self._contar_anomalia(parsed_data)
+
+    def _contar_anomalia(self, parsed_data):
+        metodo = parsed_data.get('method')
+        metodo = metodo if metodo in METODOS_HTTP else 'otro'
+        clase = CLASES_STATUS.get(str(parsed_data.get('status_code'))[:1], 'otro')
+        contador = self._anomalias.get((metodo, clase))
+        if contador is None:
+            contador = self._anomalias[(metodo, clase)] = ANOMALIAS.labels(method=metodo, status=clase)
+        contador.inc()
+
+    def _volcar(self):
+        """Reparte lo acumulado en el buffer (con el lock tomado)"""
+        valores = self._buffer[:self._n]
+        self._n = 0
+        valores = valores[np.isfinite(valores)]
+        if not len(valores):
+            return
+        # Cubo 'le' de Prometheus: el primer límite >= valor; el último es +Inf
+        self._recuentos += np.bincount(np.searchsorted(self.limites, valores), minlength=len(self._recuentos))
+        self._suma += float(valores.sum())
+
+        por_cubo = np.bincount(self.cubos.indices(valores), minlength=self.cubos.n)
+        ahora = self.reloj()
+        for ventana in self.ventanas:
+            ventana.sumar(por_cubo, ahora)
+
+    def resumen(self):
+        """(recuentos acumulados por límite + Inf, suma, {(duracion, q): valor})"""
+        with self._lock:
+            self._volcar()
+            ahora = self.reloj()
+            cuantiles = {}
+            for ventana in self.ventanas:
+                valores = ventana.cuantiles(self.cuantiles, self.cubos.representantes, ahora)
+                for q, valor in zip(self.cuantiles, valores):
+                    cuantiles[(ventana.duracion, q)] = float(valor)
+            return np.cumsum(self._recuentos), self._suma, cuantiles
+
+    def collect(self):
+        acumulados, suma, cuantiles = self.resumen()
+        limites = [f"{limite:g}" for limite in self.limites] + ['+Inf']
+        yield HistogramMetricFamily(
+            'log_anomalia_score_distribucion', 'Distribución de los scores de anomalía',
+            buckets=list(zip(limites, acumulados.tolist())), sum_value=suma
+        )
+        familia = GaugeMetricFamily('log_anomalia_score_cuantil',
+                                    'Cuantiles del score en ventanas deslizantes', labels=['ventana', 'cuantil'])
+        for (duracion, q), valor in cuantiles.items():
+            familia.add_metric([etiqueta_ventana(duracion), f"{q:g}"], valor)
+        yield familia
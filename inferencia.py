@@ -0,0 +1,438 @@
+import time
+import json
+import queue
+import logging
+import threading
+from collections import namedtuple
+import numpy as np
+from prometheus_client import Histogram
+
+logger = logging.getLogger(__name__)
+
+# --- MÉTRICAS DEL MOTOR ---
+TAMANO_LOTE_HIST = Histogram(
+    'inferencia_tamano_lote',
+    'Número de ventanas puntuadas en cada pasada del modelo',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+ESPERA_COLA_HIST = Histogram(
+    'inferencia_espera_cola_segundos',
+    'Tiempo que espera una ventana en cola antes de ser puntuada',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+# --- BACKENDS DE INFERENCIA ---
+class BackendKeras:
+    """Ruta de referencia: `Model.predict` de Keras"""
+    nombre = 'keras'
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+
+    def __call__(self, secuencias):
+        return self.modelo.predict(secuencias, batch_size=len(secuencias), verbose=0)
+
+
+class BackendTFFunction:
+    """Llamada al modelo trazada una sola vez con `tf.function` y firma fija.
+
+    La entrada se copia a un buffer float32 reutilizado; la salida la reserva
+    TensorFlow en cada lote y se devuelve tal cual, sin copiarla otra vez.
+    """
+    nombre = 'tf_function'
+
+    def __init__(self, modelo, timesteps, n_features, tamano_max=64):
+        import tensorflow as tf
+
+        self.timesteps = timesteps
+        self.n_features = n_features
+        self._entrada = np.empty((0, timesteps, n_features), dtype=np.float32)
+        self._asegurar_capacidad(tamano_max)
+
+        firma = [tf.TensorSpec(shape=(None, timesteps, n_features), dtype=tf.float32)]
+        self._llamada = tf.function(lambda x: modelo(x, training=False), input_signature=firma)
+
+    def _asegurar_capacidad(self, n):
+        if n > len(self._entrada):
+            self._entrada = np.empty((n, self.timesteps, self.n_features), dtype=np.float32)
+
+    def __call__(self, secuencias):
+        n = len(secuencias)
+        self._asegurar_capacidad(n)
+        entrada = self._entrada[:n]
+        np.copyto(entrada, secuencias, casting='same_kind')
+        return self._llamada(entrada).numpy()
+
+
+def _activacion(nombre):
+    """Devuelve una activación in-place `f(x) -> x` equivalente a la de Keras"""
+    if nombre == 'relu':
+        return lambda x: np.maximum(x, 0, out=x)
+    if nombre == 'tanh':
+        return lambda x: np.tanh(x, out=x)
+    if nombre == 'sigmoid':
+        def sigmoide(x):
+            with np.errstate(over='ignore'):
+                np.negative(x, out=x)
+                np.exp(x, out=x)
+            x += 1
+            return np.reciprocal(x, out=x)
+        return sigmoide
+    if nombre == 'linear':
+        return lambda x: x
+    raise ValueError(f"Activación no soportada por el backend NumPy: {nombre}")
+
+
+def _leer_capas_h5(ruta_modelo):
+    """Lee la configuración y los pesos de cada capa de un modelo Sequential en .h5"""
+    import h5py
+
+    with h5py.File(ruta_modelo, 'r') as f:
+        config = json.loads(f.attrs['model_config'])
+        grupo = f['model_weights']
+        capas = []
+        for capa in config['config']['layers']:
+            clase = capa['class_name']
+            if clase == 'InputLayer':
+                continue
+            nombre = capa['config']['name']
+            pesos = []
+            if nombre in grupo:
+                for nombre_peso in grupo[nombre].attrs['weight_names']:
+                    if isinstance(nombre_peso, bytes):
+                        nombre_peso = nombre_peso.decode('utf8')
+                    pesos.append(np.asarray(grupo[nombre][nombre_peso], dtype=np.float32))
+            capas.append((clase, capa['config'], pesos))
+    return capas
+
+
+class BackendNumPy:
+    """Forward pass del autoencoder LSTM apilado en NumPy puro, sin TensorFlow.
+
+    Soporta las capas que usa `construir_modelo`: LSTM, Dropout (identidad en
+    inferencia), RepeatVector y TimeDistributed(Dense). Todos los buffers
+    intermedios se reservan una vez y se reutilizan entre lotes.
+    """
+    nombre = 'numpy'
+
+    def __init__(self, ruta_modelo, timesteps, n_features, tamano_max=64):
+        self.timesteps = timesteps
+        self.n_features = n_features
+        self._capas = []
+
+        pasos = timesteps
+        for clase, config, pesos in _leer_capas_h5(ruta_modelo):
+            if clase == 'LSTM':
+                if config.get('go_backwards') or config.get('stateful'):
+                    raise ValueError(f"LSTM '{config['name']}' no soportada por el backend NumPy")
+                kernel, recurrente, bias = pesos
+                self._capas.append({
+                    'tipo': 'lstm',
+                    'unidades': config['units'],
+                    'kernel': kernel,
+                    'recurrente': recurrente,
+                    'bias': bias,
+                    'activacion': _activacion(config['activation']),
+                    'activacion_rec': _activacion(config['recurrent_activation']),
+                    'secuencias': config['return_sequences'],
+                    'pasos': pasos,
+                })
+            elif clase == 'RepeatVector':
+                pasos = config['n']
+                self._capas.append({'tipo': 'repetir', 'pasos': pasos})
+            elif clase in ('TimeDistributed', 'Dense'):
+                interna = config['layer']['config'] if clase == 'TimeDistributed' else config
+                kernel, bias = pesos
+                self._capas.append({
+                    'tipo': 'densa',
+                    'kernel': kernel,
+                    'bias': bias,
+                    'activacion': _activacion(interna['activation']),
+                    'pasos': pasos,
+                })
+            elif clase == 'Dropout':
+                continue
+            else:
+                raise ValueError(f"Capa no soportada por el backend NumPy: {clase}")
+
+        self._capacidad = 0
+        self._asegurar_capacidad(tamano_max)
+
+    def _asegurar_capacidad(self, n):
+        if n <= self._capacidad:
+            return
+        for capa in self._capas:
+            if capa['tipo'] == 'lstm':
+                u = capa['unidades']
+                capa['xw'] = np.empty((n, capa['pasos'], 4 * u), dtype=np.float32)
+                capa['z'] = np.empty((n, 4 * u), dtype=np.float32)
+                capa['h'] = np.empty((n, u), dtype=np.float32)
+                capa['c'] = np.empty((n, u), dtype=np.float32)
+                capa['tmp'] = np.empty((n, u), dtype=np.float32)
+                capa['salida'] = np.empty((n, capa['pasos'], u), dtype=np.float32)
+            elif capa['tipo'] == 'densa':
+                capa['salida'] = np.empty((n, capa['pasos'], capa['kernel'].shape[1]), dtype=np.float32)
+        self._entrada = np.empty((n, self.timesteps, self.n_features), dtype=np.float32)
+        self._capacidad = n
+
+    def _lstm(self, capa, x, n, repetida):
+        u = capa['unidades']
+        pasos = capa['pasos']
+        xw = capa['xw'][:n]
+        z = capa['z'][:n]
+        h = capa['h'][:n]
+        c = capa['c'][:n]
+        tmp = capa['tmp'][:n]
+        salida = capa['salida'][:n]
+
+        # Proyección de la entrada para todos los pasos de una vez
+        if repetida:
+            # La entrada es la misma en todos los pasos (RepeatVector)
+            np.matmul(x, capa['kernel'], out=xw[:, 0])
+            xw[:, 0] += capa['bias']
+        else:
+            np.matmul(x, capa['kernel'], out=xw)
+            xw += capa['bias']
+
+        h.fill(0)
+        c.fill(0)
+        for t in range(pasos):
+            np.matmul(h, capa['recurrente'], out=z)
+            z += xw[:, 0] if repetida else xw[:, t]
+
+            # Orden de compuertas de Keras: input, forget, candidata, output
+            i = capa['activacion_rec'](z[:, :u])
+            f = capa['activacion_rec'](z[:, u:2 * u])
+            g = capa['activacion'](z[:, 2 * u:3 * u])
+            o = capa['activacion_rec'](z[:, 3 * u:])
+
+            c *= f
+            np.multiply(i, g, out=tmp)
+            c += tmp
+            np.copyto(tmp, c)
+            np.multiply(o, capa['activacion'](tmp), out=h)
+            if capa['secuencias']:
+                salida[:, t] = h
+
+        return salida if capa['secuencias'] else h
+
+    def __call__(self, secuencias):
+        n = len(secuencias)
+        self._asegurar_capacidad(n)
+        x = self._entrada[:n]
+        np.copyto(x, secuencias, casting='same_kind')
+
+        repetida = False
+        for capa in self._capas:
+            if capa['tipo'] == 'lstm':
+                x = self._lstm(capa, x, n, repetida)
+                repetida = False
+            elif capa['tipo'] == 'repetir':
+                # Se mantiene el vector (n, u); la LSTM siguiente lo reutiliza en cada paso
+                repetida = True
+            else:
+                salida = capa['salida'][:n]
+                np.matmul(x, capa['kernel'], out=salida)
+                salida += capa['bias']
+                x = capa['activacion'](salida)
+        return x
+
+
+BACKENDS = ('keras', 'tf_function', 'numpy')
+# Backends que no necesitan el modelo Keras (ni importar TensorFlow) para puntuar
+BACKENDS_SIN_TENSORFLOW = ('numpy',)
+
+
+def crear_backend(nombre, modelo, ruta_modelo, timesteps, n_features, tamano_max=64):
+    """Instancia el backend de inferencia indicado por nombre"""
+    if nombre == 'keras':
+        return BackendKeras(modelo)
+    if nombre == 'tf_function':
+        return BackendTFFunction(modelo, timesteps, n_features, tamano_max)
+    if nombre == 'numpy':
+        return BackendNumPy(ruta_modelo, timesteps, n_features, tamano_max)
+    raise ValueError(f"Backend de inferencia desconocido: '{nombre}'. Opciones: {BACKENDS}")
+
+
+def calentar_backend(backend, timesteps, n_features, tamano_lote):
+    """Una pasada con un lote completo de ceros, para trazar grafos y reservar buffers antes de la primera línea"""
+    inicio = time.perf_counter()
+    backend(np.zeros((tamano_lote, timesteps, n_features), dtype=np.float32))
+    return time.perf_counter() - inicio
+
+
+def verificar_backend(backend, modelo, timesteps, n_features, tolerancia=1e-4, n_ventanas=32, semilla=0):
+    """Compara la salida del backend con Keras sobre ventanas aleatorias en [0, 1].
+
+    Devuelve la diferencia absoluta máxima encontrada y lanza ValueError si
+    supera `tolerancia`.
+    """
+    rng = np.random.default_rng(semilla)
+    secuencias = rng.random((n_ventanas, timesteps, n_features), dtype=np.float32)
+    esperado = modelo.predict(secuencias, batch_size=n_ventanas, verbose=0)
+    diferencia = float(np.max(np.abs(backend(secuencias) - esperado)))
+    if diferencia > tolerancia:
+        raise ValueError(
+            f"Backend '{backend.nombre}' difiere de Keras en {diferencia:.2e} (tolerancia {tolerancia:.0e})"
+        )
+    return diferencia
+
+
+def errores_reconstruccion(reconstruccion, secuencias, diferencia=None):
+    """MAE por ventana calculado en float64; `diferencia` es un buffer opcional reutilizable"""
+    if diferencia is None:
+        diferencia = np.empty(secuencias.shape, dtype=np.float64)
+    np.subtract(reconstruccion, secuencias, out=diferencia, dtype=np.float64)
+    np.abs(diferencia, out=diferencia)
+    return diferencia.mean(axis=(1, 2))
+
+
+_FIN = object()
+# Marca en la cola: el lote en curso se cierra y se puntúa antes de cambiar de modelo
+_Cambio = namedtuple('_Cambio', ['predecir', 'al_cambiar'])
+
+
+class MotorInferenciaPorLotes:
+    """Agrupa las ventanas de varias líneas y las puntúa en una sola pasada del modelo.
+
+    Un lote se cierra cuando junta `tamano_lote` ventanas o cuando la más antigua
+    lleva `espera_max_ms` milisegundos en cola. Cada ventana se entrega después a
+    `al_puntuar(mae, contexto)` en el mismo orden en que llegó, o el lote entero
+    a `al_puntuar_lote(maes, contextos, diferencias)` si se indica; `diferencias`
+    es el |reconstrucción - ventana| del que salen los MAE (un buffer que se
+    reutiliza en el siguiente lote: solo es válido durante la llamada).
+    `cambiar` sustituye el modelo entre dos lotes, en orden con las ventanas.
+    """
+
+    def __init__(self, predecir, al_puntuar, tamano_lote=64, espera_max_ms=50.0, instrumentacion=None,
+                 al_puntuar_lote=None):
+        self.predecir = predecir
+        self.al_puntuar = al_puntuar
+        self.al_puntuar_lote = al_puntuar_lote
+        # Opcional: observadores por lote de las etapas predecir y sumidero
+        self.instrumentacion = instrumentacion
+        self.tamano_lote = max(1, int(tamano_lote))
+        self.espera_max = max(0.0, float(espera_max_ms)) / 1000.0
+        self._secuencias = None
+        self._diferencia = None
+        self._cambio = None
+
+        # Cola acotada: si el modelo no da abasto, el lector se frena
+        self._cola = queue.Queue(maxsize=self.tamano_lote * 4)
+        self._hilo = threading.Thread(target=self._bucle, name='motor-inferencia', daemon=True)
+        self._hilo.start()
+
+    def enviar(self, secuencia, contexto):
+        """Encola una ventana (TIMESTEPS, n_features) junto con los datos de su línea.
+
+        La ventana se copia, así que puede ser una vista sobre un buffer que se
+        sobrescribirá después.
+        """
+        self._cola.put((np.array(secuencia)[np.newaxis], [contexto], time.monotonic()))
+
+    def enviar_lote(self, secuencias, contextos):
+        """Encola k ventanas consecutivas (k, TIMESTEPS, n_features) de una sola vez"""
+        self._cola.put((np.array(secuencias), list(contextos), time.monotonic()))
+
+    def huecos(self):
+        """Envíos que caben ahora en la cola sin bloquear (aproximado si encolan varios hilos)"""
+        return self._cola.maxsize - self._cola.qsize()
+
+    def cambiar(self, predecir, al_cambiar=None):
+        """Las ventanas encoladas hasta ahora se puntúan con el modelo actual y las
+        siguientes con `predecir`; `al_cambiar()` se llama en el hilo del motor justo
+        entre las dos"""
+        self._cola.put(_Cambio(predecir, al_cambiar))
+
+    def detener(self, timeout=None):
+        """Puntúa lo que quede en cola y termina el hilo del motor"""
+        self._cola.put(_FIN)
+        self._hilo.join(timeout)
+
+    def _recolectar(self):
+        """Devuelve (lote, fin) esperando como máximo `espera_max` desde la primera ventana"""
+        primero = self._cola.get()
+        if primero is _FIN:
+            return [], True
+        if isinstance(primero, _Cambio):
+            self._cambio = primero
+            return [], False
+
+        lote = [primero]
+        ventanas = len(primero[1])
+        limite = primero[2] + self.espera_max
+        while ventanas < self.tamano_lote:
+            restante = limite - time.monotonic()
+            try:
+                if restante > 0:
+                    item = self._cola.get(timeout=restante)
+                else:
+                    item = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if item is _FIN:
+                return lote, True
+            if isinstance(item, _Cambio):
+                self._cambio = item
+                break
+            lote.append(item)
+            ventanas += len(item[1])
+        return lote, False
+
+    def _puntuar(self, lote):
+        ahora = time.monotonic()
+        for _, contextos, encolado in lote:
+            for _ in contextos:
+                ESPERA_COLA_HIST.observe(ahora - encolado)
+
+        n = sum(len(contextos) for _, contextos, _ in lote)
+        TAMANO_LOTE_HIST.observe(n)
+
+        forma = lote[0][0].shape[1:]
+        dtype = lote[0][0].dtype
+        if (self._secuencias is None or len(self._secuencias) < n
+                or self._secuencias.shape[1:] != forma or self._secuencias.dtype != dtype):
+            capacidad = max(n, self.tamano_lote)
+            self._secuencias = np.empty((capacidad,) + forma, dtype=dtype)
+            self._diferencia = np.empty((capacidad,) + forma, dtype=np.float64)
+
+        # Buffers reutilizados entre lotes: apilado, diferencia y MAE sin reservar memoria
+        inicio = time.perf_counter()
+        secuencias = np.concatenate([bloque for bloque, _, _ in lote], out=self._secuencias[:n])
+        reconstruccion = self.predecir(secuencias)
+        maes = errores_reconstruccion(reconstruccion, secuencias, self._diferencia[:n])
+        puntuado = time.perf_counter()
+
+        if self.al_puntuar_lote is not None:
+            self.al_puntuar_lote(maes, [contexto for _, contextos, _ in lote for contexto in contextos],
+                                 self._diferencia[:n])
+        else:
+            i = 0
+            for _, contextos, _ in lote:
+                for contexto in contextos:
+                    self.al_puntuar(maes[i], contexto)
+                    i += 1
+
+        if self.instrumentacion is not None:
+            self.instrumentacion.predecir(puntuado - inicio)
+            self.instrumentacion.sumidero(time.perf_counter() - puntuado)
+
+    def _bucle(self):
+        fin = False
+        while not fin:
+            lote, fin = self._recolectar()
+            if lote:
+                try:
+                    self._puntuar(lote)
+                except Exception as e:
+                    logger.error(f"[!] Error puntuando lote de {sum(len(c) for _, c, _ in lote)} ventanas: {e}")
+                    import traceback
+                    logger.error(traceback.format_exc())
+            if self._cambio is not None:
+                cambio, self._cambio = self._cambio, None
+                self.predecir = cambio.predecir
+                if cambio.al_cambiar is not None:
+                    try:
+                        cambio.al_cambiar()
+                    except Exception as e:
+                        logger.error(f"[!] Error al cambiar de modelo: {e}")
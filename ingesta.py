@@ -0,0 +1,232 @@
+"""Ingesta de varios access logs en un único proceso con asyncio.
+
+FUENTES es una lista separada por comas de `[nombre=]patrón`, donde el patrón
+es una ruta o un glob (`/var/log/apache2/*access.log`). Cada fichero que
+encaja es una fuente con su propio seguidor (checkpoint incluido), su parser,
+que rellena `log_source` con el nombre de la fuente, y sus propias ventanas.
+Todas las fuentes alimentan el mismo motor de inferencia por lotes, así que
+un solo modelo sirve a todos los logs.
+
+Cada fuente es una tarea asyncio. Las lecturas (`SeguidorLog.leer`) y los
+checkpoints van a un hilo del executor con `asyncio.to_thread`, así que un disco
+lento no para el bucle. Las líneas se procesan en tramos de `lineas_por_turno`
+y se cede el turno entre tramos; sin datos espera con sondeo adaptativo.
+Contrapresión: cada línea encola como mucho una ventana en el motor, así que un
+tramo nunca tiene más líneas que huecos libres en su cola y `procesar_log` no
+se bloquea; con la cola llena la fuente espera con `asyncio.sleep`.
+
+Los patrones se vuelven a expandir cada `revision` segundos: un fichero nuevo
+(otro vhost) se lee desde el principio. Los rotados que encajen con un glob
+(`access.log.1`, `access.log.2.gz`, `access.log-20240101`) no son fuentes: el
+seguidor del activo ya termina el fichero tras la rotación.
+
+Métricas por fuente: `ingesta_lineas_total{fuente}` (ritmo) y, calculados al
+leer /metrics, `ingesta_retraso_bytes{fuente}` e `ingesta_retraso_segundos{fuente}`
+(antigüedad de la última línea procesada según la hora del log).
+"""
+import os
+import re
+import glob
+import asyncio
+import logging
+from prometheus_client import Counter
+from prometheus_client.core import GaugeMetricFamily
+from parser_apache import ParserApache
+from seguidor_logs import SeguidorLog
+from ventana import VentanaAnillo, VentanasPorClave
+from instrumentacion import antiguedad_linea
+
+logger = logging.getLogger(__name__)
+
+LINEAS_FUENTE = Counter('ingesta_lineas', 'Líneas leídas de cada fuente', ['fuente'])
+_COMODINES = re.compile(r'[*?[]')
+# Sufijos de logrotate: .1, .2.gz, -20240101 (dateext) y la compresión sola
+_ROTADO = re.compile(r'(\.\d+|-\d{8,10})(\.(gz|bz2|xz|zst))?$|\.(gz|bz2|xz|zst)$')
+
+
+def parsear_fuentes(texto):
+    """'web=/var/log/apache2/*access.log,/var/log/otro.log' -> [('web', '/var/...'), (None, '/var/log/otro.log')]"""
+    fuentes = []
+    for entrada in texto.split(','):
+        entrada = entrada.strip()
+        if not entrada:
+            continue
+        nombre, _, patron = entrada.rpartition('=')
+        fuentes.append((nombre.strip() or None, patron.strip()))
+    return fuentes
+
+
+def nombre_fuente(ruta, patron, nombre=None):
+    """log_source de un fichero: el nombre dado o, con un glob, la parte de la ruta que varía.
+
+    /var/log/apache2/*access.log      + /var/log/apache2/tienda_access.log -> 'tienda_access'
+    web=/var/log/*/access.log         + /var/log/blog/access.log           -> 'web:blog_access'
+    """
+    if not _COMODINES.search(patron):
+        return nombre or re.sub(r'\.log$', '', os.path.basename(ruta))
+    componentes = patron.split(os.sep)
+    fijo = next(i for i, componente in enumerate(componentes) if _COMODINES.search(componente))
+    relativo = os.path.relpath(ruta, os.sep.join(componentes[:fijo]) or os.curdir)
+    variable = re.sub(r'\.log$', '', relativo).replace(os.sep, '_')
+    return f"{nombre}:{variable}" if nombre else variable
+
+
+def ruta_checkpoint_fuente(ruta_checkpoint, nombre):
+    """seguidor_checkpoint.json -> seguidor_checkpoint.<nombre>.json"""
+    if not ruta_checkpoint:
+        return None
+    base, extension = os.path.splitext(ruta_checkpoint)
+    seguro = re.sub(r'[^\w.-]', '_', nombre)
+    return f"{base}.{seguro}{extension}"
+
+
+class FuenteLog:
+    """Estado de un log: parser con su log_source, ventanas propias y métricas"""
+
+    def __init__(self, nombre, formato, timesteps, n_features, clave='', max_claves=1024, ruta=None):
+        self.nombre = nombre
+        self.ruta = ruta
+        self.parser = ParserApache(formato, log_source=nombre)
+        self.clave = clave
+        if clave:
+            self.ventanas = VentanasPorClave(timesteps, n_features, max_claves)
+        else:
+            self.ventana_global = VentanaAnillo(timesteps, n_features)
+        # Los asigna IngestaMultiple al seguir el fichero
+        self.seguidor = None
+        self.lineas = None
+        self.ultima_linea = None
+
+    def ventana(self, parsed_data):
+        """Ventana en la que entra la línea: la global de la fuente o la de su clave"""
+        if self.clave:
+            return self.ventanas.ventana(parsed_data.get(self.clave))
+        return self.ventana_global
+
+
+class IngestaMultiple:
+    """Sigue los ficheros de `patrones` y pasa cada línea a `capturador.procesar_log(linea, fuente)`.
+
+    También es un colector de Prometheus (`REGISTRY.register`) con el retraso por fuente.
+    """
+
+    def __init__(self, capturador, patrones, ruta_checkpoint=None, revision=10.0, lineas_por_turno=512,
+                 intervalo_min=0.01, intervalo_max=0.25, al_leer=None):
+        self.capturador = capturador
+        self.patrones = patrones
+        self.ruta_checkpoint = ruta_checkpoint
+        self.revision = revision
+        self.lineas_por_turno = max(1, int(lineas_por_turno))
+        self.intervalo_min = intervalo_min
+        self.intervalo_max = intervalo_max
+        self.al_leer = al_leer
+        # ruta real -> FuenteLog
+        self.fuentes = {}
+        self._tareas = set()
+
+    def descubrir(self, desde_inicio):
+        """Fuentes nuevas según los patrones; `desde_inicio` para ficheros aparecidos en marcha"""
+        nuevas = []
+        for nombre, patron in self.patrones:
+            comodines = _COMODINES.search(patron)
+            for ruta in sorted(glob.glob(patron)):
+                real = os.path.realpath(ruta)
+                if real in self.fuentes or not os.path.isfile(real):
+                    continue
+                if comodines and _ROTADO.search(ruta):
+                    continue
+                fuente = self.capturador.crear_fuente(nombre_fuente(ruta, patron, nombre), ruta)
+                fuente.seguidor = SeguidorLog(ruta, ruta_checkpoint=ruta_checkpoint_fuente(self.ruta_checkpoint,
+                                                                                          fuente.nombre),
+                                              intervalo_min=self.intervalo_min, intervalo_max=self.intervalo_max,
+                                              desde_inicio=desde_inicio, usar_inotify=False, al_leer=self.al_leer)
+                fuente.lineas = LINEAS_FUENTE.labels(fuente=fuente.nombre)
+                self.fuentes[real] = fuente
+                nuevas.append(fuente)
+                logger.info(f"[✓] Fuente '{fuente.nombre}': {ruta}")
+        return nuevas
+
+    def _lanzar(self, fuentes):
+        for fuente in fuentes:
+            tarea = asyncio.get_running_loop().create_task(self._seguir(fuente), name=f"fuente-{fuente.nombre}")
+            self._tareas.add(tarea)
+            tarea.add_done_callback(self._tareas.discard)
+
+    async def ejecutar(self):
+        """Bucle principal: sigue las fuentes iniciales y busca nuevas cada `revision` segundos"""
+        self._lanzar(self.descubrir(desde_inicio=False))
+        if not self.fuentes:
+            logger.warning(f"[!] Ningún fichero encaja con FUENTES; se vuelve a buscar cada {self.revision:g}s")
+        while True:
+            await asyncio.sleep(self.revision)
+            self._lanzar(self.descubrir(desde_inicio=True))
+
+    @staticmethod
+    def _leer(seguidor):
+        """En un hilo del executor: el checkpoint que toque (offset ya avanzado) y la siguiente lectura"""
+        seguidor.guardar_checkpoint_si_toca()
+        return seguidor.leer()
+
+    async def _huecos(self):
+        """Espera sin bloquear el bucle a que la cola del motor tenga sitio y devuelve cuántos huecos hay"""
+        motor = self.capturador.motor
+        espera = self.intervalo_min
+        while True:
+            huecos = motor.huecos()
+            if huecos > 0:
+                return huecos
+            await asyncio.sleep(espera)
+            espera = min(espera * 2, self.intervalo_max)
+
+    async def _seguir(self, fuente):
+        seguidor = fuente.seguidor
+        procesar = self.capturador.procesar_log
+        intervalo = self.intervalo_min
+        try:
+            await asyncio.to_thread(seguidor.abrir)
+            while True:
+                trozos = await asyncio.to_thread(self._leer, seguidor)
+                if not trozos:
+                    await asyncio.sleep(intervalo)
+                    intervalo = min(intervalo * 2, self.intervalo_max)
+                    continue
+
+                intervalo = self.intervalo_min
+                for trozo in trozos:
+                    lineas = str(trozo, 'utf-8', 'replace').split('\n')
+                    inicio = 0
+                    while inicio < len(lineas):
+                        # Como mucho una ventana por línea: el tramo cabe en la cola del motor
+                        fin = inicio + min(self.lineas_por_turno, await self._huecos())
+                        ultima = None
+                        for linea in lineas[inicio:fin]:
+                            ultima = procesar(linea, fuente) or ultima
+                        if ultima is not None:
+                            fuente.ultima_linea = ultima
+                        inicio = fin
+                        # Turno para las demás fuentes
+                        await asyncio.sleep(0)
+                    seguidor.offset += len(trozo) + 1
+                    fuente.lineas.inc(len(lineas))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Se vuelve a descubrir en la siguiente revisión
+            logger.error(f"[!] Fuente '{fuente.nombre}' detenida por un error: {e}")
+            self.fuentes.pop(os.path.realpath(fuente.seguidor.ruta), None)
+        finally:
+            seguidor.cerrar()
+
+    def collect(self):
+        fuentes = list(self.fuentes.values())
+        bytes_pendientes = GaugeMetricFamily('ingesta_retraso_bytes', 'Bytes de cada fuente aún sin procesar',
+                                             labels=['fuente'])
+        segundos = GaugeMetricFamily('ingesta_retraso_segundos',
+                                     'Antigüedad (según la hora del log) de la última línea procesada de cada fuente',
+                                     labels=['fuente'])
+        for fuente in fuentes:
+            bytes_pendientes.add_metric([fuente.nombre], fuente.seguidor.bytes_pendientes())
+            segundos.add_metric([fuente.nombre], antiguedad_linea(fuente.ultima_linea))
+        yield bytes_pendientes
+        yield segundos
+        yield GaugeMetricFamily('ingesta_fuentes', 'Ficheros de log seguidos', value=len(fuentes))
@@ -0,0 +1,131 @@
+"""Instrumentación del camino caliente del capturador.
+
+- `capturador_etapa_segundos{etapa}`: leer (por bloque leído), parsear,
+  codificar, escalar, ventana y cascada (por línea, una de cada `cada`;
+  ventana incluye la espera si la cola del motor está llena), predecir y
+  sumidero (por lote del motor).
+- Retraso: bytes del log aún sin procesar y antigüedad de la última línea
+  puntuada, calculados al leer /metrics.
+- Líneas que no se pudieron parsear y valores categóricos desconocidos por
+  columna.
+- Perfilador cProfile que se activa y desactiva con SIGUSR1.
+
+Con la instrumentación desactivada no se añade nada por línea: el capturador
+usa directamente su camino sin medir.
+"""
+import os
+import time
+import signal
+import logging
+import cProfile
+import threading
+from datetime import datetime
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily
+
+logger = logging.getLogger(__name__)
+
+ETAPAS = ('leer', 'parsear', 'codificar', 'escalar', 'ventana', 'cascada', 'predecir', 'sumidero')
+FORMATO_FECHA_APACHE = '%d/%b/%Y:%H:%M:%S %z'
+
+# --- MÉTRICAS ---
+ETAPA_SEGUNDOS = Histogram(
+    'capturador_etapa_segundos',
+    'Duración de cada etapa: por bloque (leer), por línea muestreada (parsear..cascada) o por lote (predecir, sumidero)',
+    ['etapa'],
+    buckets=(1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+             0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+LINEAS_FALLIDAS = Counter('capturador_lineas_no_parseadas_total', 'Líneas que no encajan con LOG_FORMAT')
+BYTES_PENDIENTES = Gauge('capturador_retraso_bytes', 'Bytes del log escritos por Apache y aún sin procesar')
+ANTIGUEDAD_ULTIMA = Gauge(
+    'capturador_retraso_segundos',
+    'Antigüedad (según la hora del log) de la línea puntuada más reciente'
+)
+
+
+class ColectorDesconocidos:
+    """Expone el contador `desconocidos` de cada tabla de vocabulario, sin coste por línea.
+
+    `tablas` es el dict de tablas o una función que devuelve el vigente (recarga en caliente).
+    """
+
+    def __init__(self, tablas):
+        self.tablas = tablas
+
+    def collect(self):
+        familia = CounterMetricFamily('codificacion_valores_desconocidos',
+                                      'Valores categóricos fuera del vocabulario de entrenamiento',
+                                      labels=['columna'])
+        tablas = self.tablas() if callable(self.tablas) else self.tablas
+        for col, tabla in tablas.items():
+            familia.add_metric([col], tabla.desconocidos)
+        yield familia
+
+
+def antiguedad_linea(parsed_data, ahora=None):
+    """Segundos entre la hora de la línea (%t de Apache) y ahora; NaN si no se puede leer"""
+    if not parsed_data:
+        return float('nan')
+    try:
+        momento = datetime.strptime(parsed_data['timestamp'], FORMATO_FECHA_APACHE)
+    except (KeyError, TypeError, ValueError):
+        return float('nan')
+    return (time.time() if ahora is None else ahora) - momento.timestamp()
+
+
+class Instrumentacion:
+    """Observadores por etapa y métricas de retraso de un capturador"""
+
+    def __init__(self, cada=100):
+        self.cada = max(1, int(cada))
+        # Hijos del histograma resueltos una vez: observar no busca la etiqueta
+        for etapa in ETAPAS:
+            setattr(self, etapa, ETAPA_SEGUNDOS.labels(etapa=etapa).observe)
+
+    def vigilar(self, seguidor=None, registro=None, tablas=None):
+        """Retraso y desconocidos se calculan al servir /metrics"""
+        if seguidor is not None:
+            BYTES_PENDIENTES.set_function(seguidor.bytes_pendientes)
+        if registro is not None:
+            ANTIGUEDAD_ULTIMA.set_function(lambda: antiguedad_linea(registro.ultima_linea))
+        if tablas is not None:
+            REGISTRY.register(ColectorDesconocidos(tablas))
+
+
+class Perfilador:
+    """cProfile del hilo principal, alternado con una señal.
+
+    La primera señal empieza a perfilar; la siguiente para y vuelca las
+    estadísticas (formato pstats: `python -m pstats`, snakeviz...) en
+    `directorio`. El hilo del motor no queda incluido: su tiempo se ve en las
+    etapas predecir y sumidero.
+    """
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self._perfil = None
+
+    def instalar(self, senal=signal.SIGUSR1):
+        signal.signal(senal, self._al_recibir)
+        logger.info(f"[*] Perfilador: 'kill -{signal.Signals(senal).name[3:]} {os.getpid()}' "
+                    f"para empezar/parar (volcado en {self.directorio})")
+
+    def _al_recibir(self, signum, frame):
+        # El manejador corre en el hilo principal, entre dos instrucciones del bucle
+        self.alternar()
+
+    def alternar(self):
+        if self._perfil is None:
+            self._perfil = cProfile.Profile()
+            self._perfil.enable()
+            logger.warning("[⏱] Perfilador activado")
+            return None
+
+        perfil, self._perfil = self._perfil, None
+        perfil.disable()
+        ruta = os.path.join(self.directorio, f"perfil_{os.getpid()}_{time.strftime('%Y%m%d-%H%M%S')}.prof")
+        # Volcado fuera del manejador de la señal
+        threading.Thread(target=perfil.dump_stats, args=(ruta,), name='volcado-perfil', daemon=True).start()
+        logger.warning(f"[⏱] Perfilador desactivado; estadísticas en {ruta}")
+        return ruta
@@ -0,0 +1,230 @@
+import re
+import numpy as np
+
+# --- FORMATOS DE LOG ---
+FORMATO_COMBINED = '%h %l %u %t "%r" %>s %b "%{Referer}i" "%{User-Agent}i"'
+FORMATO_COMBINED_SSL = FORMATO_COMBINED + ' %{SSL_PROTOCOL}x %{SSL_CIPHER}x'
+
+CAMPOS = ('ip', 'timestamp', 'method', 'url', 'http_version', 'status_code', 'response_size',
+          'referer', 'user_agent', 'tls_version', 'cipher_suite')
+CAMPOS_NUMERICOS = ('status_code', 'response_size')
+
+# Directiva de LogFormat: %[modificadores][{argumento}]letra
+_DIRECTIVA = re.compile(r'%(?:[<>]|!?\d{3}(?:,\d{3})*)*(?:\{([^}]*)\})?([a-zA-Z%])')
+
+# letra -> (campo, patrón); campo None = se reconoce pero no se guarda
+_DIRECTIVAS = {
+    'h': ('ip', r'\S+'),
+    'a': ('ip', r'\S+'),
+    'l': (None, r'\S+'),
+    'u': (None, r'\S+'),
+    's': ('status_code', r'\d+'),
+    'b': ('response_size', r'\d+|-'),
+    'B': ('response_size', r'\d+'),
+    'm': ('method', r'\S+'),
+    'U': ('url', r'\S+'),
+    'H': ('http_version', r'\S+'),
+}
+_CABECERAS = {'referer': 'referer', 'user-agent': 'user_agent'}
+_VARIABLES_SSL = {'SSL_PROTOCOL': 'tls_version', 'SSL_CIPHER': 'cipher_suite'}
+
+
+def compilar_formato(formato):
+    """Traduce un LogFormat de Apache a una regex con un grupo con nombre por campo"""
+    partes = ['^']
+    usados = set()
+    pos = 0
+
+    def grupo(campo, patron):
+        if campo is None or campo in usados:
+            return f'(?:{patron})'
+        usados.add(campo)
+        return f'(?P<{campo}>{patron})'
+
+    for m in _DIRECTIVA.finditer(formato):
+        partes.append(re.escape(formato[pos:m.start()]))
+        pos = m.end()
+        argumento, letra = m.groups()
+        entre_comillas = formato[m.start() - 1:m.start()] == '"' and formato[m.end():m.end() + 1] == '"'
+        libre = r'.*?' if entre_comillas else r'\S+'
+
+        if letra == '%':
+            partes.append('%')
+        elif letra == 't':
+            # %t incluye los corchetes; %{formato}t no
+            partes.append(r'\[' + grupo('timestamp', r'.*?') + r'\]' if argumento is None
+                          else grupo('timestamp', libre))
+        elif letra == 'r':
+            partes.append(grupo('method', r'\S+') + ' ' + grupo('url', r'\S+') + ' ' + grupo('http_version', r'\S+'))
+        elif letra == 'i':
+            partes.append(grupo(_CABECERAS.get((argumento or '').lower()), libre))
+        elif letra == 'x':
+            partes.append(grupo(_VARIABLES_SSL.get(argumento), libre))
+        elif letra in _DIRECTIVAS:
+            campo, patron = _DIRECTIVAS[letra]
+            partes.append(grupo(campo, patron))
+        else:
+            partes.append(grupo(None, libre))
+    partes.append(re.escape(formato[pos:]))
+    return re.compile(''.join(partes))
+
+
+class LoteParseado:
+    """Resultado columnar de `ParserApache.parsear_lote`.
+
+    `columnas` mapea cada campo a una lista de `n` valores (los numéricos, a
+    arrays int64); `indices` son las posiciones de las líneas válidas en la
+    entrada y `fallidas` cuántas no se pudieron parsear.
+    """
+
+    def __init__(self, columnas, n, indices, fallidas):
+        self.columnas = columnas
+        self.n = n
+        self.indices = indices
+        self.fallidas = fallidas
+
+    def __len__(self):
+        return self.n
+
+    def registro(self, i):
+        """La fila `i` como el dict que devuelve `parsear`"""
+        return {campo: (int(valores[i]) if campo in CAMPOS_NUMERICOS else valores[i])
+                for campo, valores in self.columnas.items()}
+
+
+class ParserApache:
+    """Parser de access logs de Apache para un LogFormat dado.
+
+    Para Combined (con o sin `%{SSL_PROTOCOL}x %{SSL_CIPHER}x` al final) usa un
+    camino rápido con `split` que solo acepta líneas en las que la regex daría
+    exactamente el mismo resultado; cualquier otra línea, o cualquier otro
+    formato, pasa por la regex precompilada del formato.
+    """
+
+    def __init__(self, formato=FORMATO_COMBINED, log_source='apache_access_log'):
+        self.formato = formato
+        self.log_source = log_source
+        self.regex = compilar_formato(formato)
+        self._grupos = [(campo, self.regex.groupindex.get(campo)) for campo in CAMPOS]
+        if formato == FORMATO_COMBINED:
+            self._rapido = self._combined
+        elif formato == FORMATO_COMBINED_SSL:
+            self._rapido = self._combined_ssl
+        else:
+            self._rapido = None
+
+    # --- Camino rápido ---
+    @staticmethod
+    def _combined_partes(line):
+        """Trocea una línea Combined por sus 6 comillas; None si no es el caso simple.
+
+        `isprintable()` descarta de una vez tabuladores y demás espacios que
+        `\\S` no acepta, de modo que lo aceptado aquí es lo mismo que daría la regex.
+        """
+        trozos = line.split('"')
+        if len(trozos) != 7:
+            return None
+        prefijo, peticion, medio, referer, separador, user_agent, resto = trozos
+        if separador != ' ' or not prefijo.isprintable() or not peticion.isprintable():
+            return None
+        cabecera = prefijo.split(' ', 3)
+        if len(cabecera) != 4 or not (cabecera[0] and cabecera[1] and cabecera[2]):
+            return None
+        timestamp = cabecera[3]
+        if timestamp[:1] != '[' or timestamp[-2:] != '] ':
+            return None
+        partes = peticion.split(' ')
+        if len(partes) != 3 or not (partes[0] and partes[1] and partes[2]):
+            return None
+        numeros = medio.split(' ')
+        if len(numeros) != 4 or numeros[0] or numeros[3]:
+            return None
+        status, size = numeros[1], numeros[2]
+        if not status.isdecimal() or not (size.isdecimal() or size == '-'):
+            return None
+        if '\n' in referer or '\n' in user_agent:
+            return None
+        return (cabecera[0], timestamp[1:-2], partes[0], partes[1], partes[2], int(status),
+                0 if size == '-' else int(size), referer, user_agent), resto
+
+    def _combined(self, line):
+        resultado = self._combined_partes(line)
+        if resultado is None:
+            return None
+        return resultado[0] + ('-', '-')
+
+    def _combined_ssl(self, line):
+        resultado = self._combined_partes(line)
+        if resultado is None:
+            return None
+        campos, resto = resultado
+        # ' PROTOCOLO CIFRADO' justo tras la comilla de cierre del User-Agent
+        partes = resto.split(' ', 2)
+        if len(partes) != 3 or partes[0] or not partes[1] or not partes[1].isprintable():
+            return None
+        cifrado = partes[2]
+        if not cifrado or cifrado[0].isspace():
+            return None
+        return campos + (partes[1], cifrado.split(None, 1)[0])
+
+    # --- API ---
+    def campos(self, line):
+        """Tupla con los valores de CAMPOS, o None si la línea no encaja en el formato"""
+        if self._rapido is not None:
+            valores = self._rapido(line)
+            if valores is not None:
+                return valores
+
+        match = self.regex.match(line)
+        if not match:
+            return None
+        valores = []
+        for campo, grupo in self._grupos:
+            valor = match.group(grupo) if grupo is not None else None
+            if campo in CAMPOS_NUMERICOS:
+                valores.append(0 if valor is None or valor == '-' else int(valor))
+            else:
+                valores.append('-' if valor is None else valor)
+        return tuple(valores)
+
+    def parsear(self, line):
+        """Parsea una línea en un dict con los campos del modelo (None si no encaja)"""
+        valores = self.campos(line)
+        if valores is None:
+            return None
+        data = dict(zip(CAMPOS, valores))
+        data['log_source'] = self.log_source
+        return data
+
+    def parsear_lote(self, lineas):
+        """Parsea una lista de líneas (o un trozo de bytes) en columnas, sin un dict por línea"""
+        if isinstance(lineas, (bytes, bytearray, memoryview)):
+            lineas = bytes(lineas).decode('utf-8', 'replace').splitlines()
+
+        filas = []
+        indices = []
+        campos = self.campos
+        for i, line in enumerate(lineas):
+            valores = campos(line)
+            if valores is not None:
+                filas.append(valores)
+                indices.append(i)
+
+        n = len(filas)
+        columnas_filas = list(zip(*filas)) if filas else [()] * len(CAMPOS)
+        columnas = {}
+        for campo, valores in zip(CAMPOS, columnas_filas):
+            if campo in CAMPOS_NUMERICOS:
+                columnas[campo] = np.fromiter(valores, dtype=np.int64, count=n)
+            else:
+                columnas[campo] = list(valores)
+        columnas['log_source'] = [self.log_source] * n
+        return LoteParseado(columnas, n, np.asarray(indices, dtype=np.int64), len(lineas) - n)
+
+
+_PARSER_COMBINED = ParserApache()
+
+
+def parse_apache_log(line):
+    """Parsea logs de Apache Combined Format (camino rápido + regex precompilada)"""
+    return _PARSER_COMBINED.parsear(line)
@@ -0,0 +1,457 @@
+import os
+import sys
+import time
+import zlib
+import queue
+import shutil
+import logging
+import tempfile
+import multiprocessing as mp
+from collections import deque
+
+# El modo multiproceso de prometheus_client se decide al importarlo: el
+# directorio de métricas tiene que existir (y estar limpio) antes de cualquier
+# import que registre métricas. Los workers lo heredan por el entorno.
+if __name__ == '__main__':
+    _dir_metricas = os.environ.setdefault(
+        'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'capturador_metricas')
+    )
+    shutil.rmtree(_dir_metricas, ignore_errors=True)
+    os.makedirs(_dir_metricas, exist_ok=True)
+
+import numpy as np
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, start_http_server, multiprocess
+from configuracion import (
+    LOG_FILE_PATH, LOG_FORMAT, SEGUIDOR_CHECKPOINT, MODEL_FILE, SCALER_FILE, ENCODERS_FILE,
+    INFLUXDB_URL, INFLUXDB_TOKEN, INFLUXDB_ORG, INFLUXDB_BUCKET,
+    INFLUX_TAMANO_LOTE, INFLUX_INTERVALO_MS, INFLUX_MAX_COLA, INFLUX_REINTENTOS,
+    INFLUX_POLITICA_COLA_LLENA, INFLUX_RUTA_DERRAME, INFLUX_AGREGACION, INFLUX_AGREGACION_INTERVALO,
+    INFLUX_AGREGACION_TOP_K,
+    TIMESTEPS, UMBRAL, UMBRAL_MODO, UMBRAL_SIGMAS, UMBRAL_PERCENTIL, UMBRAL_ALFA, UMBRAL_CALENTAMIENTO,
+    UMBRAL_ESTADO, TAMANO_LOTE, BACKEND_INFERENCIA, TOLERANCIA_BACKEND,
+    TAMANO_CACHE_VOCAB, CLAVE_VENTANA, MAX_CLAVES_VENTANA, PROMETHEUS_PORT, NUM_WORKERS,
+    BUCKETS_SCORE, VENTANAS_CUANTILES, CUANTILES_SCORE, PRECISION_CUANTILES,
+    configurar_logging, mostrar_configuracion
+)
+from parser_apache import ParserApache, FORMATO_COMBINED
+from seguidor_logs import SeguidorLog, escribir_checkpoint
+
+logger = logging.getLogger(__name__)
+
+# --- MÉTRICAS DEL PIPELINE ---
+LINEAS_WORKER = Counter('pipeline_lineas_total', 'Líneas procesadas por cada worker', ['worker'])
+PREDICCION_WORKER = Histogram(
+    'pipeline_prediccion_segundos',
+    'Duración de cada pasada del modelo en un worker',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+PENDIENTES_ORDEN = Gauge('pipeline_pendientes_orden', 'Resultados retenidos esperando su turno en el merger',
+                         multiprocess_mode='livemax')
+
+_LISTO = 'listo'
+# (_POSICION, n, posición): el log está leído hasta `posición` cuando se han entregado las n primeras líneas
+_POSICION = 'posicion'
+
+
+def configuracion_worker(n_workers=NUM_WORKERS, clave=CLAVE_VENTANA):
+    """Parámetros que necesita cada worker para cargar artefactos y puntuar"""
+    return {
+        'ruta_modelo': MODEL_FILE,
+        'ruta_scaler': SCALER_FILE,
+        'ruta_encoders': ENCODERS_FILE,
+        'timesteps': TIMESTEPS,
+        'backend': BACKEND_INFERENCIA,
+        'tolerancia': TOLERANCIA_BACKEND,
+        'tamano_cache_vocab': TAMANO_CACHE_VOCAB,
+        'tamano_lote': TAMANO_LOTE,
+        'max_claves': MAX_CLAVES_VENTANA,
+        'clave': clave,
+        'n_workers': n_workers,
+        'ruta_checkpoint': SEGUIDOR_CHECKPOINT or None,
+        'formato_log': LOG_FORMAT,
+    }
+
+
+def clave_de_linea(linea, clave, parser):
+    """Valor del campo de reparto; para 'ip' al inicio del formato basta con el primer token"""
+    if clave == 'ip' and parser.formato.startswith(('%h ', '%a ')):
+        return linea.split(' ', 1)[0]
+    parsed = parser.parsear(linea)
+    return str(parsed.get(clave, '')) if parsed else ''
+
+
+def shard_de(valor, n_workers):
+    """Worker asignado a un valor de la clave (estable entre procesos, a diferencia de hash())"""
+    return zlib.crc32(valor.encode('utf-8', 'replace')) % n_workers
+
+
+def ultimas_parseables(lineas, n, parser):
+    """Las últimas `n` líneas de `lineas` que `parser` acepta, en orden (solo se parsea desde el final)"""
+    validas = []
+    for linea in reversed(lineas):
+        if len(validas) == n:
+            break
+        if parser.parsear(linea):
+            validas.append(linea)
+    validas.reverse()
+    return validas
+
+
+def _lineas_fichero(ruta):
+    with open(ruta, 'r') as f:
+        yield from f
+
+
+def _lector(ruta, seguir, config, colas, salida, iniciar, tamano_bloque, espera_max_ms):
+    """Proceso lector: asigna un número de secuencia a cada línea y la reparte entre los workers.
+
+    Con CLAVE_VENTANA cada valor de la clave va siempre al mismo worker, que
+    mantiene su ventana. Con ventana global se reparten tramos consecutivos por
+    turnos y cada tramo lleva como contexto las TIMESTEPS - 1 últimas líneas
+    anteriores que se pueden parsear (las que habrían entrado en la ventana de
+    capturador.py, aunque antes haya una ráfaga de líneas inválidas), con las
+    que el worker rehace la ventana antes de puntuar.
+
+    El lector no guarda el checkpoint: envía al merger marcas `_POSICION` y
+    este lo guarda cuando ya ha entregado todas las líneas anteriores.
+    """
+    configurar_logging()
+    iniciar.wait()
+
+    n_workers = len(colas)
+    clave = config['clave']
+    parser = ParserApache(config.get('formato_log', FORMATO_COMBINED))
+    n_contexto = config['timesteps'] - 1
+    bloques = [[] for _ in range(n_workers)]
+    contexto = []
+    turno = 0
+    espera_max = espera_max_ms / 1000.0
+    ultimo_envio = time.monotonic()
+    seq = 0
+
+    def enviar(i):
+        nonlocal contexto, turno
+        bloque = bloques[i]
+        bloques[i] = []
+        if clave:
+            colas[i].put(([], bloque))
+            return
+        colas[turno].put((contexto, bloque))
+        turno = (turno + 1) % n_workers
+        if n_contexto:
+            # El contexto anterior ya es todo válido: solo se parsea el final del tramo
+            nuevas = ultimas_parseables([linea for _, linea in bloque], n_contexto, parser)
+            contexto = (contexto + nuevas)[-n_contexto:]
+
+    def vaciar():
+        for i, bloque in enumerate(bloques):
+            if bloque:
+                enviar(i)
+
+    seguidor = None
+    ultima_posicion = None
+
+    def marcar(contadas):
+        # Posición tras las `contadas` primeras líneas (el offset no incluye la línea en curso)
+        nonlocal ultima_posicion
+        if seguidor is None or not seguidor.ruta_checkpoint:
+            return
+        posicion = (contadas, seguidor.posicion())
+        if posicion != ultima_posicion:
+            salida.put((_POSICION,) + posicion)
+            ultima_posicion = posicion
+
+    if seguir:
+        seguidor = SeguidorLog(ruta, ruta_checkpoint=config.get('ruta_checkpoint'), guardar_checkpoints=False)
+        lineas = seguidor.lineas(ceder_inactivo=True)
+    else:
+        lineas = _lineas_fichero(ruta)
+
+    for linea in lineas:
+        if linea is not None:
+            i = shard_de(clave_de_linea(linea, clave, parser), n_workers) if clave else 0
+            bloques[i].append((seq, linea))
+            seq += 1
+            if len(bloques[i]) >= tamano_bloque:
+                enviar(i)
+                marcar(seq - 1)
+
+        ahora = time.monotonic()
+        if linea is None or ahora - ultimo_envio >= espera_max:
+            vaciar()
+            ultimo_envio = ahora
+            marcar(seq if linea is None else seq - 1)
+
+    vaciar()
+    for cola in colas:
+        cola.put(None)
+
+
+def _worker(indice, config, entrada, salida):
+    """Proceso worker: carga el modelo una vez y puntúa sus claves (o sus tramos) con ventanas propias"""
+    configurar_logging()
+    from artefactos import cargar_artefactos, preparar_backend
+    from inferencia import errores_reconstruccion
+    from ventana import VentanaAnillo, VentanasPorClave
+
+    timesteps = config['timesteps']
+    artefactos = cargar_artefactos(config['ruta_modelo'], config['ruta_scaler'], config['ruta_encoders'],
+                                   config['tamano_cache_vocab'])
+    backend = preparar_backend(config['backend'], artefactos, timesteps, config['tamano_lote'], config['tolerancia'])
+    pipeline = artefactos.pipeline
+    clave = config['clave']
+    parser = ParserApache(config.get('formato_log', FORMATO_COMBINED))
+    if clave:
+        ventanas = VentanasPorClave(timesteps, pipeline.n_features, config['max_claves'])
+    else:
+        ventana_global = VentanaAnillo(timesteps, pipeline.n_features)
+    secuencias = np.empty((config['tamano_lote'], timesteps, pipeline.n_features), dtype=np.float32)
+    diferencia = np.empty(secuencias.shape, dtype=np.float64)
+    lineas_worker = LINEAS_WORKER.labels(worker=str(indice))
+
+    salida.put((_LISTO, indice))
+    logger.info(f"[✓] Worker {indice} listo (pid {os.getpid()})")
+
+    while True:
+        mensaje = entrada.get()
+        if mensaje is None:
+            break
+        contexto, bloque = mensaje
+
+        if not clave:
+            # La ventana global se rehace con las líneas anteriores al tramo
+            ventana_global.reiniciar()
+            for linea in contexto:
+                try:
+                    parsed_data = parser.parsear(linea)
+                    if parsed_data:
+                        ventana_global.agregar(pipeline.transformar(parsed_data))
+                except Exception:
+                    pass
+
+        resultados = []
+        pendientes = []
+        for seq, linea in bloque:
+            try:
+                parsed_data = parser.parsear(linea)
+                if not parsed_data:
+                    resultados.append((seq, None, None))
+                    continue
+
+                ventana = ventanas.ventana(parsed_data.get(clave)) if clave else ventana_global
+                ventana.agregar(pipeline.transformar(parsed_data))
+                if not ventana.lleno:
+                    resultados.append((seq, None, None))
+                    continue
+
+                if len(pendientes) == len(secuencias):
+                    secuencias = np.concatenate([secuencias, np.empty_like(secuencias)])
+                    diferencia = np.empty(secuencias.shape, dtype=np.float64)
+                # La ventana se copia ya: la misma clave puede repetirse en el bloque
+                secuencias[len(pendientes)] = ventana.vista()
+                pendientes.append((seq, parsed_data))
+            except Exception as e:
+                logger.error(f"[!] Worker {indice}: error procesando log: {e}")
+                resultados.append((seq, None, None))
+
+        if pendientes:
+            n = len(pendientes)
+            try:
+                with PREDICCION_WORKER.time():
+                    reconstruccion = backend(secuencias[:n])
+                maes = errores_reconstruccion(reconstruccion, secuencias[:n], diferencia[:n])
+                resultados.extend((seq, float(mae), parsed_data) for (seq, parsed_data), mae in zip(pendientes, maes))
+            except Exception as e:
+                logger.error(f"[!] Worker {indice}: error puntuando lote de {n} ventanas: {e}")
+                resultados.extend((seq, None, None) for seq, _ in pendientes)
+
+        lineas_worker.inc(len(bloque))
+        salida.put(resultados)
+
+    salida.put(None)
+
+
+def _comprobar_procesos(procesos):
+    """Un proceso que muere deja líneas sin resultado y el merger esperándolas para siempre"""
+    for proceso in procesos:
+        if proceso.exitcode not in (None, 0):
+            raise RuntimeError(f"El proceso {proceso.name} terminó inesperadamente (código {proceso.exitcode})")
+
+
+def ejecutar_pipeline(ruta, al_puntuar, n_workers=NUM_WORKERS, clave=CLAVE_VENTANA, seguir=True,
+                      tamano_bloque=256, espera_max_ms=50.0, hilos_por_worker=1, config=None,
+                      al_puntuar_lote=None, checkpoint_cada=5.0):
+    """Lanza lector + N workers y entrega los scores a `al_puntuar(mae, parsed_data)`
+    en el orden original de las líneas (o, con `al_puntuar_lote`, los que quedan
+    en orden tras cada mensaje de un worker, de una vez: `(maes, contextos)`).
+
+    Siguiendo el log, el checkpoint se guarda cada `checkpoint_cada` segundos con
+    la posición de la última línea ya entregada. Si un worker o el lector mueren
+    lanza RuntimeError: al reiniciar se sigue desde esa posición.
+
+    Devuelve un dict con el número de líneas, de líneas puntuadas y los instantes
+    (time.monotonic) en que todos los workers quedaron listos y en que terminó.
+    """
+    config = dict(config or configuracion_worker(n_workers, clave))
+    config['clave'] = clave
+    ruta_checkpoint = config.get('ruta_checkpoint') if seguir else None
+    ctx = mp.get_context('spawn')
+
+    # Un hilo de cómputo por worker: el paralelismo lo dan los procesos
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS'):
+        os.environ[var] = str(hilos_por_worker)
+
+    entradas = [ctx.Queue(maxsize=64) for _ in range(n_workers)]
+    salida = ctx.Queue(maxsize=64 * n_workers)
+    iniciar = ctx.Event()
+
+    workers = [
+        ctx.Process(target=_worker, args=(i, config, entradas[i], salida), name=f'worker-{i}', daemon=True)
+        for i in range(n_workers)
+    ]
+    lector = ctx.Process(target=_lector, args=(ruta, seguir, config, entradas, salida, iniciar, tamano_bloque,
+                                               espera_max_ms),
+                         name='lector', daemon=True)
+    procesos = workers + [lector]
+    for proceso in procesos:
+        proceso.start()
+
+    estadisticas = {'lineas': 0, 'puntuadas': 0, 't_listo': None, 't_fin': None}
+    pendientes = {}
+    siguiente = 0
+    listos = 0
+    terminados = 0
+    # Marcas de posición del lector aún por alcanzar, y la última alcanzada
+    marcas = deque()
+    confirmada = guardada = None
+    ultimo_guardado = ultima_comprobacion = time.monotonic()
+    try:
+        while terminados < n_workers:
+            ahora = time.monotonic()
+            if ahora - ultima_comprobacion >= 1.0:
+                _comprobar_procesos(procesos)
+                ultima_comprobacion = ahora
+            try:
+                mensaje = salida.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if mensaje is None:
+                terminados += 1
+                continue
+            if isinstance(mensaje, tuple) and mensaje[0] == _LISTO:
+                listos += 1
+                if listos == n_workers:
+                    estadisticas['t_listo'] = time.monotonic()
+                    logger.info(f"[✓] {n_workers} workers listos, iniciando lectura de {ruta}")
+                    iniciar.set()
+                continue
+
+            if isinstance(mensaje, tuple) and mensaje[0] == _POSICION:
+                marcas.append(mensaje[1:])
+            else:
+                for seq, mae, parsed_data in mensaje:
+                    pendientes[seq] = (mae, parsed_data)
+
+                # Merger ordenado: solo se entrega el siguiente número de secuencia
+                maes, contextos = [], []
+                while siguiente in pendientes:
+                    mae, parsed_data = pendientes.pop(siguiente)
+                    siguiente += 1
+                    if mae is None:
+                        continue
+                    if al_puntuar_lote is not None:
+                        maes.append(mae)
+                        contextos.append(parsed_data)
+                    else:
+                        al_puntuar(mae, parsed_data)
+                    estadisticas['puntuadas'] += 1
+                if maes:
+                    al_puntuar_lote(np.asarray(maes), contextos)
+                PENDIENTES_ORDEN.set(len(pendientes))
+
+            # El checkpoint solo avanza hasta lo ya entregado
+            while marcas and marcas[0][0] <= siguiente:
+                confirmada = marcas.popleft()[1]
+            if ruta_checkpoint and confirmada is not guardada and time.monotonic() - ultimo_guardado >= checkpoint_cada:
+                escribir_checkpoint(ruta_checkpoint, confirmada)
+                guardada = confirmada
+                ultimo_guardado = time.monotonic()
+    finally:
+        if ruta_checkpoint and confirmada is not guardada:
+            escribir_checkpoint(ruta_checkpoint, confirmada)
+        if pendientes:
+            logger.warning(f"[!] {len(pendientes)} resultados sin entregar; se volverán a leer desde el checkpoint")
+        for proceso in procesos:
+            if proceso.is_alive():
+                proceso.terminate()
+            proceso.join(timeout=5)
+            if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+                multiprocess.mark_process_dead(proceso.pid)
+
+    estadisticas['lineas'] = siguiente
+    estadisticas['t_fin'] = time.monotonic()
+    return estadisticas
+
+
+if __name__ == '__main__':
+    configurar_logging()
+    mostrar_configuracion(logger)
+    logger.info(f"NUM_WORKERS: {NUM_WORKERS}")
+
+    from escritor_influx import conectar_escritor_influx
+    from resultados import RegistroResultados
+    from estadisticas_score import EstadisticasScore
+    from umbral_adaptativo import umbral_para_modelo
+    from agregacion import AgregadorInflux
+
+    escritor_influx = None
+    umbral = None
+    agregador = None
+    codigo_salida = 0
+    try:
+        # Exposición agregada de las métricas de todos los procesos
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        # La distribución de scores vive en este proceso (el que publica los resultados)
+        estadisticas = EstadisticasScore(BUCKETS_SCORE, VENTANAS_CUANTILES, CUANTILES_SCORE, PRECISION_CUANTILES)
+        registry.register(estadisticas)
+        umbral = umbral_para_modelo(MODEL_FILE, UMBRAL_MODO, UMBRAL, UMBRAL_ESTADO or None,
+                                    sigmas=UMBRAL_SIGMAS, percentil=UMBRAL_PERCENTIL, alfa=UMBRAL_ALFA,
+                                    calentamiento=UMBRAL_CALENTAMIENTO, precision=PRECISION_CUANTILES)
+        registry.register(umbral)
+        logger.info(f"[*] Iniciando servidor HTTP Prometheus en puerto {PROMETHEUS_PORT}...")
+        start_http_server(PROMETHEUS_PORT, registry=registry)
+        logger.info(f"[✓] Servidor Prometheus iniciado en http://0.0.0.0:{PROMETHEUS_PORT}")
+
+        escritor_influx = conectar_escritor_influx(
+            INFLUXDB_URL, INFLUXDB_TOKEN, INFLUXDB_ORG, INFLUXDB_BUCKET,
+            tamano_lote=INFLUX_TAMANO_LOTE,
+            intervalo_ms=INFLUX_INTERVALO_MS,
+            max_cola=INFLUX_MAX_COLA,
+            reintentos=INFLUX_REINTENTOS,
+            politica_cola_llena=INFLUX_POLITICA_COLA_LLENA,
+            ruta_derrame=INFLUX_RUTA_DERRAME
+        )
+        if INFLUX_AGREGACION and escritor_influx:
+            agregador = AgregadorInflux(escritor_influx, INFLUX_AGREGACION_INTERVALO, INFLUX_AGREGACION_TOP_K)
+            registry.register(agregador)
+        registro = RegistroResultados(umbral, escritor_influx, estadisticas, agregador=agregador)
+        ejecutar_pipeline(LOG_FILE_PATH, registro, al_puntuar_lote=registro.lote)
+
+    except KeyboardInterrupt:
+        logger.info("\n[*] Deteniendo pipeline...")
+    except Exception as e:
+        # P. ej. un worker muerto: lo ya puntuado se publica igualmente antes de salir
+        logger.error(f"[!] Error fatal: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+        codigo_salida = 1
+    finally:
+        if umbral:
+            umbral.guardar()
+        if agregador:
+            agregador.detener(timeout=5)
+        if escritor_influx:
+            escritor_influx.detener(timeout=10)
+    sys.exit(codigo_salida)
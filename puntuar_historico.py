@@ -0,0 +1,389 @@
+"""Puntuación offline de access logs históricos (rotados y/o comprimidos con gzip).
+
+Lee los ficheros en orden y por trozos, y para cada línea calcula el mismo
+score que habría dado el capturador en vivo. Se usan el mismo LogFormat, el
+mismo parser, las mismas tablas de codificación y escalado, la misma ventana
+(global o por CLAVE_VENTANA) y el mismo backend. Las ventanas se construyen en
+este proceso, en el orden original de las líneas, y la inferencia, que es la
+parte cara, se reparte en lotes grandes entre N procesos. Los scores se
+escriben por línea en CSV o Parquet y, opcionalmente, se cargan en InfluxDB
+con la hora de cada línea.
+
+Uso: python puntuar_historico.py /var/log/apache2/access.log* --salida scores.parquet [--workers 4] [--influx]
+"""
+import os
+import re
+import sys
+import gzip
+import time
+import logging
+import argparse
+import collections
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from configuracion import (
+    LOG_FORMAT, MODEL_FILE, SCALER_FILE, ENCODERS_FILE,
+    INFLUXDB_URL, INFLUXDB_TOKEN, INFLUXDB_ORG, INFLUXDB_BUCKET,
+    INFLUX_TAMANO_LOTE, INFLUX_INTERVALO_MS, INFLUX_MAX_COLA, INFLUX_REINTENTOS, INFLUX_RUTA_DERRAME,
+    TIMESTEPS, UMBRAL, UMBRAL_MODO, UMBRAL_SIGMAS, UMBRAL_PERCENTIL, UMBRAL_ALFA, UMBRAL_CALENTAMIENTO,
+    PRECISION_CUANTILES, TAMANO_LOTE, BACKEND_INFERENCIA, TOLERANCIA_BACKEND, TAMANO_CACHE_VOCAB,
+    CLAVE_VENTANA, MAX_CLAVES_VENTANA, NUM_WORKERS, configurar_logging
+)
+from parser_apache import ParserApache, CAMPOS
+from umbral_adaptativo import MODOS, umbral_para_modelo
+
+logger = logging.getLogger(__name__)
+
+FORMATO_FECHA_APACHE = '%d/%b/%Y:%H:%M:%S %z'
+
+
+# --- LECTURA ---
+def _numero_rotacion(ruta):
+    """N de access.log.N[.gz]; el fichero activo (sin número) es el más reciente"""
+    m = re.search(r'\.(\d+)(?:\.gz)?$', ruta)
+    return int(m.group(1)) if m else -1
+
+
+def ordenar_rotados(rutas):
+    """Del más antiguo al más reciente: access.log.9.gz ... access.log.1, access.log"""
+    return sorted(rutas, key=lambda ruta: (os.path.dirname(ruta), -_numero_rotacion(ruta)))
+
+
+def _abrir(ruta):
+    with open(ruta, 'rb') as f:
+        comprimido = f.read(2) == b'\x1f\x8b'
+    return gzip.open(ruta, 'rb') if comprimido else open(ruta, 'rb')
+
+
+def leer_trozos(rutas, tamano_trozo=50000, tamano_lectura=1 << 20):
+    """Produce (ruta, número de la primera línea, líneas) con hasta `tamano_trozo` líneas.
+
+    Las líneas se separan solo por '\\n' y se decodifican en UTF-8 con
+    reemplazo, igual que hace SeguidorLog con el fichero en vivo.
+    """
+    for ruta in rutas:
+        primera = 1
+        lineas = []
+        resto = b''
+        with _abrir(ruta) as f:
+            while True:
+                bloque = f.read(tamano_lectura)
+                if not bloque:
+                    break
+                bloque = resto + bloque
+                corte = bloque.rfind(b'\n')
+                if corte < 0:
+                    resto = bloque
+                    continue
+                resto = bloque[corte + 1:]
+                lineas.extend(bloque[:corte].decode('utf-8', 'replace').split('\n'))
+                while len(lineas) >= tamano_trozo:
+                    yield ruta, primera, lineas[:tamano_trozo]
+                    del lineas[:tamano_trozo]
+                    primera += tamano_trozo
+        if resto:
+            lineas.append(resto.decode('utf-8', 'replace'))
+        if lineas:
+            yield ruta, primera, lineas
+
+
+# --- INFERENCIA EN LOS WORKERS ---
+_ESTADO_WORKER = {}
+
+
+def _configuracion_worker(backend, tamano_lote):
+    return {
+        'ruta_modelo': MODEL_FILE,
+        'ruta_scaler': SCALER_FILE,
+        'ruta_encoders': ENCODERS_FILE,
+        'timesteps': TIMESTEPS,
+        'backend': backend,
+        'tolerancia': TOLERANCIA_BACKEND,
+        'tamano_cache_vocab': TAMANO_CACHE_VOCAB,
+        'tamano_lote': tamano_lote,
+    }
+
+
+def _cargar_backend(config):
+    from artefactos import cargar_artefactos, preparar_backend
+    artefactos = cargar_artefactos(config['ruta_modelo'], config['ruta_scaler'], config['ruta_encoders'],
+                                   config['tamano_cache_vocab'])
+    backend = preparar_backend(config['backend'], artefactos, config['timesteps'], config['tamano_lote'],
+                               config['tolerancia'])
+    return artefactos, backend
+
+
+def _iniciar_worker(config):
+    configurar_logging()
+    _, backend = _cargar_backend(config)
+    _ESTADO_WORKER.update(backend=backend, config=config)
+
+
+def puntuar_secuencias(backend, secuencias, tamano_lote):
+    """MAE de cada ventana de `secuencias` (n, TIMESTEPS, n_features), en lotes de `tamano_lote`"""
+    from inferencia import errores_reconstruccion
+    maes = np.empty(len(secuencias), dtype=np.float64)
+    for inicio in range(0, len(secuencias), tamano_lote):
+        lote = np.ascontiguousarray(secuencias[inicio:inicio + tamano_lote])
+        maes[inicio:inicio + len(lote)] = errores_reconstruccion(backend(lote), lote)
+    return maes
+
+
+def _tarea(datos, son_filas):
+    """En un worker: `datos` son ventanas ya formadas o filas consecutivas de la ventana global"""
+    config = _ESTADO_WORKER['config']
+    if son_filas:
+        datos = sliding_window_view(datos, config['timesteps'], axis=0).transpose(0, 2, 1)
+    return puntuar_secuencias(_ESTADO_WORKER['backend'], datos, config['tamano_lote'])
+
+
+# --- SALIDA ---
+class SalidaCSV:
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._primera = True
+
+    def escribir(self, df):
+        # %.17g: el score se relee exactamente igual que se calculó
+        df.to_csv(self.ruta, mode='w' if self._primera else 'a', header=self._primera, index=False,
+                  float_format='%.17g')
+        self._primera = False
+
+    def cerrar(self):
+        if self._primera:
+            pd.DataFrame(columns=COLUMNAS_SALIDA).to_csv(self.ruta, index=False)
+
+
+class SalidaParquet:
+    """Un row group por trozo; requiere pyarrow"""
+
+    def __init__(self, ruta):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("La salida Parquet requiere pyarrow (pip install pyarrow)")
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.ruta = ruta
+        self._escritor = None
+
+    def escribir(self, df):
+        if self._escritor is None:
+            tabla = self._pa.Table.from_pandas(df, preserve_index=False)
+            self._escritor = self._pq.ParquetWriter(self.ruta, tabla.schema)
+        else:
+            tabla = self._pa.Table.from_pandas(df, schema=self._escritor.schema, preserve_index=False)
+        self._escritor.write_table(tabla)
+
+    def cerrar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+
+
+def abrir_salida(ruta, formato=None):
+    formato = formato or ('parquet' if ruta.endswith(('.parquet', '.pq')) else 'csv')
+    return SalidaParquet(ruta) if formato == 'parquet' else SalidaCSV(ruta)
+
+
+COLUMNAS_SALIDA = ['fichero', 'linea', 'tiempo'] + list(CAMPOS) + ['log_source', 'score', 'es_anomalia']
+
+
+# --- PUNTUACIÓN ---
+class PuntuadorHistorico:
+    """Ventanas en el orden de las líneas (como capturador.procesar_log) e inferencia en paralelo.
+
+    `umbral` es un número o un UmbralAdaptativo; este último se aplica en
+    tramos de TAMANO_LOTE scores, como los lotes del motor en vivo.
+    """
+
+    def __init__(self, formato_log=LOG_FORMAT, clave=CLAVE_VENTANA, n_workers=NUM_WORKERS,
+                 backend=BACKEND_INFERENCIA, tamano_lote=4096, max_claves=MAX_CLAVES_VENTANA,
+                 umbral=UMBRAL, en_vuelo=None):
+        from ventana import VentanasPorClave
+
+        self.parser = ParserApache(formato_log)
+        self.clave = clave
+        self.umbral = umbral
+        self.n_workers = n_workers
+        self.tamano_lote = tamano_lote
+        self.en_vuelo = en_vuelo or 2 * max(1, n_workers)
+        config = _configuracion_worker(backend, tamano_lote)
+
+        artefactos, backend_local = _cargar_backend(config) if n_workers == 0 else (None, None)
+        if artefactos is None:
+            from artefactos import cargar_artefactos
+            artefactos = cargar_artefactos(MODEL_FILE, SCALER_FILE, ENCODERS_FILE, TAMANO_CACHE_VOCAB)
+        self.pipeline = artefactos.pipeline
+        self._backend_local = backend_local
+        n_features = self.pipeline.n_features
+
+        # Estado de las ventanas entre trozos y ficheros, como en el capturador en marcha
+        if clave:
+            self.ventanas = VentanasPorClave(TIMESTEPS, n_features, max_claves)
+        else:
+            self.cola = np.empty((0, n_features), dtype=np.float32)
+
+        self._pool = None
+        if n_workers > 0:
+            # Un hilo de cómputo por worker: el paralelismo lo dan los procesos
+            for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                        'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS'):
+                os.environ[var] = '1'
+            self._pool = ProcessPoolExecutor(n_workers, mp_context=mp.get_context('spawn'),
+                                             initializer=_iniciar_worker, initargs=(config,))
+
+    def _ventanas_trozo(self, lote, filas):
+        """(datos, son_filas, posiciones en el lote de las líneas que reciben score)"""
+        if not self.clave:
+            datos = np.concatenate([self.cola, filas])
+            self.cola = datos[max(0, len(datos) - (TIMESTEPS - 1)):].copy()
+            # La línea j del lote cierra una ventana si hay TIMESTEPS filas hasta ella
+            primera = max(0, TIMESTEPS - (len(datos) - lote.n) - 1)
+            return datos, True, np.arange(primera, lote.n)
+
+        secuencias = np.empty((lote.n, TIMESTEPS, filas.shape[1]), dtype=filas.dtype)
+        posiciones = []
+        claves = lote.columnas[self.clave] if self.clave in lote.columnas else [None] * lote.n
+        for j in range(lote.n):
+            ventana = self.ventanas.ventana(claves[j])
+            ventana.reservar()[...] = filas[j]
+            if ventana.lleno:
+                secuencias[len(posiciones)] = ventana.vista()
+                posiciones.append(j)
+        return secuencias[:len(posiciones)], False, np.asarray(posiciones, dtype=np.int64)
+
+    def _enviar(self, datos, son_filas):
+        if self._pool is not None:
+            return self._pool.submit(_tarea, datos, son_filas)
+        if son_filas:
+            datos = sliding_window_view(datos, TIMESTEPS, axis=0).transpose(0, 2, 1)
+        return puntuar_secuencias(self._backend_local, datos, self.tamano_lote)
+
+    def _resultado(self, ruta, primera, lote, posiciones, maes):
+        df = pd.DataFrame({'fichero': ruta, 'linea': primera + lote.indices[posiciones]})
+        for campo, valores in lote.columnas.items():
+            df[campo] = np.asarray(valores, dtype=None if isinstance(valores, np.ndarray) else object)[posiciones]
+        df['tiempo'] = pd.to_datetime(df['timestamp'], format=FORMATO_FECHA_APACHE, errors='coerce', utc=True)
+        df['score'] = maes
+        df['es_anomalia'] = self._marcar(maes)
+        return df[COLUMNAS_SALIDA]
+
+    def _marcar(self, maes):
+        if not hasattr(self.umbral, 'evaluar'):
+            return maes > self.umbral
+        if not len(maes):
+            return np.zeros(0, dtype=bool)
+        return np.concatenate([self.umbral.evaluar(maes[i:i + TAMANO_LOTE]) for i in range(0, len(maes), TAMANO_LOTE)])
+
+    def puntuar(self, trozos):
+        """Produce un DataFrame por trozo con las líneas puntuadas, en el orden de entrada"""
+        pendientes = collections.deque()
+        self.lineas = self.fallidas = 0
+        for ruta, primera, lineas in trozos:
+            lote = self.parser.parsear_lote(lineas)
+            self.lineas += len(lineas)
+            self.fallidas += lote.fallidas
+            if lote.n == 0:
+                continue
+            filas = self.pipeline.transformar_columnas(lote.columnas, lote.n)
+            datos, son_filas, posiciones = self._ventanas_trozo(lote, filas)
+            if not len(posiciones):
+                continue
+            pendientes.append((ruta, primera, lote, posiciones, self._enviar(datos, son_filas)))
+
+            # Como mucho `en_vuelo` trozos a la vez: la memoria no crece con el tamaño de los logs
+            while len(pendientes) > self.en_vuelo or (pendientes and self._pool is None):
+                ruta_p, primera_p, lote_p, posiciones_p, maes = pendientes.popleft()
+                yield self._resultado(ruta_p, primera_p, lote_p, posiciones_p,
+                                      maes.result() if self._pool is not None else maes)
+
+        while pendientes:
+            ruta_p, primera_p, lote_p, posiciones_p, futuro = pendientes.popleft()
+            yield self._resultado(ruta_p, primera_p, lote_p, posiciones_p, futuro.result())
+
+    def cerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+
+
+def cargar_en_influx(escritor, df):
+    """Backfill de un trozo de resultados, con la hora de cada línea (o la actual si no se pudo leer)"""
+    from resultados import punto_influx
+    for registro, tiempo in zip(df.to_dict('records'), df['tiempo']):
+        tiempo_ns = None if pd.isna(tiempo) else tiempo.value
+        escritor.escribir(punto_influx(registro['score'], registro, registro['es_anomalia'], tiempo_ns), bloquear=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Puntuación offline de access logs históricos (.gz incluidos)')
+    parser.add_argument('rutas', nargs='+', help='Ficheros de log (access.log, access.log.1, access.log.2.gz...)')
+    parser.add_argument('--salida', default='scores.csv', help='Fichero de resultados (.csv o .parquet)')
+    parser.add_argument('--formato', choices=('csv', 'parquet'), default=None,
+                        help='Por defecto, según la extensión de --salida')
+    parser.add_argument('--sin-ordenar', action='store_true',
+                        help='Procesar en el orden dado (por defecto, del fichero rotado más antiguo al activo)')
+    parser.add_argument('--workers', type=int, default=NUM_WORKERS,
+                        help='Procesos de inferencia (0: todo en este proceso)')
+    parser.add_argument('--clave', default=CLAVE_VENTANA, help='Campo de ventana por clave (vacío: ventana global)')
+    parser.add_argument('--formato-log', default=LOG_FORMAT)
+    parser.add_argument('--backend', default=BACKEND_INFERENCIA)
+    parser.add_argument('--tamano-trozo', type=int, default=50000, help='Líneas por trozo')
+    parser.add_argument('--lote', type=int, default=4096, help='Ventanas por pasada del modelo')
+    parser.add_argument('--influx', action='store_true', help='Cargar también los scores en InfluxDB')
+    parser.add_argument('--umbral-modo', choices=MODOS, default=UMBRAL_MODO,
+                        help='Umbral fijo o adaptativo (arranca con las estadísticas de validación; no guarda estado)')
+    args = parser.parse_args()
+
+    configurar_logging()
+    rutas = args.rutas if args.sin_ordenar else ordenar_rotados(args.rutas)
+    logger.info(f"[*] {len(rutas)} ficheros: {', '.join(rutas)}")
+    logger.info(f"[*] Ventana {'por ' + args.clave if args.clave else 'global'}, backend '{args.backend}', "
+                f"{args.workers} workers")
+
+    escritor_influx = None
+    if args.influx:
+        from escritor_influx import conectar_escritor_influx
+        escritor_influx = conectar_escritor_influx(
+            INFLUXDB_URL, INFLUXDB_TOKEN, INFLUXDB_ORG, INFLUXDB_BUCKET,
+            tamano_lote=INFLUX_TAMANO_LOTE, intervalo_ms=INFLUX_INTERVALO_MS, max_cola=INFLUX_MAX_COLA,
+            reintentos=INFLUX_REINTENTOS, politica_cola_llena='disco', ruta_derrame=INFLUX_RUTA_DERRAME
+        )
+        if escritor_influx is None:
+            logger.error("[!] Sin conexión con InfluxDB: se escriben solo los resultados a fichero")
+
+    salida = abrir_salida(args.salida, args.formato)
+    umbral = umbral_para_modelo(MODEL_FILE, args.umbral_modo, UMBRAL, sigmas=UMBRAL_SIGMAS,
+                                percentil=UMBRAL_PERCENTIL, alfa=UMBRAL_ALFA,
+                                calentamiento=UMBRAL_CALENTAMIENTO, precision=PRECISION_CUANTILES)
+    puntuador = PuntuadorHistorico(args.formato_log, args.clave, args.workers, args.backend, args.lote,
+                                   umbral=umbral)
+    inicio = time.perf_counter()
+    puntuadas = anomalias = 0
+    try:
+        for df in puntuador.puntuar(leer_trozos(rutas, args.tamano_trozo)):
+            salida.escribir(df)
+            if escritor_influx:
+                cargar_en_influx(escritor_influx, df)
+            puntuadas += len(df)
+            anomalias += int(df['es_anomalia'].sum())
+            segundos = time.perf_counter() - inicio
+            logger.info(f"[*] {puntuador.lineas} líneas leídas, {puntuadas} puntuadas "
+                        f"({puntuador.lineas / segundos:.0f} líneas/s) - {df['fichero'].iloc[-1]}")
+    finally:
+        salida.cerrar()
+        puntuador.cerrar()
+        if escritor_influx:
+            escritor_influx.detener()
+
+    segundos = time.perf_counter() - inicio
+    logger.info(f"[✓] {puntuador.lineas} líneas en {segundos:.1f}s ({puntuador.lineas / segundos:.0f} líneas/s)")
+    logger.info(f"    Puntuadas: {puntuadas} | Sin parsear: {puntuador.fallidas} | Anomalías: {anomalias}")
+    logger.info(f"    Resultados en '{args.salida}'")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,302 @@
+"""Recarga en caliente de modelo, scaler y encoders desde un directorio versionado.
+
+MODELOS_DIR tiene un subdirectorio por versión (`20261017-1200/`, `v3/`...)
+con un `.h5`, un `scaler*.joblib` y un `encoders*.joblib` (y, si existe, el
+`*_umbral.json` del modelo). Para publicar una versión se copia a un
+directorio oculto (`.v4.tmp`) y se renombra: los nombres que empiezan por
+punto se ignoran.
+
+Un hilo revisa el directorio cada `revision` segundos. Si aparece una versión
+posterior (orden natural del nombre) a la última intentada, la prepara en
+segundo plano: carga los artefactos, crea y calienta el backend y comprueba
+que las características coinciden con las actuales y que el modelo acepta y
+devuelve ventanas (TIMESTEPS, n_features). Solo entonces la entrega al
+capturador, que la cambia entre dos lotes (ver `Capturador.aplicar_conjunto`);
+las ventanas deslizantes se conservan. Una versión que falla queda descartada.
+
+`revertir()` vuelve al conjunto anterior: con SIGUSR2 o, si se activa el puerto
+de control (`servir_control`, en 127.0.0.1 por defecto y con token opcional),
+con `POST /modelo/revertir`. El puerto de métricas es de solo lectura: `/metrics`
+y `GET /modelo`, que devuelve el estado. Todas las métricas llevan la etiqueta
+`modelo_version` (`ColectorVersionado`).
+"""
+import os
+import re
+import hmac
+import glob
+import json
+import signal
+import ipaddress
+import logging
+import threading
+from collections import namedtuple
+from wsgiref.simple_server import make_server, WSGIRequestHandler
+import numpy as np
+from prometheus_client import Counter, make_wsgi_app
+from prometheus_client.exposition import ThreadingWSGIServer
+from prometheus_client.metrics_core import Metric
+
+logger = logging.getLogger(__name__)
+
+RECARGAS = Counter('modelo_recargas', 'Cambios de conjunto de modelo', ['resultado'])
+
+RutasModelo = namedtuple('RutasModelo', ['version', 'modelo', 'scaler', 'encoders'])
+# Lo que cambia de golpe al pasar a otra versión
+ConjuntoModelo = namedtuple('ConjuntoModelo', ['version', 'artefactos', 'backend', 'umbral', 'cascada'])
+
+
+def _orden(version):
+    """Orden natural: v10 va después de v9"""
+    return [(0, int(parte), '') if parte.isdigit() else (1, 0, parte) for parte in re.split(r'(\d+)', version)]
+
+
+def versiones_disponibles(directorio):
+    """{versión: RutasModelo} de los subdirectorios con los tres artefactos"""
+    versiones = {}
+    try:
+        nombres = os.listdir(directorio)
+    except OSError:
+        return versiones
+    for nombre in nombres:
+        ruta = os.path.join(directorio, nombre)
+        if nombre.startswith('.') or not os.path.isdir(ruta):
+            continue
+        modelos = glob.glob(os.path.join(ruta, '*.h5'))
+        scalers = glob.glob(os.path.join(ruta, 'scaler*.joblib'))
+        encoders = glob.glob(os.path.join(ruta, 'encoders*.joblib'))
+        if len(modelos) == len(scalers) == len(encoders) == 1:
+            versiones[nombre] = RutasModelo(nombre, modelos[0], scalers[0], encoders[0])
+    return versiones
+
+
+def ultima_version(directorio):
+    """RutasModelo de la versión más reciente, o None si no hay ninguna completa"""
+    versiones = versiones_disponibles(directorio)
+    return versiones[max(versiones, key=_orden)] if versiones else None
+
+
+def validar_conjunto(artefactos, backend, feature_names, timesteps):
+    """Lanza ValueError si el conjunto nuevo no puede sustituir al actual"""
+    if list(artefactos.feature_names) != list(feature_names):
+        raise ValueError(f"Características distintas: {artefactos.feature_names} (actuales: {list(feature_names)})")
+    forma = (1, timesteps, len(feature_names))
+    salida = np.asarray(backend(np.zeros(forma, dtype=np.float32)))
+    if salida.shape != forma:
+        raise ValueError(f"El modelo devuelve {salida.shape} para una ventana {forma}")
+    if not np.isfinite(salida).all():
+        raise ValueError("El modelo devuelve valores no finitos")
+
+
+class ColectorVersionado:
+    """Las métricas de `registro` con la etiqueta `modelo_version` añadida a cada muestra"""
+
+    def __init__(self, registro, version):
+        self.registro = registro
+        # Función que devuelve la versión vigente
+        self.version = version
+
+    def collect(self):
+        version = self.version()
+        for familia in self.registro.collect():
+            copia = Metric(familia.name, familia.documentation, familia.type, familia.unit)
+            for muestra in familia.samples:
+                copia.add_sample(muestra.name, {**muestra.labels, 'modelo_version': version}, muestra.value,
+                                 muestra.timestamp, muestra.exemplar)
+            yield copia
+
+
+class ColectorDelegado:
+    """Colector que expone el de `obtener()` en cada lectura (p. ej. el umbral del conjunto vigente)"""
+
+    def __init__(self, obtener):
+        self.obtener = obtener
+
+    def collect(self):
+        yield from self.obtener().collect()
+
+
+class _ManejadorSilencioso(WSGIRequestHandler):
+    def log_message(self, formato, *args):
+        pass
+
+
+class Recargador:
+    """Vigila `directorio` y cambia el conjunto de modelo del capturador.
+
+    `preparar(rutas)` construye un ConjuntoModelo listo (o lanza una
+    excepción) y `aplicar(conjunto)` lo entrega al capturador; los dos se fijan
+    con `iniciar`, una vez arrancado. `version` puede leerse desde cualquier hilo.
+    """
+
+    def __init__(self, directorio, revision=30.0, version=''):
+        self.directorio = directorio
+        self.revision = max(1.0, float(revision))
+        self.version = version
+        self.actual = None
+        self.anterior = None
+        self.ultimo_error = None
+        self._referencia = version if version in versiones_disponibles(directorio) else None
+        self._preparar = None
+        self._aplicar = None
+        self._lock = threading.Lock()
+        self._detenido = threading.Event()
+        self._hilo = None
+
+    def iniciar(self, conjunto, preparar, aplicar):
+        self.actual = conjunto
+        self.version = conjunto.version
+        self._preparar = preparar
+        self._aplicar = aplicar
+        self._hilo = threading.Thread(target=self._bucle, name='recarga-modelo', daemon=True)
+        self._hilo.start()
+        logger.info(f"[✓] Versión de modelo '{self.version}'; revisando {self.directorio} cada {self.revision:g}s")
+
+    def _bucle(self):
+        while not self._detenido.wait(self.revision):
+            try:
+                self.revisar()
+            except Exception as e:
+                logger.error(f"[!] Error revisando {self.directorio}: {e}")
+
+    def revisar(self):
+        """Prepara y aplica la versión más reciente si es posterior a la última intentada"""
+        versiones = versiones_disponibles(self.directorio)
+        candidatas = [v for v in versiones if self._referencia is None or _orden(v) > _orden(self._referencia)]
+        if not candidatas:
+            return False
+        version = max(candidatas, key=_orden)
+        self._referencia = version
+
+        logger.info(f"[*] Preparando la versión de modelo '{version}'...")
+        try:
+            conjunto = self._preparar(versiones[version])
+        except Exception as e:
+            self.ultimo_error = f"{version}: {e}"
+            RECARGAS.labels(resultado='error').inc()
+            logger.error(f"[!] Versión '{version}' descartada: {e}")
+            return False
+
+        with self._lock:
+            self.anterior, self.actual = self.actual, conjunto
+            self.version = version
+            self.ultimo_error = None
+            self._aplicar(conjunto)
+        RECARGAS.labels(resultado='cargada').inc()
+        logger.info(f"[✓] Versión de modelo '{version}' en uso (anterior: '{self.anterior.version}')")
+        return True
+
+    def revertir(self):
+        """Vuelve al conjunto anterior; False si no hay"""
+        with self._lock:
+            if self.anterior is None:
+                logger.warning("[!] No hay versión anterior a la que volver")
+                return False
+            self.anterior, self.actual = self.actual, self.anterior
+            self.version = self.actual.version
+            self._aplicar(self.actual)
+        RECARGAS.labels(resultado='revertida').inc()
+        logger.warning(f"[*] Vuelta a la versión de modelo '{self.version}' (descartada: '{self.anterior.version}')")
+        return True
+
+    def sustituir(self, viejo, nuevo):
+        """Pone `nuevo` donde esté `viejo` (actual o anterior) y lo aplica si es el actual;
+        False si `viejo` ya no está en ninguno de los dos"""
+        with self._lock:
+            if self.actual is viejo:
+                self.actual = nuevo
+                self._aplicar(nuevo)
+            elif self.anterior is viejo:
+                self.anterior = nuevo
+            else:
+                return False
+        return True
+
+    def estado(self):
+        return {
+            'version': self.version,
+            'anterior': self.anterior.version if self.anterior is not None else None,
+            'directorio': self.directorio,
+            'ultimo_error': self.ultimo_error,
+        }
+
+    def instalar(self, senal=signal.SIGUSR2):
+        signal.signal(senal, self._al_recibir)
+        logger.info(f"[*] Recarga de modelo: 'kill -{signal.Signals(senal).name[3:]} {os.getpid()}' "
+                    f"vuelve a la versión anterior")
+
+    def _al_recibir(self, signum, frame):
+        # Fuera del manejador: el hilo principal podría estar dentro de aplicar()
+        threading.Thread(target=self.revertir, name='revertir-modelo', daemon=True).start()
+
+    def detener(self):
+        self._detenido.set()
+
+    def _responder(self, start_response, estado, datos=None):
+        cuerpo = json.dumps(self.estado() if datos is None else datos).encode('utf-8')
+        start_response(estado, [('Content-Type', 'application/json'), ('Content-Length', str(len(cuerpo)))])
+        return [cuerpo]
+
+    def app(self, app_metricas):
+        """Aplicación WSGI de solo lectura para el puerto de métricas: GET /modelo; el resto, las métricas"""
+        def aplicacion(environ, start_response):
+            ruta = environ.get('PATH_INFO', '')
+            if ruta == '/modelo/revertir':
+                return self._responder(start_response, '404 Not Found',
+                                       {'error': 'revertir solo está disponible en el puerto de control'})
+            if ruta != '/modelo':
+                return app_metricas(environ, start_response)
+            if environ.get('REQUEST_METHOD') not in ('GET', 'HEAD'):
+                return self._responder(start_response, '405 Method Not Allowed')
+            return self._responder(start_response, '200 OK')
+        return aplicacion
+
+    def app_control(self, token=''):
+        """Aplicación WSGI del puerto de control: GET /modelo y POST /modelo/revertir.
+
+        Con `token`, cada petición debe llevar `Authorization: Bearer <token>`.
+        """
+        esperado = f"Bearer {token}".encode('utf-8')
+
+        def aplicacion(environ, start_response):
+            ruta = environ.get('PATH_INFO', '')
+            if ruta not in ('/modelo', '/modelo/revertir'):
+                return self._responder(start_response, '404 Not Found', {'error': 'ruta desconocida'})
+            if token and not hmac.compare_digest(environ.get('HTTP_AUTHORIZATION', '').encode('utf-8'), esperado):
+                return self._responder(start_response, '401 Unauthorized', {'error': 'token incorrecto'})
+
+            estado = '200 OK'
+            if ruta == '/modelo/revertir':
+                if environ.get('REQUEST_METHOD') != 'POST':
+                    estado = '405 Method Not Allowed'
+                elif self._aplicar is None or not self.revertir():
+                    estado = '409 Conflict'
+            return self._responder(start_response, estado)
+        return aplicacion
+
+
+def _es_local(host):
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == 'localhost'
+
+
+def _servir(host, puerto, aplicacion, nombre):
+    servidor = make_server(host, puerto, aplicacion, ThreadingWSGIServer, handler_class=_ManejadorSilencioso)
+    threading.Thread(target=servidor.serve_forever, name=nombre, daemon=True).start()
+    return servidor
+
+
+def servir_metricas(puerto, registro, recargador):
+    """Como `start_http_server`, con el estado de `recargador` (solo lectura) en el mismo puerto"""
+    return _servir('0.0.0.0', puerto, recargador.app(make_wsgi_app(registro)), 'servidor-metricas')
+
+
+def servir_control(host, puerto, recargador, token=''):
+    """Puerto de control (revertir el modelo); fuera de la interfaz local exige token"""
+    if not token and not _es_local(host):
+        raise ValueError(f"El puerto de control en {host} necesita MODELOS_CONTROL_TOKEN")
+    servidor = _servir(host, puerto, recargador.app_control(token), 'servidor-control')
+    logger.info(f"[✓] Control del modelo en http://{host}:{servidor.server_port}/modelo/revertir"
+                f"{' (con token)' if token else ''}")
+    return servidor
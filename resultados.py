@@ -0,0 +1,99 @@
+import time
+import logging
+import numpy as np
+from prometheus_client import Counter
+from influxdb_client import Point, WritePrecision
+from atribucion import formatear_causas
+
+logger = logging.getLogger(__name__)
+
+# --- MÉTRICAS PROMETHEUS ---
+# Distribución de scores y anomalías por etiqueta: ver estadisticas_score.py
+PAQUETES_PROCESADOS = Counter('logs_procesados_total', 'Total de líneas de log analizadas')
+
+
+def punto_influx(mae, parsed_data, es_anomalia, tiempo_ns=None, causas=None):
+    """Punto 'web_traffic' de una línea puntuada; por defecto con la hora actual"""
+    punto = Point("web_traffic") \
+        .tag("ip", str(parsed_data['ip'])) \
+        .tag("method", str(parsed_data['method'])) \
+        .tag("status", str(parsed_data['status_code'])) \
+        .field("score_anomalia", float(mae)) \
+        .field("is_anomaly", int(es_anomalia)) \
+        .field("response_size", int(parsed_data['response_size'])) \
+        .field("url", str(parsed_data['url'])) \
+        .time(time.time_ns() if tiempo_ns is None else tiempo_ns, WritePrecision.NS)
+    if causas is not None:
+        punto.field("causa_principal", causas.principales[0][0]) \
+            .field("causas", formatear_causas(causas)) \
+            .field("paso_max_error", causas.paso)
+    return punto
+
+
+class RegistroResultados:
+    """Publica el score de una línea en Prometheus, el log y InfluxDB.
+
+    `umbral` es un número fijo o un UmbralAdaptativo; con este último conviene
+    entregar los scores por lotes (`lote`) para marcarlos de una vez. Con
+    `atribucion` (ver atribucion.py) y los errores del lote, cada anomalía
+    lleva sus causas principales. Con `agregador` (ver agregacion.py) solo
+    las anomalías se escriben en InfluxDB como punto completo.
+    """
+
+    def __init__(self, umbral, escritor_influx=None, estadisticas=None, atribucion=None, agregador=None):
+        self.umbral = umbral
+        self._evaluar = getattr(umbral, 'evaluar', None)
+        self.escritor_influx = escritor_influx
+        self.estadisticas = estadisticas
+        self.atribucion = atribucion
+        self.agregador = agregador
+        # Última línea puntuada, para medir el retraso respecto al log
+        self.ultima_linea = None
+
+    def cambiar_umbral(self, umbral):
+        """Umbral de otro modelo (recarga en caliente); llamar desde el hilo que publica"""
+        self.umbral = umbral
+        self._evaluar = getattr(umbral, 'evaluar', None)
+
+    def lote(self, maes, contextos, diferencias=None, actualizar_umbral=None):
+        """Marca un lote de scores con el umbral vigente, publica cada línea y devuelve las marcas.
+
+        `diferencias` es el |error| (n, TIMESTEPS, n_features) del que salen los
+        MAE; `actualizar_umbral`, una máscara de los scores que alimentan al
+        umbral adaptativo (por defecto, todos).
+        """
+        if self._evaluar is not None:
+            anomalias = self._evaluar(maes, actualizar_umbral)
+        else:
+            anomalias = np.asarray(maes) > self.umbral
+        causas = {}
+        if self.atribucion is not None and diferencias is not None:
+            causas = self.atribucion.lote(diferencias, anomalias)
+        for i, (mae, parsed_data, es_anomalia) in enumerate(zip(maes, contextos, anomalias)):
+            self(mae, parsed_data, bool(es_anomalia), causas.get(i) if causas else None)
+        return anomalias
+
+    def __call__(self, mae, parsed_data, es_anomalia=None, causas=None):
+        if es_anomalia is None:
+            es_anomalia = bool(self._evaluar((mae,))[0]) if self._evaluar is not None else mae > self.umbral
+        self.ultima_linea = parsed_data
+
+        # Métricas
+        PAQUETES_PROCESADOS.inc()
+        if self.estadisticas is not None:
+            self.estadisticas.registrar(mae, es_anomalia, parsed_data)
+
+        if es_anomalia:
+            detalle = f" Causas={formatear_causas(causas)} Paso={causas.paso}" if causas is not None else ''
+            logger.warning(f"🚨 ANOMALÍA: IP={parsed_data['ip']} URL={parsed_data['url']} Score={mae:.4f}{detalle}")
+
+        # Enviar a InfluxDB
+        if self.agregador is not None:
+            self.agregador.registrar(mae, parsed_data, es_anomalia)
+            if not es_anomalia:
+                return
+        if self.escritor_influx:
+            try:
+                self.escritor_influx.escribir(punto_influx(mae, parsed_data, es_anomalia, causas=causas))
+            except Exception as e:
+                logger.error(f"Error escribiendo a InfluxDB: {e}")
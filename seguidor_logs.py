@@ -0,0 +1,368 @@
+import os
+import sys
+import json
+import time
+import select
+import logging
+import ctypes
+import ctypes.util
+
+logger = logging.getLogger(__name__)
+
+
+def escribir_checkpoint(ruta_checkpoint, posicion):
+    """Escribe la posición (ver `SeguidorLog.posicion`) de forma atómica"""
+    temporal = ruta_checkpoint + '.tmp'
+    with open(temporal, 'w') as f:
+        json.dump(posicion, f)
+    os.replace(temporal, ruta_checkpoint)
+
+
+class _Inotify:
+    """Envoltorio mínimo de inotify(7) vía ctypes (solo Linux)"""
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 falló')
+        self._vigilados = {}
+
+    def vigilar(self, ruta, mascara):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(ruta), mascara)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f'inotify_add_watch falló para {ruta}')
+        anterior = self._vigilados.get(ruta)
+        if anterior is not None and anterior != wd:
+            self._libc.inotify_rm_watch(self.fd, anterior)
+        self._vigilados[ruta] = wd
+
+    def esperar(self, timeout):
+        """Bloquea hasta que haya eventos o pase `timeout`; descarta los eventos leídos"""
+        listos, _, _ = select.select([self.fd], [], [], timeout)
+        if not listos:
+            return False
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def cerrar(self):
+        os.close(self.fd)
+
+
+class SeguidorLog:
+    """Sigue un fichero de log como `tail -F`, resistente a logrotate.
+
+    - Espera con inotify en Linux y, si no está disponible, con sondeo adaptativo
+      (el intervalo crece mientras no hay datos y vuelve al mínimo al llegar alguno).
+    - Lee bloques grandes en un buffer reutilizable y los parte en líneas en
+      memoria, sin una llamada al sistema por línea. Cada lectura devuelve
+      como mucho un buffer de líneas, así que ir muy por detrás (checkpoint
+      antiguo, `desde_inicio`) no carga el fichero entero en memoria.
+    - Detecta rotación (cambio de inodo: termina el fichero antiguo y abre el
+      nuevo desde el principio) y truncado (tamaño menor que el offset).
+    - Guarda periódicamente (inodo, offset) en `ruta_checkpoint` para que un
+      reinicio continúe en la siguiente línea sin perder ni repetir. Con
+      `guardar_checkpoints=False` solo lo lee al abrir: lo escribe quien sabe
+      qué líneas están ya procesadas (ver pipeline_multiproceso.py).
+    """
+
+    def __init__(self, ruta, ruta_checkpoint=None, tamano_lectura=1 << 20, intervalo_min=0.01,
+                 intervalo_max=1.0, checkpoint_cada=5.0, desde_inicio=False, usar_inotify=True, al_leer=None,
+                 guardar_checkpoints=True):
+        self.ruta = ruta
+        self.ruta_checkpoint = ruta_checkpoint
+        self.guardar_checkpoints = guardar_checkpoints
+        self.intervalo_min = intervalo_min
+        self.intervalo_max = intervalo_max
+        self.checkpoint_cada = checkpoint_cada
+        self.desde_inicio = desde_inicio
+        # al_leer(segundos): duración de cada lectura que trae líneas
+        self.al_leer = al_leer
+
+        self._buffer = bytearray(tamano_lectura)
+        self._vista = memoryview(self._buffer)
+        # Línea incompleta al final de la última lectura: `_pendientes` bytes desde `_desde`
+        self._desde = 0
+        self._pendientes = 0
+        self._fichero = None
+        self._inodo = None
+        self._dispositivo = None
+        self._posiciones = []
+        self.offset = 0
+        self._ultimo_checkpoint = time.monotonic()
+
+        self._inotify = None
+        if usar_inotify and sys.platform.startswith('linux'):
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError) as e:
+                logger.warning(f"[!] inotify no disponible ({e}), usando sondeo adaptativo")
+
+    # --- Apertura y checkpoint ---
+    def _esperar_fichero(self):
+        retry_count = 0
+        max_retries = 30
+        while not os.path.exists(self.ruta):
+            logger.warning(f"[*] Esperando archivo {self.ruta}... ({retry_count}/{max_retries})")
+            time.sleep(2)
+            retry_count += 1
+            if retry_count >= max_retries:
+                logger.error(f"[!] TIMEOUT: El archivo {self.ruta} no apareció después de {max_retries * 2} segundos")
+                sys.exit(1)
+        logger.info(f"[✓] Archivo encontrado: {self.ruta}")
+
+    def _abrir(self, ruta, offset):
+        if self._fichero is not None:
+            self._fichero.close()
+        self._fichero = open(ruta, 'rb', buffering=0)
+        estado = os.fstat(self._fichero.fileno())
+        self._inodo = estado.st_ino
+        self._dispositivo = estado.st_dev
+        self._fichero.seek(offset)
+        self.offset = offset
+        self._desde = self._pendientes = 0
+        if self._inotify is not None:
+            mascara = _Inotify.IN_MODIFY | _Inotify.IN_ATTRIB | _Inotify.IN_MOVE_SELF | _Inotify.IN_DELETE_SELF
+            self._inotify.vigilar(ruta, mascara)
+
+    def _leer_checkpoint(self):
+        if not self.ruta_checkpoint or not os.path.exists(self.ruta_checkpoint):
+            return None
+        try:
+            with open(self.ruta_checkpoint) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"[!] Checkpoint ilegible ({self.ruta_checkpoint}): {e}")
+            return None
+
+    def posicion(self):
+        """Lo que guarda el checkpoint: fichero abierto (inodo) y offset hasta donde ha procesado el consumidor"""
+        return {'ruta': self.ruta, 'inodo': self._inodo, 'dispositivo': self._dispositivo, 'offset': self.offset}
+
+    def guardar_checkpoint(self):
+        """Escribe (inodo, offset) de forma atómica"""
+        if not self.ruta_checkpoint or not self.guardar_checkpoints or self._inodo is None:
+            return
+        escribir_checkpoint(self.ruta_checkpoint, self.posicion())
+        self._ultimo_checkpoint = time.monotonic()
+
+    def _buscar_rotado(self, inodo):
+        """Busca en el directorio del log el fichero rotado que conserva `inodo`"""
+        directorio = os.path.dirname(os.path.abspath(self.ruta))
+        with os.scandir(directorio) as entradas:
+            for entrada in entradas:
+                try:
+                    if entrada.is_file() and entrada.inode() == inodo:
+                        return entrada.path
+                except OSError:
+                    continue
+        return None
+
+    def _posicion_inicial(self):
+        """Decide dónde empezar: checkpoint, fichero rotado pendiente, inicio o final"""
+        checkpoint = self._leer_checkpoint()
+        estado = os.stat(self.ruta)
+        if checkpoint and checkpoint.get('ruta') == self.ruta:
+            if checkpoint['inodo'] == estado.st_ino and checkpoint['offset'] <= estado.st_size:
+                logger.info(f"[✓] Reanudando {self.ruta} desde el checkpoint (offset {checkpoint['offset']})")
+                return [(self.ruta, checkpoint['offset'])]
+            rotado = self._buscar_rotado(checkpoint['inodo'])
+            if rotado:
+                logger.info(f"[✓] Terminando {rotado} (rotado durante la parada) antes de seguir con {self.ruta}")
+                return [(rotado, checkpoint['offset']), (self.ruta, 0)]
+            logger.warning("[!] El fichero del checkpoint ya no existe; leyendo el log actual desde el inicio")
+            return [(self.ruta, 0)]
+        return [(self.ruta, 0 if self.desde_inicio else estado.st_size)]
+
+    # --- Lectura ---
+    def _leer_bloque(self):
+        """Lee como mucho un buffer; devuelve [trozo] con las líneas completas leídas o [].
+
+        El trozo es una vista del buffer (memoryview, sin el último salto) válida
+        hasta la siguiente lectura. Una línea que no cabe en el buffer lo duplica.
+        """
+        buffer = self._buffer
+        if self._desde:
+            # La línea incompleta pasa al principio; el trozo anterior ya se consumió
+            buffer[:self._pendientes] = buffer[self._desde:self._desde + self._pendientes]
+            self._desde = 0
+        while True:
+            pendientes = self._pendientes
+            if pendientes == len(buffer):
+                buffer = bytearray(2 * len(buffer))
+                buffer[:pendientes] = self._buffer
+                self._buffer = buffer
+                self._vista = memoryview(buffer)
+            n = self._fichero.readinto(self._vista[pendientes:])
+            if not n:
+                return []
+            fin = pendientes + n
+            corte = buffer.rfind(b'\n', pendientes, fin)
+            if corte < 0:
+                self._pendientes = fin
+                if fin < len(buffer):
+                    return []
+                continue
+            self._desde = corte + 1
+            self._pendientes = fin - corte - 1
+            return [self._vista[:corte]]
+
+    def _comprobar_rotacion(self):
+        """True si hay que cambiar de fichero; corrige el offset si fue truncado"""
+        try:
+            estado = os.stat(self.ruta)
+        except FileNotFoundError:
+            return False  # Rotado pero aún sin recrear: seguimos con el descriptor actual
+        if estado.st_ino != self._inodo or estado.st_dev != self._dispositivo:
+            return True
+        if estado.st_size < self.offset + self._pendientes:
+            logger.warning(f"[!] {self.ruta} fue truncado; leyendo desde el inicio")
+            self._fichero.seek(0)
+            self.offset = 0
+            self._desde = self._pendientes = 0
+        return False
+
+    def _esperar(self, intervalo):
+        if self._inotify is not None:
+            self._inotify.esperar(self.intervalo_max)
+            return self.intervalo_min
+        time.sleep(intervalo)
+        return min(intervalo * 2, self.intervalo_max)
+
+    def abrir(self):
+        """Decide la posición inicial y abre el fichero, que ya debe existir"""
+        self._posiciones = self._posicion_inicial()
+        if self._inotify is not None:
+            self._inotify.vigilar(os.path.dirname(os.path.abspath(self.ruta)),
+                                  _Inotify.IN_CREATE | _Inotify.IN_MOVED_TO)
+
+        ruta, offset = self._posiciones.pop(0)
+        self._abrir(ruta, offset)
+        logger.info(f"[✓] Escuchando logs de Apache en: {self.ruta}")
+
+    def leer(self):
+        """Un paso sin esperar: trozos de `_leer_bloque`, o [] si no hay nada nuevo.
+
+        Antes de devolver [] termina el fichero rotado pendiente y atiende
+        rotaciones y truncados. El consumidor avanza `self.offset` y tiene que
+        terminar con los trozos (vistas del buffer) antes de volver a llamar.
+        """
+        while True:
+            inicio = time.perf_counter()
+            trozos = self._leer_bloque()
+            if trozos:
+                if self.al_leer is not None:
+                    self.al_leer(time.perf_counter() - inicio)
+                return trozos
+
+            # Sin datos: rotado pendiente de terminar o rotación
+            if self._posiciones:
+                ruta, offset = self._posiciones.pop(0)
+                self._abrir(ruta, offset)
+                continue
+            if self._comprobar_rotacion():
+                logger.info(f"[*] Rotación detectada en {self.ruta}; abriendo el fichero nuevo")
+                self._abrir(self.ruta, 0)
+                self.guardar_checkpoint()
+                continue
+            return []
+
+    def guardar_checkpoint_si_toca(self):
+        if time.monotonic() - self._ultimo_checkpoint >= self.checkpoint_cada:
+            self.guardar_checkpoint()
+
+    def _recorrer(self, ceder_inactivo):
+        """Produce listas de trozos de `_leer_bloque`; el consumidor avanza `self.offset`"""
+        self._esperar_fichero()
+        self.abrir()
+
+        intervalo = self.intervalo_min
+        try:
+            while True:
+                trozos = self.leer()
+                if trozos:
+                    intervalo = self.intervalo_min
+                    yield trozos
+                    self.guardar_checkpoint_si_toca()
+                    continue
+
+                self.guardar_checkpoint_si_toca()
+                if ceder_inactivo:
+                    yield []
+                intervalo = self._esperar(intervalo)
+        finally:
+            self.guardar_checkpoint()
+
+    def bloques(self, ceder_inactivo=False):
+        """Produce listas de líneas (str, sin salto de línea) tal como se leen.
+
+        El offset del checkpoint avanza cuando el consumidor pide el bloque
+        siguiente, así que solo cuenta lo que ya ha procesado. Con
+        `ceder_inactivo=True` produce una lista vacía cada vez que va a esperar.
+        """
+        for trozos in self._recorrer(ceder_inactivo):
+            if not trozos:
+                yield []
+                continue
+            for trozo in trozos:
+                yield str(trozo, 'utf-8', 'replace').split('\n')
+                self.offset += len(trozo) + 1
+
+    def lineas(self, ceder_inactivo=False):
+        """Como `bloques` pero línea a línea (None cuando va a esperar); checkpoint por línea"""
+        for trozos in self._recorrer(ceder_inactivo):
+            if not trozos:
+                yield None
+                continue
+            for trozo in trozos:
+                try:
+                    # Caso habitual: un carácter por byte, se decodifica el trozo de una vez
+                    texto = str(trozo, 'ascii')
+                except UnicodeDecodeError:
+                    texto = None
+                if texto is not None:
+                    for linea in texto.split('\n'):
+                        yield linea
+                        self.offset += len(linea) + 1
+                else:
+                    for linea in bytes(trozo).split(b'\n'):
+                        yield linea.decode('utf-8', 'replace')
+                        self.offset += len(linea) + 1
+
+    def bytes_pendientes(self):
+        """Bytes del fichero abierto que el consumidor aún no ha procesado"""
+        fichero = self._fichero
+        if fichero is None:
+            return 0
+        try:
+            return max(0, os.fstat(fichero.fileno()).st_size - self.offset)
+        except (OSError, ValueError):
+            return 0
+
+    def cerrar(self):
+        self.guardar_checkpoint()
+        if self._fichero is not None:
+            self._fichero.close()
+        if self._inotify is not None:
+            self._inotify.cerrar()
+
+
+def tail_file(filepath, ceder_inactivo=False, ruta_checkpoint=None):
+    """Lee el archivo en modo 'tail -F' (ver SeguidorLog).
+
+    Con `ceder_inactivo=True` produce `None` cada vez que no hay datos nuevos,
+    para que el consumidor pueda vaciar sus buffers mientras espera.
+    """
+    yield from SeguidorLog(filepath, ruta_checkpoint=ruta_checkpoint).lineas(ceder_inactivo)
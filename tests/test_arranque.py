@@ -0,0 +1,68 @@
+"""Arranque real de capturador.py: el HEALTHCHECK del Dockerfile solo pasa con capturador_listo 1,
+y pasa dentro de su start-period"""
+import os
+import re
+import time
+import subprocess
+import shutil
+import argparse
+import joblib
+import pytest
+from sklearn.preprocessing import LabelEncoder
+
+from benchmarks.bench_arranque import RAIZ, METRICA_FASE, METRICA_LISTO, capturador_en_marcha, leer_metricas
+from configuracion import MODEL_FILE, SCALER_FILE, ENCODERS_FILE
+
+pytest.importorskip('tensorflow')
+
+CATEGORICAS = ['ip', 'method', 'url', 'http_version', 'referer', 'user_agent', 'tls_version', 'cipher_suite',
+               'log_source']
+
+
+def healthcheck_dockerfile():
+    """(segundos de --start-period, comando de la sonda) del HEALTHCHECK del Dockerfile"""
+    with open(os.path.join(RAIZ, 'Dockerfile')) as f:
+        texto = f.read()
+    instruccion = re.search(r'^HEALTHCHECK (.*?)\\\n\s*CMD (.*)$', texto, re.M)
+    return float(re.search(r'--start-period=(\d+)s', instruccion.group(1)).group(1)), instruccion.group(2)
+
+
+def sonda(comando, puerto):
+    """Ejecuta la sonda del HEALTHCHECK contra `puerto`; True si el contenedor estaría sano"""
+    return subprocess.run(['sh', '-c', comando.replace('localhost:8000', f'localhost:{puerto}')],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=10).returncode == 0
+
+
+@pytest.fixture
+def artefactos(tmp_path):
+    """Modelo y scaler del repositorio con unos encoders mínimos (el del repo no se versiona)"""
+    for nombre in (MODEL_FILE, SCALER_FILE):
+        if not os.path.exists(os.path.join(RAIZ, nombre)):
+            pytest.skip(f"Falta {nombre} en el repositorio")
+        shutil.copy(os.path.join(RAIZ, nombre), tmp_path / nombre)
+    joblib.dump({col: LabelEncoder().fit(['-', 'nan']) for col in CATEGORICAS}, tmp_path / ENCODERS_FILE)
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize('backend', ['numpy', 'tf_function'])
+def test_healthcheck_sano_solo_con_capturador_listo(artefactos, backend):
+    start_period, comando = healthcheck_dockerfile()
+    args = argparse.Namespace(directorio=artefactos, influx='http://127.0.0.1:9', verbose=False)
+    fallos_con_metricas = 0
+    with capturador_en_marcha(backend, args) as (proceso, puerto, inicio):
+        while True:
+            assert time.monotonic() - inicio <= start_period, "Sin pasar el HEALTHCHECK dentro del start-period"
+            assert proceso.poll() is None, f"capturador.py terminó con código {proceso.returncode}"
+            sano = sonda(comando, puerto)
+            # capturador_listo no vuelve a 0: leída después de la sonda, tiene que confirmarla
+            texto = leer_metricas(puerto)
+            listo = texto is not None and float(METRICA_LISTO.search(texto).group(1)) == 1
+            if sano:
+                assert listo
+                break
+            if texto is not None and not listo:
+                fallos_con_metricas += 1
+            time.sleep(0.05)
+        # La sonda no se conforma con que /metrics responda
+        assert fallos_con_metricas > 0
+        assert {'servidor_metricas', 'artefactos', 'calentamiento'} <= set(dict(METRICA_FASE.findall(texto)))
@@ -0,0 +1,109 @@
+"""Las tablas compiladas dan los mismos códigos que los encoders de entrenamiento"""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import LabelEncoder
+
+from codificacion import (CodificadorHash, TablaHash, TablaVocabulario, TablaVocabularioLRU, compilar_tablas,
+                          safe_transform, verificar_tablas)
+
+DESCONOCIDOS = ['no-visto', '', ' ', 'GET ', '10.0.0.256', '/índice?q=ñ', '\x00', '200']
+
+
+def vocabulario(n=3000, semilla=0):
+    """Valores como los del CSV de entrenamiento: IPs, URLs, status (también con NaN), unicode..."""
+    rng = np.random.default_rng(semilla)
+    valores = [f"192.168.{i // 256}.{i % 256}" for i in rng.integers(0, 65536, n)]
+    valores += [f"/producto/{i}?ref={i * 7919 % 100003}" for i in rng.integers(0, 10 ** 6, n)]
+    valores += ['-', 'GET', 'POST', 'Mozilla/5.0 (X11; Linux x86_64)', '/búsqueda?q=café', '0', '01', '1e3']
+    # Lo que queda de una columna int con NaN tras leerla como float
+    valores += ['200.0', '404.0', 'nan', '500.0']
+    return valores
+
+
+def ajustar_label(valores):
+    return LabelEncoder().fit(pd.Series(valores).astype(str))
+
+
+@pytest.fixture(scope='module')
+def encoder():
+    return ajustar_label(vocabulario())
+
+
+@pytest.mark.parametrize('crear', [TablaVocabulario, lambda e: TablaVocabularioLRU(e, tamano_cache=64)],
+                         ids=['dict', 'lru'])
+def test_tabla_vocabulario_igual_que_label_encoder(encoder, crear):
+    tabla = crear(encoder)
+    clases = [str(clase) for clase in encoder.classes_]
+    # Dos pasadas: la segunda con la caché LRU ya llena y desalojando
+    for _ in range(2):
+        assert [tabla(clase) for clase in clases] == encoder.transform(clases).tolist()
+    for valor in DESCONOCIDOS:
+        assert valor not in set(clases)
+        assert tabla(valor) == safe_transform(encoder, valor) == 0
+    assert tabla.desconocidos == len(DESCONOCIDOS)
+
+
+def test_tabla_mezcla_conocidos_y_desconocidos(encoder):
+    rng = np.random.default_rng(1)
+    clases = [str(clase) for clase in encoder.classes_]
+    valores = [clases[i] for i in rng.integers(0, len(clases), 2000)] + DESCONOCIDOS * 10
+    rng.shuffle(valores)
+    esperados = [safe_transform(encoder, valor) for valor in valores]
+    for tabla in (TablaVocabulario(encoder), TablaVocabularioLRU(encoder, tamano_cache=16)):
+        assert [tabla(valor) for valor in valores] == esperados
+
+
+def test_tabla_hash_igual_que_codificador():
+    valores = pd.Series(vocabulario()).astype(str)
+    codificador = CodificadorHash(top_k=100, cubetas=64).fit(valores)
+    tabla = TablaHash(codificador)
+    todos = list(valores.unique()) + DESCONOCIDOS
+    assert [tabla(valor) for valor in todos] == codificador.transform(todos).tolist()
+    for valor in codificador.frecuentes:
+        assert tabla(valor) < codificador.top_k
+    for valor in DESCONOCIDOS:
+        assert codificador.top_k <= tabla(valor) < codificador.n_codigos
+
+
+def test_compilar_y_verificar_todas_las_columnas():
+    valores = vocabulario()
+    encoders = {
+        'method': ajustar_label(['GET', 'POST', 'HEAD']),
+        'status_code': ajustar_label(['200', '404', '500', '-']),
+        'url': ajustar_label(valores),
+        'ip': CodificadorHash(top_k=50, cubetas=32).fit(valores),
+    }
+    tablas = compilar_tablas(encoders)
+    assert isinstance(tablas['method'], TablaVocabulario)
+    assert isinstance(tablas['url'], TablaVocabularioLRU)
+    assert isinstance(tablas['ip'], TablaHash)
+    verificar_tablas(encoders, tablas)
+    assert all(tabla.desconocidos == 0 for tabla in tablas.values())
+
+
+def test_verificar_detecta_discrepancias(encoder):
+    tabla = TablaVocabulario(encoder)
+    clases = list(tabla._codigos)
+    tabla._codigos[clases[0]], tabla._codigos[clases[1]] = tabla._codigos[clases[1]], tabla._codigos[clases[0]]
+    with pytest.raises(ValueError):
+        verificar_tablas({'url': encoder}, {'url': tabla})
+
+
+@pytest.mark.parametrize('tamano_trozo', [1000, 110100, 10**6])
+def test_hash_por_trozos_igual_que_fit(tamano_trozo):
+    # Cinco bloques de 110000 valores únicos seguidos de los mismos 100 valores: en cada bloque
+    # son tan raros como los únicos, pero en total son los más frecuentes. Un recuento que se
+    # poda por trozos los pierde; el top tiene que salir igual que con la columna entera
+    bloques = [np.concatenate([[f'u{b}-{i}' for i in range(110000)], [f'f{i}' for i in range(100)]])
+               for b in range(5)]
+    valores = np.concatenate(bloques)
+
+    entero = CodificadorHash(top_k=64, cubetas=128).fit(valores)
+    por_trozos = CodificadorHash(top_k=64, cubetas=128)
+    for inicio in range(0, len(valores), tamano_trozo):
+        por_trozos.contar(valores[inicio:inicio + tamano_trozo])
+    por_trozos.ajustar()
+
+    assert entero.frecuentes == sorted(f'f{i}' for i in range(100))[:64]
+    assert por_trozos.frecuentes == entero.frecuentes
@@ -0,0 +1,193 @@
+"""EscritorInflux contra un endpoint HTTP local que imita /api/v2/write"""
+import os
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+from escritor_influx import EscritorInflux
+
+
+class InfluxFalso:
+    """Servidor local: cada POST consume la siguiente respuesta del guion (204 cuando se acaba)"""
+
+    def __init__(self):
+        self.guion = []
+        self.peticiones = []
+        self._lock = threading.Lock()
+        falso = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_POST(self):
+                cuerpo = self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+                with falso._lock:
+                    falso.peticiones.append((time.monotonic(), self.path, cuerpo))
+                    estado, cabeceras = falso.guion.pop(0) if falso.guion else (204, {})
+                self.send_response(estado)
+                for nombre, valor in cabeceras.items():
+                    self.send_header(nombre, valor)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, formato, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+        self.url = f"http://127.0.0.1:{self.servidor.server_address[1]}"
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+
+    def responder(self, *respuestas):
+        with self._lock:
+            self.guion.extend(r if isinstance(r, tuple) else (r, {}) for r in respuestas)
+
+    def lotes(self):
+        with self._lock:
+            return [cuerpo.split('\n') for _, _, cuerpo in self.peticiones]
+
+    def lineas_aceptadas(self, desde=0):
+        """Líneas de las peticiones a partir de la `desde`-ésima"""
+        return [linea for lote in self.lotes()[desde:] for linea in lote]
+
+    def cerrar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+def esperar(condicion, timeout=10.0):
+    limite = time.monotonic() + timeout
+    while not condicion():
+        if time.monotonic() > limite:
+            raise AssertionError("Tiempo de espera agotado")
+        time.sleep(0.01)
+
+
+def puntos(n, inicio=0):
+    return [f"web_traffic,ip=10.0.0.{i % 250} mae={i / 1000} {i}" for i in range(inicio, inicio + n)]
+
+
+@pytest.fixture
+def influx():
+    falso = InfluxFalso()
+    yield falso
+    falso.cerrar()
+
+
+def crear(influx, tmp_path, **opciones):
+    opciones = {'tamano_lote': 10, 'intervalo_ms': 50, 'backoff_base': 0.01, 'backoff_max': 1.0,
+                'ruta_derrame': str(tmp_path / 'derrame.lp'), **opciones}
+    return EscritorInflux(influx.url, 'token', 'org', 'bucket', **opciones)
+
+
+def test_lotes_por_tamano_y_por_intervalo(influx, tmp_path):
+    escritor = crear(influx, tmp_path, intervalo_ms=200)
+    for linea in puntos(25):
+        escritor.escribir(linea)
+    # Dos lotes llenos enseguida; el resto sale al cumplirse el intervalo
+    esperar(lambda: len(influx.peticiones) == 3)
+    escritor.detener(timeout=5)
+
+    assert [len(lote) for lote in influx.lotes()] == [10, 10, 5]
+    assert influx.lineas_aceptadas() == puntos(25)
+    assert influx.peticiones[0][1] == '/api/v2/write?org=org&bucket=bucket&precision=ns'
+
+
+def test_detener_envia_lo_pendiente(influx, tmp_path):
+    escritor = crear(influx, tmp_path, intervalo_ms=60000)
+    for linea in puntos(3):
+        escritor.escribir(linea)
+    escritor.detener(timeout=5)
+    assert influx.lotes() == [puntos(3)]
+
+
+def test_reintenta_429_con_retry_after_y_5xx(influx, tmp_path):
+    influx.responder((429, {'Retry-After': '0.3'}), 503, 500)
+    escritor = crear(influx, tmp_path, reintentos=5)
+    for linea in puntos(10):
+        escritor.escribir(linea)
+    esperar(lambda: len(influx.peticiones) == 4)
+    escritor.detener(timeout=5)
+
+    # El mismo lote cuatro veces: 429, 503, 500 y por fin 204
+    assert influx.lotes() == [puntos(10)] * 4
+    tiempos = [t for t, _, _ in influx.peticiones]
+    assert tiempos[1] - tiempos[0] >= 0.3
+    assert not os.path.exists(tmp_path / 'derrame.lp')
+
+
+def test_descarta_tras_agotar_reintentos(influx, tmp_path):
+    influx.responder(*[503] * 3)
+    escritor = crear(influx, tmp_path, reintentos=2)
+    for linea in puntos(10):
+        escritor.escribir(linea)
+    esperar(lambda: len(influx.peticiones) == 3)
+    for linea in puntos(10, 10):
+        escritor.escribir(linea)
+    escritor.detener(timeout=5)
+
+    # 1 + 2 reintentos del primer lote, que se pierde; el segundo entra
+    assert influx.lotes() == [puntos(10)] * 3 + [puntos(10, 10)]
+    assert not os.path.exists(tmp_path / 'derrame.lp')
+
+
+def test_4xx_no_se_reintenta(influx, tmp_path):
+    influx.responder(400)
+    escritor = crear(influx, tmp_path, reintentos=5, politica_cola_llena='disco')
+    for linea in puntos(10):
+        escritor.escribir(linea)
+    escritor.detener(timeout=5)
+    assert len(influx.peticiones) == 1
+    assert not os.path.exists(tmp_path / 'derrame.lp')
+
+
+def test_derrame_a_disco_y_reenvio_al_recuperarse(influx, tmp_path):
+    ruta = tmp_path / 'derrame.lp'
+    # InfluxDB caído: los dos intentos de cada uno de los dos primeros lotes fallan
+    influx.responder(*[503] * 4)
+    escritor = crear(influx, tmp_path, reintentos=1, politica_cola_llena='disco')
+    for linea in puntos(20):
+        escritor.escribir(linea)
+    esperar(lambda: len(influx.peticiones) == 4)
+    esperar(lambda: ruta.exists() and len(ruta.read_text().splitlines()) == 20)
+    assert ruta.read_text().splitlines() == puntos(20)
+
+    # Se recupera: el siguiente lote entra y después se reenvía lo derramado
+    for linea in puntos(5, 20):
+        escritor.escribir(linea)
+    esperar(lambda: sorted(influx.lineas_aceptadas(4)) == sorted(puntos(25)))
+    escritor.detener(timeout=5)
+
+    assert influx.lotes()[4] == puntos(5, 20)
+    assert influx.lineas_aceptadas(5) == puntos(20)
+    assert not ruta.exists()
+    assert not os.path.exists(str(ruta) + '.reenvio')
+
+
+def test_reenvio_por_lotes_derrama_solo_lo_no_enviado(influx, tmp_path):
+    ruta = tmp_path / 'derrame.lp'
+    ruta.write_text('\n'.join(puntos(35)) + '\n')
+    # El punto nuevo y el primer lote del derrame entran; el segundo lote falla
+    influx.responder(204, 204, 503)
+    escritor = crear(influx, tmp_path, reintentos=0)
+    escritor.escribir(puntos(1, 100)[0])
+    esperar(lambda: len(influx.peticiones) == 3 and not os.path.exists(str(ruta) + '.reenvio'))
+
+    assert influx.lotes()[1:] == [puntos(10), puntos(10, 10)]
+    assert ruta.read_text().splitlines() == puntos(25, 10)
+    escritor.detener(timeout=5)
+
+def test_cola_llena_va_a_disco(influx, tmp_path):
+    ruta = tmp_path / 'derrame.lp'
+    # Un lote en vuelo que tarda (Retry-After) y una cola de 10: lo que no cabe se derrama
+    influx.responder((429, {'Retry-After': '0.5'}))
+    escritor = crear(influx, tmp_path, max_cola=10, politica_cola_llena='disco')
+    for linea in puntos(10):
+        escritor.escribir(linea)
+    esperar(lambda: len(influx.peticiones) == 1)
+    for linea in puntos(20, 10):
+        escritor.escribir(linea)
+    assert ruta.read_text().splitlines() == puntos(10, 20)
+
+    esperar(lambda: sorted(influx.lineas_aceptadas(1)) == sorted(puntos(30)))
+    escritor.detener(timeout=5)
+    assert influx.lineas_aceptadas(1) == puntos(30)
+    assert not ruta.exists()
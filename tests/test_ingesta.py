@@ -0,0 +1,90 @@
+"""IngestaMultiple: lecturas fuera del bucle, contrapresión sin bloquearlo y descubrimiento sin rotados"""
+import os
+import asyncio
+import threading
+
+from ingesta import FuenteLog, IngestaMultiple
+
+FORMATO = '%h %l %u %t "%r" %>s %b'
+
+
+class MotorFalso:
+    """Cola del motor con `huecos` libres; cada ventana enviada ocupa uno"""
+
+    def __init__(self, huecos):
+        self.libres = huecos
+
+    def huecos(self):
+        return self.libres
+
+
+class CapturadorFalso:
+    """Cada línea ocupa un hueco del motor; si no lo hay, `procesar_log` se bloquearía"""
+
+    def __init__(self, huecos):
+        self.motor = MotorFalso(huecos)
+        self.lineas = []
+        self.bloqueos = 0
+
+    def crear_fuente(self, nombre, ruta=None):
+        return FuenteLog(nombre, FORMATO, 3, 2, ruta=ruta)
+
+    def procesar_log(self, linea, fuente=None):
+        if self.motor.libres <= 0:
+            self.bloqueos += 1
+        self.motor.libres -= 1
+        self.lineas.append(linea)
+
+
+def escribir(ruta, n):
+    with open(ruta, 'w') as f:
+        f.writelines(f'10.0.0.{i % 250} - - [01/Jan/2024:00:00:00 +0000] "GET /{i} HTTP/1.1" 200 {i}\n'
+                     for i in range(n))
+
+
+def test_descubrir_excluye_rotados(tmp_path):
+    for nombre in ['access.log', 'access.log.1', 'access.log.2.gz', 'access.log-20240101', 'tienda_access.log']:
+        escribir(tmp_path / nombre, 1)
+    ingesta = IngestaMultiple(CapturadorFalso(10), [(None, str(tmp_path / '*access.log*'))])
+    nuevas = ingesta.descubrir(desde_inicio=True)
+    assert sorted(os.path.basename(f.ruta) for f in nuevas) == ['access.log', 'tienda_access.log']
+
+    # Una ruta sin comodines se sigue aunque tenga sufijo de rotado
+    ingesta = IngestaMultiple(CapturadorFalso(10), [(None, str(tmp_path / 'access.log.1'))])
+    assert [f.nombre for f in ingesta.descubrir(desde_inicio=True)] == ['access.log.1']
+
+
+def test_contrapresion_no_bloquea_el_bucle(tmp_path):
+    escribir(tmp_path / 'access.log', 1000)
+    capturador = CapturadorFalso(huecos=100)
+    ingesta = IngestaMultiple(capturador, [(None, str(tmp_path / 'access.log'))], lineas_por_turno=64,
+                              intervalo_min=0.001, intervalo_max=0.005)
+    hilos_lectura = set()
+    leer = IngestaMultiple._leer
+
+    def leer_anotando(seguidor):
+        hilos_lectura.add(threading.current_thread())
+        return leer(seguidor)
+
+    ingesta._leer = leer_anotando
+
+    async def escenario():
+        fuente, = ingesta.descubrir(desde_inicio=True)
+        tarea = asyncio.create_task(ingesta._seguir(fuente))
+        # Con la cola llena la fuente se para en 100 líneas, pero el bucle sigue atendiendo otras tareas
+        latidos = 0
+        while len(capturador.lineas) < 100 or latidos < 20:
+            await asyncio.sleep(0.001)
+            latidos += 1
+        assert len(capturador.lineas) == 100
+        # El motor libera sitio poco a poco y la fuente termina el fichero
+        while len(capturador.lineas) < 1000:
+            capturador.motor.libres += 30
+            await asyncio.sleep(0.002)
+        tarea.cancel()
+        await asyncio.gather(tarea, return_exceptions=True)
+
+    asyncio.run(asyncio.wait_for(escenario(), timeout=10))
+    assert capturador.bloqueos == 0
+    assert len(capturador.lineas) == 1000 and capturador.lineas[-1].endswith('200 999')
+    assert threading.main_thread() not in hilos_lectura
@@ -0,0 +1,103 @@
+"""Pipeline multiproceso con ventana global: mismos scores que una sola ventana secuencial"""
+import os
+import shutil
+import joblib
+import numpy as np
+import pytest
+from sklearn.preprocessing import LabelEncoder
+
+from parser_apache import ParserApache
+from pipeline_multiproceso import ejecutar_pipeline, ultimas_parseables
+
+pytest.importorskip('tensorflow')
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TIMESTEPS = 10
+CATEGORICAS = ['ip', 'method', 'url', 'http_version', 'referer', 'user_agent', 'tls_version', 'cipher_suite',
+               'log_source']
+
+
+def linea_valida(i):
+    return (f'10.0.{i % 7}.{i % 13} - - [01/Jan/2024:00:{i // 60 % 60:02d}:{i % 60:02d} +0000] '
+            f'"{"GET" if i % 3 else "POST"} /ruta/{i % 17} HTTP/1.1" {200 if i % 5 else 404} {i * 37 % 5000} '
+            f'"-" "agente-{i % 4}"')
+
+
+def lineas_con_rafagas(n):
+    """Líneas válidas con ráfagas de basura más largas que 2 × (TIMESTEPS - 1)"""
+    lineas = []
+    for i in range(n):
+        lineas.append(linea_valida(i))
+        if i % 37 == 36:
+            lineas.extend(f'basura {i} {j}' for j in range(3 * TIMESTEPS))
+    return lineas
+
+
+def test_ultimas_parseables():
+    parser = ParserApache()
+    lineas = [linea_valida(0), 'x', linea_valida(1), 'y', 'z', linea_valida(2), 'w']
+    assert ultimas_parseables(lineas, 2, parser) == [linea_valida(1), linea_valida(2)]
+    assert ultimas_parseables(lineas, 5, parser) == [linea_valida(i) for i in range(3)]
+    assert ultimas_parseables(lineas, 0, parser) == []
+
+
+@pytest.fixture
+def config(tmp_path):
+    """Modelo y scaler del repositorio con encoders ajustados a las líneas de la prueba"""
+    for nombre in ('modelo_logs_1.h5', 'scaler_logs_1.joblib'):
+        if not os.path.exists(os.path.join(RAIZ, nombre)):
+            pytest.skip(f"Falta {nombre} en el repositorio")
+        shutil.copy(os.path.join(RAIZ, nombre), tmp_path / nombre)
+    parser = ParserApache()
+    registros = [parser.parsear(linea_valida(i)) for i in range(200)]
+    joblib.dump({col: LabelEncoder().fit([str(r.get(col)) for r in registros] + ['-', 'nan'])
+                 for col in CATEGORICAS}, tmp_path / 'encoders.joblib')
+    return {
+        'ruta_modelo': str(tmp_path / 'modelo_logs_1.h5'),
+        'ruta_scaler': str(tmp_path / 'scaler_logs_1.joblib'),
+        'ruta_encoders': str(tmp_path / 'encoders.joblib'),
+        'timesteps': TIMESTEPS,
+        'backend': 'numpy',
+        'tolerancia': 1e-4,
+        'tamano_cache_vocab': 4096,
+        'tamano_lote': 64,
+        'max_claves': 1024,
+        'ruta_checkpoint': None,
+        'formato_log': parser.formato,
+    }
+
+
+def scores_secuenciales(config, lineas):
+    """Referencia: una sola ventana global, como capturador.py"""
+    from artefactos import cargar_artefactos, preparar_backend
+    from inferencia import errores_reconstruccion
+    from ventana import VentanaAnillo
+
+    artefactos = cargar_artefactos(config['ruta_modelo'], config['ruta_scaler'], config['ruta_encoders'])
+    backend = preparar_backend('numpy', artefactos, TIMESTEPS, 64, 1e-4, verificar=False)
+    parser = ParserApache(config['formato_log'])
+    ventana = VentanaAnillo(TIMESTEPS, artefactos.pipeline.n_features)
+    secuencias = []
+    for linea in lineas:
+        parsed_data = parser.parsear(linea)
+        if parsed_data:
+            ventana.agregar(artefactos.pipeline.transformar(parsed_data))
+            if ventana.lleno:
+                secuencias.append(np.array(ventana.vista()))
+    secuencias = np.stack(secuencias)
+    return errores_reconstruccion(backend(secuencias), secuencias)
+
+
+def test_ventana_global_con_rafagas_de_lineas_invalidas(config, tmp_path):
+    lineas = lineas_con_rafagas(600)
+    ruta = tmp_path / 'access.log'
+    ruta.write_text('\n'.join(lineas) + '\n')
+
+    scores = []
+    # Tramos pequeños: muchas fronteras caen justo después de una ráfaga
+    ejecutar_pipeline(str(ruta), lambda mae, parsed_data: scores.append(mae), n_workers=2, clave='',
+                      seguir=False, tamano_bloque=16, config=config)
+
+    esperados = scores_secuenciales(config, lineas)
+    assert len(scores) == len(esperados) == 600 - (TIMESTEPS - 1)
+    np.testing.assert_allclose(scores, esperados, rtol=1e-5)
@@ -0,0 +1,108 @@
+"""Entrenamiento en memoria y por trozos: mismos tipos, mismo orden y misma matriz"""
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from codificacion import CodificadorHash
+
+pytest.importorskip('tensorflow')
+import MODELO_LOGS_V2 as modelo
+
+
+def tramos_ordenados(marcas, filas, limites):
+    for inicio, fin in limites:
+        orden = np.argsort(marcas[inicio:fin], kind='stable')
+        marcas[inicio:fin] = marcas[inicio:fin][orden]
+        filas[inicio:fin] = filas[inicio:fin][orden]
+
+
+@pytest.mark.parametrize('filas_en_memoria', [1, 3, 50, 10000])
+def test_mezclar_tramos_equivale_al_sort_estable(filas_en_memoria):
+    rng = np.random.default_rng(0)
+    # Pocas marcas distintas: muchos empates, también entre tramos
+    marcas = rng.integers(0, 20, 1000)
+    filas = np.arange(1000, dtype=np.float32)[:, None]
+    limites = [(0, 1), (1, 300), (300, 300), (300, 301), (301, 1000)]
+    esperado = filas[np.argsort(marcas, kind='stable')]
+    tramos_ordenados(marcas, filas, limites)
+
+    destino = np.empty_like(filas)
+    assert modelo.mezclar_tramos(marcas, filas, limites, destino, filas_en_memoria) == 1000
+    assert np.array_equal(destino, esperado)
+
+
+@pytest.fixture
+def csv_logs(tmp_path):
+    rng = np.random.default_rng(1)
+    n = 3000
+    marcas = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 200, n), unit='s')
+    df = pd.DataFrame({
+        'timestamp': marcas.strftime('%Y-%m-%d %H:%M:%S'),
+        'ip': rng.integers(0, 50, n),
+        'method': rng.choice(['GET', 'POST', None], n),
+        'url': [f'/u{i}' for i in rng.integers(0, 400, n)],
+        # '2' y '2.0' son valores distintos; un entero con huecos no debe volverse '1.0'
+        'http_version': rng.choice(['1.1', '2', '2.0'], n),
+        'log_source': rng.integers(0, 3, n).astype(float),
+        'status_code': rng.choice([200, 404, 500], n),
+        'response_size': rng.integers(0, 10**6, n),
+    })
+    df.loc[rng.choice(n, 20), 'timestamp'] = 'basura'
+    df.loc[rng.choice(n, 20), 'log_source'] = np.nan
+    ruta = tmp_path / 'logs.csv'
+    df.to_csv(ruta, index=False)
+    return str(ruta)
+
+
+@pytest.mark.parametrize('codificacion', ['label', 'hash'])
+@pytest.mark.parametrize('tamano_chunk', [7, 700, 100000])
+def test_trozos_igual_que_en_memoria(csv_logs, tmp_path, monkeypatch, codificacion, tamano_chunk):
+    monkeypatch.setattr(modelo, 'CODIFICACION', codificacion)
+    monkeypatch.setattr(modelo, 'HASH_TOP_K', 16)
+    monkeypatch.setattr(modelo, 'SCALER_FILE', str(tmp_path / 'scaler.joblib'))
+    monkeypatch.setattr(modelo, 'ENCODERS_FILE', str(tmp_path / 'encoders.joblib'))
+    monkeypatch.setattr(modelo, 'TAMANO_CHUNK', tamano_chunk)
+
+    en_memoria, n_features = modelo.cargar_y_preprocesar_datos(csv_logs)
+    ruta_matriz = str(tmp_path / 'matriz.npy')
+    por_trozos, n_features_trozos = modelo.preprocesar_por_trozos(csv_logs, ruta_matriz)
+
+    assert n_features_trozos == n_features
+    assert np.array_equal(np.asarray(en_memoria, dtype=np.float32), por_trozos)
+    # Los ficheros temporales de la mezcla se borran
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['encoders.joblib', 'logs.csv', 'matriz.npy', 'scaler.joblib']
+
+
+@pytest.mark.parametrize('codificacion', ['label', 'hash'])
+def test_cache_compartida_entre_caminos(csv_logs, tmp_path, monkeypatch, codificacion):
+    """La clave de caché no incluye el camino: lo que reutiliza uno es lo que construiría el otro"""
+    monkeypatch.setattr(modelo, 'CODIFICACION', codificacion)
+    monkeypatch.setattr(modelo, 'HASH_TOP_K', 16)
+    monkeypatch.setattr(modelo, 'DATA_FILE', csv_logs)
+    monkeypatch.setattr(modelo, 'USAR_CACHE', True)
+    monkeypatch.setattr(modelo, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(modelo, 'SCALER_FILE', str(tmp_path / 'scaler.joblib'))
+    monkeypatch.setattr(modelo, 'ENCODERS_FILE', str(tmp_path / 'encoders.joblib'))
+
+    def preparar(streaming, tamano_chunk, refrescar):
+        monkeypatch.setattr(modelo, 'STREAMING', streaming)
+        monkeypatch.setattr(modelo, 'TAMANO_CHUNK', tamano_chunk)
+        monkeypatch.setattr(modelo, 'REFRESCAR_CACHE', refrescar)
+        matriz, _ = modelo.preparar_datos()
+        return np.array(matriz), joblib.load(modelo.SCALER_FILE), joblib.load(modelo.ENCODERS_FILE)
+
+    en_memoria = preparar(False, 100000, True)
+    # Otra ejecución por trozos reutiliza la entrada del camino en memoria...
+    reutilizada = preparar(True, 7, False)
+    # ...y es lo mismo que habría construido
+    por_trozos = preparar(True, 7, True)
+
+    for matriz, scaler, encoders in (reutilizada, por_trozos):
+        assert np.array_equal(matriz, en_memoria[0])
+        assert np.array_equal(scaler.data_max_, en_memoria[1].data_max_)
+        for col, encoder in en_memoria[2].items():
+            if isinstance(encoder, CodificadorHash):
+                assert encoders[col].frecuentes == encoder.frecuentes
+            else:
+                assert list(encoders[col].classes_) == list(encoder.classes_)
@@ -0,0 +1,99 @@
+"""Recargador: el puerto de métricas es de solo lectura y revertir solo va por el puerto de control"""
+import json
+import urllib.request
+import urllib.error
+import pytest
+from prometheus_client import CollectorRegistry
+
+from recarga import ConjuntoModelo, Recargador, servir_control, servir_metricas
+
+
+def conjunto(version):
+    return ConjuntoModelo(version, None, None, None, None)
+
+
+@pytest.fixture
+def recargador(tmp_path):
+    recargador = Recargador(str(tmp_path), revision=3600, version='v2')
+    recargador.aplicados = []
+    recargador.iniciar(conjunto('v2'), None, recargador.aplicados.append)
+    # Como tras una recarga: v1 es la anterior
+    recargador.anterior = conjunto('v1')
+    yield recargador
+    recargador.detener()
+
+
+@pytest.fixture
+def servidores():
+    lanzados = []
+    yield lanzados
+    for servidor in lanzados:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+def pedir(servidor, ruta, metodo='GET', token=None):
+    """(código HTTP, cuerpo) de una petición a `servidor`"""
+    peticion = urllib.request.Request(f"http://127.0.0.1:{servidor.server_port}{ruta}", method=metodo,
+                                      data=b'' if metodo == 'POST' else None)
+    if token is not None:
+        peticion.add_header('Authorization', f'Bearer {token}')
+    try:
+        with urllib.request.urlopen(peticion, timeout=5) as respuesta:
+            return respuesta.status, respuesta.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def test_puerto_de_metricas_solo_lectura(recargador, servidores):
+    servidor = servir_metricas(0, CollectorRegistry(), recargador)
+    servidores.append(servidor)
+
+    codigo, cuerpo = pedir(servidor, '/modelo')
+    assert codigo == 200 and json.loads(cuerpo)['version'] == 'v2'
+    assert pedir(servidor, '/metrics')[0] == 200
+    assert pedir(servidor, '/modelo/revertir', 'POST')[0] == 404
+    assert pedir(servidor, '/modelo', 'POST')[0] == 405
+    assert recargador.aplicados == [] and recargador.version == 'v2'
+
+
+def test_control_local_sin_token(recargador, servidores):
+    servidor = servir_control('127.0.0.1', 0, recargador)
+    servidores.append(servidor)
+
+    assert pedir(servidor, '/modelo/revertir')[0] == 405
+    codigo, cuerpo = pedir(servidor, '/modelo/revertir', 'POST')
+    estado = json.loads(cuerpo)
+    assert codigo == 200 and (estado['version'], estado['anterior']) == ('v1', 'v2')
+    assert [c.version for c in recargador.aplicados] == ['v1']
+
+
+def test_control_con_token(recargador, servidores):
+    servidor = servir_control('127.0.0.1', 0, recargador, token='secreto')
+    servidores.append(servidor)
+
+    assert pedir(servidor, '/modelo/revertir', 'POST')[0] == 401
+    assert pedir(servidor, '/modelo/revertir', 'POST', token='otro')[0] == 401
+    assert pedir(servidor, '/modelo', token='otro')[0] == 401
+    assert recargador.aplicados == []
+    assert pedir(servidor, '/modelo/revertir', 'POST', token='secreto')[0] == 200
+    assert [c.version for c in recargador.aplicados] == ['v1']
+
+
+def test_control_fuera_de_local_exige_token(recargador):
+    with pytest.raises(ValueError):
+        servir_control('0.0.0.0', 0, recargador)
+
+
+def test_sustituir_actual_y_anterior(recargador):
+    actual, anterior = recargador.actual, recargador.anterior
+    keras = actual._replace(backend='keras')
+    assert recargador.sustituir(actual, keras)
+    assert recargador.actual is keras and recargador.aplicados == [keras]
+
+    # Ya como anterior: se cambia sin aplicarlo y revertir vuelve al sustituto
+    keras_v1 = anterior._replace(backend='keras')
+    assert recargador.sustituir(anterior, keras_v1)
+    assert recargador.aplicados == [keras]
+    assert recargador.revertir() and recargador.aplicados[-1] is keras_v1
+    assert not recargador.sustituir(anterior, keras_v1)
@@ -0,0 +1,106 @@
+"""SeguidorLog: lecturas acotadas, líneas partidas entre lecturas, checkpoint y rotación"""
+import os
+import json
+
+from seguidor_logs import SeguidorLog
+
+
+def escribir(ruta, lineas, modo='a'):
+    with open(ruta, modo, encoding='utf-8') as f:
+        f.writelines(linea + '\n' for linea in lineas)
+
+
+def lineas_de(n, inicio=0):
+    # Longitudes variadas, alguna con UTF-8 y alguna más larga que el buffer de las pruebas
+    return [f"10.0.0.{i % 250} - - \"GET /{'ñ' if i % 7 == 0 else 'x'}{'a' * (i * 37 % 300)} HTTP/1.1\" 200 {i}"
+            for i in range(inicio, inicio + n)]
+
+
+def leer_todo(seguidor):
+    """Consume con `leer()` como IngestaMultiple y devuelve (líneas, tamaños de cada trozo)"""
+    lineas, tamanos = [], []
+    while True:
+        trozos = seguidor.leer()
+        if not trozos:
+            return lineas, tamanos
+        # Nunca más de un buffer por llamada
+        assert len(trozos) == 1
+        for trozo in trozos:
+            tamanos.append(len(trozo))
+            lineas.extend(str(trozo, 'utf-8').split('\n'))
+            seguidor.offset += len(trozo) + 1
+
+
+def test_lecturas_acotadas_al_buffer(tmp_path):
+    ruta = str(tmp_path / 'access.log')
+    esperadas = lineas_de(500)
+    escribir(ruta, esperadas, 'w')
+
+    seguidor = SeguidorLog(ruta, tamano_lectura=256, desde_inicio=True, usar_inotify=False)
+    seguidor.abrir()
+    lineas, tamanos = leer_todo(seguidor)
+    seguidor.cerrar()
+
+    assert lineas == esperadas
+    assert seguidor.offset == os.path.getsize(ruta)
+    # Un trozo por lectura y nunca más que el buffer (que crece con las líneas más largas)
+    assert len(tamanos) > 100
+    assert max(tamanos) < len(seguidor._buffer)
+    assert len(seguidor._buffer) <= 512
+
+
+def test_linea_incompleta_espera_al_salto(tmp_path):
+    ruta = str(tmp_path / 'access.log')
+    escribir(ruta, lineas_de(3), 'w')
+    with open(ruta, 'a') as f:
+        f.write('10.0.0.9 - - "GET /a-me')
+
+    seguidor = SeguidorLog(ruta, tamano_lectura=64, desde_inicio=True, usar_inotify=False)
+    seguidor.abrir()
+    assert leer_todo(seguidor)[0] == lineas_de(3)
+    assert seguidor.bytes_pendientes() == len('10.0.0.9 - - "GET /a-me')
+
+    with open(ruta, 'a') as f:
+        f.write('dias HTTP/1.1" 200 1\n')
+    assert leer_todo(seguidor)[0] == ['10.0.0.9 - - "GET /a-medias HTTP/1.1" 200 1']
+    seguidor.cerrar()
+
+
+def test_lineas_reanuda_desde_el_checkpoint(tmp_path):
+    ruta = str(tmp_path / 'access.log')
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    escribir(ruta, lineas_de(100), 'w')
+
+    seguidor = SeguidorLog(ruta, ruta_checkpoint=checkpoint, tamano_lectura=128, desde_inicio=True,
+                           usar_inotify=False)
+    lineas = seguidor.lineas(ceder_inactivo=True)
+    leidas = [next(lineas) for _ in range(40)]
+    # La línea 40 se pide pero no se procesa: el checkpoint queda justo después de la 39
+    next(lineas)
+    lineas.close()
+    assert leidas == lineas_de(40)
+    assert json.load(open(checkpoint))['offset'] == sum(len(l.encode('utf-8')) + 1 for l in leidas)
+
+    escribir(ruta, lineas_de(10, 100))
+    seguidor = SeguidorLog(ruta, ruta_checkpoint=checkpoint, tamano_lectura=128, usar_inotify=False)
+    resto = []
+    for linea in seguidor.lineas(ceder_inactivo=True):
+        if linea is None:
+            break
+        resto.append(linea)
+    assert resto == lineas_de(70, 40)
+
+
+def test_rotacion_termina_el_fichero_antiguo(tmp_path):
+    ruta = str(tmp_path / 'access.log')
+    escribir(ruta, lineas_de(20), 'w')
+    seguidor = SeguidorLog(ruta, tamano_lectura=128, desde_inicio=True, usar_inotify=False)
+    seguidor.abrir()
+    assert leer_todo(seguidor)[0] == lineas_de(20)
+
+    # logrotate: el fichero abierto recibe sus últimas líneas después de renombrarse
+    escribir(ruta, lineas_de(5, 20))
+    os.rename(ruta, ruta + '.1')
+    escribir(ruta, lineas_de(5, 25), 'w')
+    assert leer_todo(seguidor)[0] == lineas_de(10, 20)
+    seguidor.cerrar()
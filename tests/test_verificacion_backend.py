@@ -0,0 +1,70 @@
+"""Verificación en segundo plano: un backend rechazado sale del conjunto, no solo del motor"""
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from arranque import Arranque
+from capturador import verificar_en_segundo_plano
+from inferencia import BackendKeras
+from recarga import ConjuntoModelo, Recargador
+
+
+class ModeloCeros:
+    def predict(self, secuencias, batch_size=None, verbose=0):
+        return np.zeros_like(secuencias)
+
+
+class BackendUnos:
+    nombre = 'numpy'
+
+    def __call__(self, secuencias):
+        return np.ones_like(secuencias)
+
+
+def capturador_falso(version='v1'):
+    artefactos = SimpleNamespace(modelo=ModeloCeros(), feature_names=['a', 'b'])
+    capturador = SimpleNamespace(artefactos=artefactos, aplicados=[])
+    capturador.conjunto = ConjuntoModelo(version, artefactos, BackendUnos(), None, None)
+    capturador.aplicar_conjunto = capturador.aplicados.append
+    return capturador
+
+
+def esperar_verificacion():
+    for hilo in threading.enumerate():
+        if hilo.name == 'verificacion-backend':
+            hilo.join(10)
+
+
+def test_sin_recargador_aplica_conjunto_con_keras():
+    capturador = capturador_falso()
+    verificar_en_segundo_plano(Arranque(), capturador, capturador.conjunto.backend)
+    esperar_verificacion()
+
+    [conjunto] = capturador.aplicados
+    assert isinstance(conjunto.backend, BackendKeras)
+    assert conjunto._replace(backend=None) == capturador.conjunto._replace(backend=None)
+
+
+@pytest.mark.parametrize('recargado', [False, True])
+def test_con_recargador_revertir_no_reinstala_el_rechazado(tmp_path, recargado):
+    capturador = capturador_falso()
+    recargador = Recargador(str(tmp_path), revision=3600, version='v1')
+    recargador.iniciar(capturador.conjunto, None, capturador.aplicar_conjunto)
+    try:
+        if recargado:
+            # Una recarga a v2 antes de que termine la verificación: v1 queda como anterior
+            v2 = ConjuntoModelo('v2', None, None, None, None)
+            recargador.anterior, recargador.actual = recargador.actual, v2
+        verificar_en_segundo_plano(Arranque(), capturador, capturador.conjunto.backend, recargador)
+        esperar_verificacion()
+
+        if recargado:
+            assert recargador.actual is v2 and capturador.aplicados == []
+            assert recargador.revertir()
+        [conjunto] = capturador.aplicados
+        assert conjunto.version == 'v1' and isinstance(conjunto.backend, BackendKeras)
+        assert recargador.actual is conjunto
+    finally:
+        recargador.detener()
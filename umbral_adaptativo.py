@@ -0,0 +1,242 @@
+"""Umbral de anomalía calculado en línea a partir de los propios scores.
+
+Modos:
+  - fijo:      el umbral configurado (UMBRAL), como siempre.
+  - sigma:     media + k·desviación del MAE, con media y varianza EWMA.
+  - percentil: percentil p de un histograma logarítmico con decaimiento
+               exponencial (la misma ventana efectiva que la EWMA).
+
+El estado se actualiza por lotes de forma exacta: tras n scores queda igual
+que si se hubieran procesado de uno en uno (pesos (1-alfa)^(n-1-j)), así que
+no depende del tamaño de lote. Cada lote se compara con el umbral que había
+al empezarlo. En modo sigma los scores entran en la estadística recortados al
+umbral, para que una ráfaga de ataques no infle la media y la varianza (el
+percentil ya es robusto y recortarlo lo iría bajando).
+
+Durante el calentamiento (los primeros `calentamiento` scores) se usa el
+umbral inicial: el derivado de las estadísticas de validación guardadas al
+entrenar (`<modelo>_umbral.json`) o, si no hay, el fijo. El estado se guarda
+periódicamente en JSON y se recupera al reiniciar si corresponde al mismo
+modelo y configuración.
+
+El umbral vigente se publica como `log_anomalia_umbral` (registrando la
+instancia como colector de Prometheus).
+"""
+import os
+import json
+import time
+import logging
+import threading
+import numpy as np
+from prometheus_client.core import GaugeMetricFamily
+from cache_datos import huella_fichero
+from estadisticas_score import CubosLogaritmicos
+
+logger = logging.getLogger(__name__)
+
+MODOS = ('fijo', 'sigma', 'percentil')
+VERSION_ESTADO = 1
+
+
+def ruta_estadisticas_umbral(ruta_modelo):
+    """modelo_logs_1.h5 -> modelo_logs_1_umbral.json"""
+    return os.path.splitext(ruta_modelo)[0] + '_umbral.json'
+
+
+def estadisticas_validacion(maes, precision=0.01, percentiles=(0.9, 0.95, 0.99, 0.999)):
+    """Resumen de los MAE de validación que se guarda junto al modelo"""
+    maes = np.asarray(maes, dtype=np.float64)
+    maes = maes[np.isfinite(maes)]
+    cubos = CubosLogaritmicos(precision)
+    recuentos = np.bincount(cubos.indices(maes), minlength=cubos.n)
+    no_nulos = np.flatnonzero(recuentos)
+    return {
+        'n': int(len(maes)),
+        'media': float(maes.mean()),
+        'desviacion': float(maes.std()),
+        'percentiles': {f"{p:g}": float(np.quantile(maes, p)) for p in percentiles},
+        'precision': precision,
+        'histograma': {'indices': no_nulos.tolist(), 'recuentos': recuentos[no_nulos].tolist()},
+    }
+
+
+def guardar_json(datos, ruta):
+    """Escritura atómica (fichero temporal + rename)"""
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f)
+    os.replace(temporal, ruta)
+
+
+class UmbralAdaptativo:
+    """Umbral online para los MAE de reconstrucción; `evaluar(maes)` marca un lote de scores"""
+
+    def __init__(self, modo='sigma', umbral_fijo=0.15, sigmas=3.0, percentil=0.99, alfa=1e-3,
+                 calentamiento=1000, precision=0.01, validacion=None, ruta_estado=None,
+                 huella_modelo=None, guardar_cada=60.0):
+        if modo not in MODOS:
+            raise ValueError(f"Modo de umbral desconocido: '{modo}'. Opciones: {MODOS}")
+        self.modo = modo
+        self.umbral_fijo = float(umbral_fijo)
+        self.sigmas = float(sigmas)
+        self.percentil = float(percentil)
+        self.alfa = float(alfa)
+        self.calentamiento = int(calentamiento)
+        self.ruta_estado = ruta_estado
+        self.huella_modelo = huella_modelo
+        self.guardar_cada = guardar_cada
+        self.precision = float(precision)
+        self.cubos = CubosLogaritmicos(precision)
+        self._lock = threading.Lock()
+        self._ultimo_guardado = time.monotonic()
+
+        self.n = 0
+        self.media = None
+        self.media2 = None
+        self.recuentos = np.zeros(self.cubos.n, dtype=np.float64)
+        self.umbral_inicial = self.umbral_fijo
+        if validacion is not None and modo != 'fijo':
+            self._iniciar_con_validacion(validacion)
+        if ruta_estado and modo != 'fijo':
+            self.cargar()
+        self.umbral = self._calcular_umbral()
+
+    # --- Estado ---
+    def _iniciar_con_validacion(self, validacion):
+        """Arranca la estadística con la distribución de validación del entrenamiento"""
+        self.media = validacion['media']
+        self.media2 = validacion['desviacion'] ** 2 + validacion['media'] ** 2
+        histograma = validacion.get('histograma')
+        if histograma and validacion.get('precision') == self.precision:
+            recuentos = np.zeros(self.cubos.n, dtype=np.float64)
+            recuentos[histograma['indices']] = histograma['recuentos']
+            # Masa equivalente a la de la EWMA en régimen (1/alfa scores)
+            self.recuentos = recuentos * (1.0 / self.alfa / max(recuentos.sum(), 1.0))
+        if self.modo == 'sigma':
+            self.umbral_inicial = self.media + self.sigmas * validacion['desviacion']
+        else:
+            self.umbral_inicial = validacion['percentiles'].get(f"{self.percentil:g}", self._cuantil())
+        logger.info(f"[✓] Umbral inicial según validación ({validacion['n']} ventanas): {self.umbral_inicial:.4f}")
+
+    def _configuracion(self):
+        return {'modo': self.modo, 'sigmas': self.sigmas, 'percentil': self.percentil, 'alfa': self.alfa,
+                'precision': self.precision, 'modelo': self.huella_modelo}
+
+    def estado(self):
+        no_nulos = np.flatnonzero(self.recuentos)
+        return {
+            'version': VERSION_ESTADO, 'configuracion': self._configuracion(),
+            'n': self.n, 'media': self.media, 'media2': self.media2, 'umbral_inicial': self.umbral_inicial,
+            'histograma': {'indices': no_nulos.tolist(), 'recuentos': self.recuentos[no_nulos].tolist()},
+        }
+
+    def cargar(self):
+        """Recupera el estado guardado si es del mismo modelo y configuración"""
+        if not os.path.exists(self.ruta_estado):
+            return False
+        try:
+            with open(self.ruta_estado, encoding='utf-8') as f:
+                estado = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"[!] Estado del umbral ilegible ({self.ruta_estado}): {e}")
+            return False
+        if estado.get('version') != VERSION_ESTADO or estado.get('configuracion') != self._configuracion():
+            logger.warning("[!] El estado del umbral guardado es de otro modelo o configuración; se descarta")
+            return False
+        self.n = estado['n']
+        self.media = estado['media']
+        self.media2 = estado['media2']
+        self.umbral_inicial = estado['umbral_inicial']
+        self.recuentos = np.zeros(self.cubos.n, dtype=np.float64)
+        self.recuentos[estado['histograma']['indices']] = estado['histograma']['recuentos']
+        logger.info(f"[✓] Estado del umbral recuperado ({self.n} scores vistos)")
+        return True
+
+    def guardar(self):
+        if not self.ruta_estado or self.modo == 'fijo':
+            return
+        with self._lock:
+            estado = self.estado()
+        guardar_json(estado, self.ruta_estado)
+        self._ultimo_guardado = time.monotonic()
+
+    # --- Umbral ---
+    @property
+    def calentando(self):
+        return self.modo != 'fijo' and self.n < self.calentamiento
+
+    def _cuantil(self):
+        acumulado = np.cumsum(self.recuentos)
+        if not acumulado[-1]:
+            return self.umbral_fijo
+        return float(self.cubos.representantes[np.searchsorted(acumulado, self.percentil * acumulado[-1])])
+
+    def _calcular_umbral(self):
+        if self.modo == 'fijo' or self.calentando:
+            return self.umbral_inicial
+        if self.modo == 'sigma':
+            return float(self.media + self.sigmas * np.sqrt(max(self.media2 - self.media ** 2, 0.0)))
+        return self._cuantil()
+
+    def _actualizar(self, maes, umbral):
+        """Incorpora el lote como si llegara score a score (con el lock tomado)"""
+        maes = maes[np.isfinite(maes)]
+        n = len(maes)
+        if not n:
+            return
+        x = np.minimum(maes, umbral) if self.modo == 'sigma' and self.n >= self.calentamiento else maes
+        if self.media is None:
+            self.media, self.media2 = float(x[0]), float(x[0]) ** 2
+        decaimiento = 1.0 - self.alfa
+        # Peso del score j tras el lote: alfa·(1-alfa)^(n-1-j); lo anterior decae (1-alfa)^n
+        pesos = self.alfa * decaimiento ** np.arange(n - 1, -1, -1, dtype=np.float64)
+        factor = decaimiento ** n
+        self.media = factor * self.media + float(pesos @ x)
+        self.media2 = factor * self.media2 + float(pesos @ (x * x))
+        self.recuentos *= factor
+        self.recuentos += np.bincount(self.cubos.indices(x), weights=pesos / self.alfa, minlength=self.cubos.n)
+
+        calentando = self.calentando
+        self.n += n
+        if calentando and not self.calentando:
+            logger.info(f"[✓] Calentamiento del umbral terminado tras {self.n} scores")
+
+    def evaluar(self, maes, actualizar=None):
+        """Marca los scores del lote por encima del umbral vigente y actualiza la estadística
+        (solo con los scores de la máscara `actualizar`, si se indica)"""
+        maes = np.asarray(maes, dtype=np.float64)
+        if self.modo == 'fijo':
+            return maes > self.umbral_fijo
+        with self._lock:
+            umbral = self.umbral
+            anomalias = maes > umbral
+            self._actualizar(maes if actualizar is None else maes[actualizar], umbral)
+            self.umbral = self._calcular_umbral()
+        if self.ruta_estado and time.monotonic() - self._ultimo_guardado >= self.guardar_cada:
+            self.guardar()
+        return anomalias
+
+    def collect(self):
+        familia = GaugeMetricFamily('log_anomalia_umbral', 'Umbral de anomalía vigente', labels=['modo'])
+        familia.add_metric([self.modo], self.umbral)
+        yield familia
+        yield GaugeMetricFamily('log_anomalia_umbral_calentando',
+                                'Vale 1 mientras el umbral adaptativo usa aún el umbral inicial',
+                                value=int(self.calentando))
+
+
+def cargar_validacion(ruta_modelo):
+    """Estadísticas de validación guardadas junto al modelo, o None"""
+    ruta = ruta_estadisticas_umbral(ruta_modelo)
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def umbral_para_modelo(ruta_modelo, modo, umbral_fijo, ruta_estado=None, **opciones):
+    """UmbralAdaptativo con las estadísticas de validación y la huella del modelo"""
+    validacion = cargar_validacion(ruta_modelo) if modo != 'fijo' else None
+    huella = huella_fichero(ruta_modelo) if ruta_estado and modo != 'fijo' else None
+    return UmbralAdaptativo(modo, umbral_fijo, validacion=validacion, ruta_estado=ruta_estado,
+                            huella_modelo=huella, **opciones)
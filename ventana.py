@@ -0,0 +1,120 @@
+from collections import OrderedDict
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class VentanaAnillo:
+    """Ventana deslizante sobre un buffer NumPy contiguo.
+
+    Las filas se escriben una tras otra; cuando el buffer se llena se copian al
+    principio solo las filas que aún pueden formar parte de una ventana. Así
+    la ventana actual es siempre un slice contiguo (vista sin copia) y las
+    últimas `historial` ventanas salen juntas de un `sliding_window_view`.
+    """
+
+    def __init__(self, timesteps, n_features, historial=1, capacidad=None, dtype=np.float32, buffer=None):
+        self.timesteps = timesteps
+        self.historial = max(1, int(historial))
+        # Filas que hay que conservar al compactar para no perder ventanas
+        self._conservar = timesteps + self.historial - 2
+        if buffer is None:
+            capacidad = capacidad or 2 * (timesteps + self.historial - 1)
+            buffer = np.zeros((capacidad, n_features), dtype=dtype)
+        if len(buffer) <= self._conservar:
+            raise ValueError(f"Capacidad {len(buffer)} insuficiente para ventanas de {timesteps} con historial {historial}")
+        self._buf = buffer
+        self._fin = 0
+        self.total = 0
+        # Ventanas que aún contienen una línea sospechosa (ver cascada.py)
+        self.sospecha = 0
+
+    def __len__(self):
+        """Filas disponibles en la ventana actual (como len() de un deque con maxlen)"""
+        return min(self.total, self.timesteps)
+
+    @property
+    def lleno(self):
+        return self.total >= self.timesteps
+
+    def reservar(self):
+        """Avanza la ventana una fila y devuelve esa fila para escribirla en el sitio"""
+        if self._fin == len(self._buf):
+            conservar = min(self._conservar, self.total)
+            self._buf[:conservar] = self._buf[self._fin - conservar:self._fin]
+            self._fin = conservar
+        fila = self._buf[self._fin]
+        self._fin += 1
+        self.total += 1
+        return fila
+
+    def agregar(self, fila):
+        """Copia `fila` como nueva fila de la ventana y devuelve la fila del buffer"""
+        destino = self.reservar()
+        destino[...] = fila
+        return destino
+
+    def vista(self):
+        """Ventana actual (TIMESTEPS, n_features) sin copia; válida hasta la siguiente escritura"""
+        return self._buf[self._fin - self.timesteps:self._fin]
+
+    def ventanas(self, k):
+        """Las últimas `k` ventanas consecutivas como una vista (k, TIMESTEPS, n_features)"""
+        disponibles = min(self.historial, self.total - self.timesteps + 1)
+        if k > disponibles:
+            raise ValueError(f"Solo hay {max(disponibles, 0)} ventanas disponibles, se pidieron {k}")
+        filas = self._buf[self._fin - (k + self.timesteps - 1):self._fin]
+        return sliding_window_view(filas, self.timesteps, axis=0).transpose(0, 2, 1)
+
+    def reiniciar(self):
+        self._fin = 0
+        self.total = 0
+        self.sospecha = 0
+
+
+class VentanasPorClave:
+    """Muchas ventanas independientes (por IP, por fichero...) en un único array.
+
+    Cada clave ocupa un bloque de un array (max_claves, capacidad, n_features);
+    cuando no quedan bloques libres se recicla el de la clave usada hace más tiempo.
+    """
+
+    def __init__(self, timesteps, n_features, max_claves=1024, historial=1, dtype=np.float32):
+        self.timesteps = timesteps
+        self.historial = historial
+        self.max_claves = max_claves
+        capacidad = 2 * (timesteps + max(1, historial) - 1)
+        self._bloques = np.zeros((max_claves, capacidad, n_features), dtype=dtype)
+        self._ventanas = OrderedDict()
+        self._libres = list(range(max_claves - 1, -1, -1))
+        self.expulsadas = 0
+
+    def __len__(self):
+        return len(self._ventanas)
+
+    def __contains__(self, clave):
+        return clave in self._ventanas
+
+    def ventana(self, clave):
+        """Devuelve la VentanaAnillo de `clave`, creándola si no existe"""
+        ventana = self._ventanas.get(clave)
+        if ventana is not None:
+            self._ventanas.move_to_end(clave)
+            return ventana
+
+        if self._libres:
+            bloque = self._libres.pop()
+        else:
+            _, antigua = self._ventanas.popitem(last=False)
+            bloque = antigua.bloque
+            self.expulsadas += 1
+
+        ventana = VentanaAnillo(self.timesteps, self._bloques.shape[2], self.historial,
+                                buffer=self._bloques[bloque])
+        ventana.bloque = bloque
+        self._ventanas[clave] = ventana
+        return ventana
+
+    def eliminar(self, clave):
+        ventana = self._ventanas.pop(clave, None)
+        if ventana is not None:
+            self._libres.append(ventana.bloque)